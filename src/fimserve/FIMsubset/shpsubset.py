@@ -1,14 +1,20 @@
 import os
 import glob
+import math
+import numpy as np
 import rasterio
-from rasterio.mask import mask
+from rasterio.features import geometry_mask
+from rasterio.windows import Window, from_bounds
 from pathlib import Path
 import geopandas as gpd
+from concurrent.futures import ThreadPoolExecutor
 
 from ..datadownload import setup_directories
 
 
 def checkSHP(input_file):
+    if isinstance(input_file, gpd.GeoDataFrame):
+        return input_file
     if isinstance(input_file, Path):
         input_file = str(input_file)
 
@@ -27,19 +33,45 @@ def checkSHP(input_file):
     return gdf
 
 
-def clipFIMforboundary(inundation_raster, shapefile_geom, output_directory, huc):
-    with rasterio.open(inundation_raster) as src:
-        geometries = shapefile_geom.geometry.tolist()
-        if src.crs != shapefile_geom.crs:
-            print("CRS mismatch. Reprojecting geometry to match raster.")
-            geometries = [geom.to_crs(src.crs) for geom in geometries]
+def clip_window(src, geometries):
+    """
+    Read only the raster window covering geometries and mask the cells outside them.
+    :return: (out_image, out_transform) like rasterio.mask.mask(..., crop=True)
+    """
+    minx = min(g.bounds[0] for g in geometries)
+    miny = min(g.bounds[1] for g in geometries)
+    maxx = max(g.bounds[2] for g in geometries)
+    maxy = max(g.bounds[3] for g in geometries)
+    w = from_bounds(minx, miny, maxx, maxy, transform=src.transform)
+    col_off, row_off = math.floor(w.col_off), math.floor(w.row_off)
+    window = Window(
+        col_off,
+        row_off,
+        math.ceil(w.col_off + w.width) - col_off,
+        math.ceil(w.row_off + w.height) - row_off,
+    ).intersection(Window(0, 0, src.width, src.height))
+
+    out_transform = src.window_transform(window)
+    out_image = src.read(window=window)
+    outside = geometry_mask(
+        geometries,
+        out_shape=(out_image.shape[1], out_image.shape[2]),
+        transform=out_transform,
+    )
+    fill = src.nodata if src.nodata is not None else 0
+    out_image[:, outside] = np.asarray(fill, dtype=out_image.dtype)
+    return out_image, out_transform
 
-        out_image, out_transform = mask(src, geometries, crop=True)
+
+def write_clip(inundation_raster, geometries, output_file):
+    """Clip one inundation raster to geometries (in the raster CRS) with a windowed read."""
+    with rasterio.open(inundation_raster) as src:
+        out_image, out_transform = clip_window(src, geometries)
         out_meta = src.meta.copy()
         out_meta.update(
             {
                 "driver": "GTiff",
-                "count": 1,
+                "count": out_image.shape[0],
                 "crs": src.crs,
                 "transform": out_transform,
                 "width": out_image.shape[2],
@@ -47,15 +79,33 @@ def clipFIMforboundary(inundation_raster, shapefile_geom, output_directory, huc)
             }
         )
 
-        output_directory = os.path.join(output_directory, "subsetFIM")
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with rasterio.open(output_file, "w", **out_meta) as dest:
+        dest.write(out_image)
+    print(f"Clipped raster saved to {output_file}")
+    return out_image, out_transform
+
 
-        file_basename = os.path.basename(inundation_raster).split("_")[0]
-        output_file = os.path.join(output_directory, f"{file_basename}_subsetFIM.tif")
+def subset_output_file(inundation_raster, output_directory, suffix=""):
+    file_basename = os.path.basename(inundation_raster).split("_")[0]
+    return os.path.join(output_directory, f"{file_basename}_subsetFIM{suffix}.tif")
+
+
+def clip_many(jobs, workers=None):
+    """Run write_clip for (raster, geometries, output_file) jobs on a thread pool."""
+    jobs = list(jobs)
+    workers = workers or min(len(jobs), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda job: write_clip(*job), jobs))
+
+
+def clipFIMforboundary(inundation_raster, shapefile_geom, output_directory, huc):
+    with rasterio.open(inundation_raster) as src:
+        raster_crs = src.crs
+    if shapefile_geom.crs is not None and raster_crs != shapefile_geom.crs:
+        print("CRS mismatch. Reprojecting geometry to match raster.")
+        shapefile_geom = shapefile_geom.to_crs(raster_crs)
 
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-        with rasterio.open(output_file, "w", **out_meta) as dest:
-            dest.write(out_image)
-        print(f"Clipped raster saved to {output_file}")
+    output_directory = os.path.join(output_directory, "subsetFIM")
+    output_file = subset_output_file(inundation_raster, output_directory)
+    write_clip(inundation_raster, shapefile_geom.geometry.tolist(), output_file)
@@ -1,13 +1,22 @@
 import os
 import glob
+import threading
+import numpy as np
+import pandas as pd
 import geopandas as gpd
+from shapely import STRtree
 from shapely.geometry import Point
 from pyproj import CRS
 import rasterio
-from rasterio.mask import mask
 
 from ..datadownload import setup_directories
-from .shpsubset import checkSHP, clipFIMforboundary
+from .shpsubset import (
+    checkSHP,
+    clipFIMforboundary,
+    clip_many,
+    subset_output_file,
+    write_clip,
+)
 
 
 def checkifWGS(x, y):
@@ -32,55 +41,114 @@ def reproject_coordinates(x, y, target_crs="EPSG:5070"):
         return x, y
 
 
-def clipFIM(inundation_raster, shapefile_geom, output_directory, huc):
-    with rasterio.open(inundation_raster) as src:
-        out_image, out_transform = mask(src, [shapefile_geom], crop=True)
-        out_meta = src.meta.copy()
-        out_meta.update(
-            {
-                "driver": "GTiff",
-                "count": 1,
-                "crs": src.crs,
-                "transform": out_transform,
-                "width": out_image.shape[2],
-                "height": out_image.shape[1],
-            }
+class CatchmentIndex:
+    """
+    STRtree over the catchments of one HUC. Features are read from the GeoPackage
+    with a bbox filter around the queried points only; areas already read are
+    kept, so repeated queries for a HUC do not touch the file again.
+    """
+
+    def __init__(self, geopackage_path):
+        self.geopackage_path = geopackage_path
+        self.catchments = None
+        self.tree = None
+        self._extents = []
+        self._lock = threading.Lock()
+
+    def _covered(self, bounds):
+        minx, miny, maxx, maxy = bounds
+        return any(
+            e[0] <= minx and e[1] <= miny and e[2] >= maxx and e[3] >= maxy
+            for e in self._extents
         )
-        file_basename = os.path.basename(inundation_raster).split("_")[0]
-        output_file = os.path.join(output_directory, f"{file_basename}_subsetFIM.tif")
 
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
+    def _load(self, bounds):
+        if self._covered(bounds):
+            return
+        read = gpd.read_file(self.geopackage_path, bbox=tuple(bounds))
+        frames = [f for f in (self.catchments, read) if f is not None and len(f)]
+        if frames:
+            merged = gpd.GeoDataFrame(
+                pd.concat(frames, ignore_index=True), crs=frames[0].crs
+            )
+            merged = merged[~merged.geometry.to_wkb().duplicated()]
+            self.catchments = merged.reset_index(drop=True)
+            self.tree = STRtree(self.catchments.geometry.values)
+        self._extents.append(tuple(bounds))
+
+    def lookup(self, points):
+        """Catchment geometry containing each point (None where no catchment contains it)."""
+        points = list(points)
+        if not points:
+            return []
+        xs = [p.x for p in points]
+        ys = [p.y for p in points]
+        with self._lock:
+            self._load((min(xs) - 1, min(ys) - 1, max(xs) + 1, max(ys) + 1))
+            if self.tree is None:
+                return [None] * len(points)
+            point_idx, tree_idx = self.tree.query(points, predicate="within")
+
+        found = [None] * len(points)
+        geoms = self.catchments.geometry.values
+        for p, t in zip(point_idx, tree_idx):
+            if found[p] is None:
+                found[p] = geoms[t]
+        return found
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def catchment_index(geopackage_path):
+    """Shared CatchmentIndex per catchment GeoPackage (i.e. per HUC)."""
+    key = (os.path.abspath(geopackage_path), os.path.getmtime(geopackage_path))
+    with _INDEXES_LOCK:
+        if key not in _INDEXES:
+            _INDEXES[key] = CatchmentIndex(geopackage_path)
+        return _INDEXES[key]
 
-        with rasterio.open(output_file, "w", **out_meta) as dest:
-            dest.write(out_image)
 
-        print(f"Clipped raster saved to {output_file}")
-        return out_image, out_transform
+def clipFIM(inundation_raster, shapefile_geom, output_directory, huc):
+    output_file = subset_output_file(inundation_raster, output_directory)
+    return write_clip(inundation_raster, [shapefile_geom], output_file)
 
 
 def withininWatershed(x, y, geopackage_path, inundation_raster, huc, output_directory):
-    point = Point(x, y)
-    watersheds = gpd.read_file(geopackage_path)
-
     # Watershed containing the point
-    watershed_containing_point = None
-    for _, watershed in watersheds.iterrows():
-        if watershed["geometry"].contains(point):
-            watershed_containing_point = watershed
-            break
+    index = catchment_index(geopackage_path)
+    watershed_containing_point = index.lookup([Point(x, y)])[0]
     output_directory = os.path.join(output_directory, "subsetFIM")
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
     if watershed_containing_point is None:
         raise ValueError(f"Point is not within any watershed boundary for {huc}")
-    return clipFIM(
-        inundation_raster, watershed_containing_point["geometry"], output_directory, huc
-    )
+    return clipFIM(inundation_raster, watershed_containing_point, output_directory, huc)
 
 
-def subsetFIM(location, huc, method):
+def _as_list(location, method):
+    """Normalize one location or many into a list."""
+    if method == "xy":
+        if len(location) == 2 and all(np.isscalar(v) for v in location):
+            return [tuple(location)]
+        return [tuple(xy) for xy in location]
+    if isinstance(location, (list, tuple)):
+        return list(location)
+    return [location]
+
+
+def subsetFIM(location, huc, method, workers=None):
+    """
+    Clip every inundation raster of a HUC to the catchment containing a point
+    (method="xy") or to a boundary file (method="boundary").
+
+    :param location: (x, y), or a list of (x, y) points; a boundary file / GeoDataFrame,
+        or a list of them.
+    :param workers: Number of rasters clipped in parallel (defaults to CPU count).
+    With several locations the outputs are numbered <name>_subsetFIM_<n>.tif.
+    """
     code_dir, data_dir, output_dir = setup_directories()
     gpkg_path = os.path.join(
         output_dir, f"flood_{huc}", huc, "nwm_catchments_proj_subset.gpkg"
@@ -88,15 +156,43 @@ def subsetFIM(location, huc, method):
     out_dir = os.path.join(output_dir, f"flood_{huc}", f"{huc}_inundation")
     inundation_rasters = os.path.join(out_dir, "*_inundation.tif")
     print(inundation_rasters)
-    files = glob.glob(inundation_rasters)
+    files = sorted(glob.glob(inundation_rasters))
+    if not files:
+        print(f"No inundation rasters found in {out_dir}")
+        return
+
+    locations = _as_list(location, method)
+    subset_dir = os.path.join(out_dir, "subsetFIM")
+    numbered = len(locations) > 1
+    jobs = []
+
     if method == "xy":
-        x, y = location
-        print("point", x, y)
-        x, y = reproject_coordinates(x, y)
-        for file in files:
-            print(f"Clipping {file} to watershed containing point {x}, {y}")
-            withininWatershed(x, y, gpkg_path, file, huc, out_dir)
+        points = [Point(*reproject_coordinates(x, y)) for x, y in locations]
+        catchments = catchment_index(gpkg_path).lookup(points)
+        for i, (point, geom) in enumerate(zip(points, catchments)):
+            if geom is None:
+                raise ValueError(
+                    f"Point {point.x}, {point.y} is not within any watershed boundary for {huc}"
+                )
+            print(f"Clipping to watershed containing point {point.x}, {point.y}")
+            suffix = f"_{i + 1}" if numbered else ""
+            jobs += [
+                (f, [geom], subset_output_file(f, subset_dir, suffix)) for f in files
+            ]
     elif method == "boundary":
-        shapefile = checkSHP(location)
-        for file in files:
-            clipFIMforboundary(file, shapefile, out_dir, huc)
+        with rasterio.open(files[0]) as src:
+            raster_crs = src.crs
+        for i, loc in enumerate(locations):
+            shapefile = checkSHP(loc)
+            if shapefile.crs is not None and shapefile.crs != raster_crs:
+                print("CRS mismatch. Reprojecting geometry to match raster.")
+                shapefile = shapefile.to_crs(raster_crs)
+            suffix = f"_{i + 1}" if numbered else ""
+            geoms = shapefile.geometry.tolist()
+            jobs += [
+                (f, geoms, subset_output_file(f, subset_dir, suffix)) for f in files
+            ]
+    else:
+        raise ValueError("method must be 'xy' or 'boundary'.")
+
+    clip_many(jobs, workers)
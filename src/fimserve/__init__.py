@@ -6,7 +6,8 @@ warnings.simplefilter("ignore")
 
 from .datadownload import DownloadHUC8
 from .streamflowdata.nwmretrospective import getNWMretrospectivedata
-from .runFIM import runOWPHANDFIM
+from .runFIM import runOWPHANDFIM, HANDInundationEngine
+from .batchrun import run_batch
 
 from .streamflowdata.forecasteddata import getNWMForecasteddata
 from .streamflowdata.geoglows import getGEOGLOWSstreamflow
@@ -28,14 +29,17 @@ from .FIMsubset.xycoord import subsetFIM
 from .vizualizationFIM import vizualizeFIM
 
 # Statistics
-from .statistics.calculatestatistics import CalculateStatistics
+from .statistics.calculatestatistics import CalculateStatistics, CalculateHUCStatistics
+
+# Local cache for remote assets
+from .s3cache import configure_cache, clear_cache
 
 # For intersected HUC8 boundary
 from .intersectedHUC import getIntersectedHUC8ID
 
 # evaluation of FIM
 from .fimevaluation.fims_setup import FIMService, fim_lookup
-from .fimevaluation.run_fimeval import run_evaluation
+from .fimevaluation.run_fimeval import run_evaluation, run_parallel_evaluation
 
 
 # Enhancement using surrogate models [Importing those only if they are called]
@@ -67,6 +71,8 @@ __all__ = [
     "DownloadHUC8",
     "getNWMRetrospectivedata",
     "runOWPHANDFIM",
+    "HANDInundationEngine",
+    "run_batch",
     "getNWMForecasteddata",
     "getGEOGLOWSstreamflow",
     "plotNWMStreamflow",
@@ -78,10 +84,14 @@ __all__ = [
     "subsetFIM",
     "vizualizeFIM",
     "CalculateStatistics",
+    "CalculateHUCStatistics",
     "getIntersectedHUC8ID",
+    "configure_cache",
+    "clear_cache",
     "FIMService",
     "fim_lookup",
     "run_evaluation",
+    "run_parallel_evaluation",
     "prepare_FORCINGs",
     "enhanceFIM",
     "getbuilding_exposure",
@@ -0,0 +1,161 @@
+"""
+Multi-HUC batch scheduler for the download -> streamflow -> FIM workflow.
+
+Network stages (HUC8 raster download and NWM retrospective streamflow) run on
+a bounded thread pool while the FIM stage runs on a shared HAND inundation
+worker pool, so S3 transfers of one HUC overlap with FIM generation of another.
+"""
+
+import os
+import time
+import threading
+import pandas as pd
+from typing import Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .datadownload import DownloadHUC8, setup_directories, clone_repository, EnvFile
+from .streamflowdata.nwmretrospective import getNWMretrospectivedata
+from .runFIM import HANDInundationEngine, runOWPHANDFIM
+
+
+def _normalize_events(hucs, events):
+    """Return {huc: [value_times]} from a dict, a list shared by all HUCs, or None."""
+    if events is None:
+        return {h: None for h in hucs}
+    if isinstance(events, dict):
+        return {h: events.get(h) for h in hucs}
+    if isinstance(events, str):
+        events = [events]
+    return {h: list(events) for h in hucs}
+
+
+def run_batch(
+    hucs: Union[List[str], Dict[str, List[str]]],
+    events: Optional[Union[List[str], Dict[str, List[str]]]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    discharge_sortby: Optional[str] = None,
+    stream_order=None,
+    version: Optional[str] = None,
+    depth: bool = False,
+    network_workers: int = 4,
+    cpu_workers: Optional[int] = None,
+    download: bool = True,
+    summary_csv: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Run DownloadHUC8, getNWMretrospectivedata and runOWPHANDFIM for many HUCs with
+    overlapping I/O and compute.
+
+    :param hucs: List of HUC8 IDs, or a huc_event_dict {huc: [value_times]}.
+    :param events: Value times shared by all HUCs, or a {huc: [value_times]} dict.
+    :param start_date / end_date / discharge_sortby: Date-range streamflow, as in getNWMretrospectivedata.
+    :param network_workers: Maximum number of HUCs downloading at the same time.
+    :param cpu_workers: Number of HAND inundation worker processes (defaults to CPU count).
+    :param download: If False, skip DownloadHUC8 (HUC8 rasters already on disk).
+    :param summary_csv: Optional path to save the per-HUC timing/status table.
+    :return: DataFrame with per-stage timings and status for every HUC.
+    """
+    if isinstance(hucs, dict):
+        events = hucs if events is None else events
+        hucs = list(hucs.keys())
+    hucs = [str(h) for h in hucs]
+    huc_events = _normalize_events(hucs, events)
+
+    if not any(huc_events.values()) and not (start_date and end_date):
+        raise ValueError("Provide events (value times) or a start_date and end_date.")
+
+    # Shared one-time setup: cloning/.env writes must not race between HUCs
+    code_dir, data_dir, output_dir = setup_directories()
+    clone_repository(code_dir, version)
+    EnvFile(code_dir)
+
+    results = {h: {"HUC8": h, "status": "pending", "error": None} for h in hucs}
+    lock = threading.Lock()
+
+    def _record(huc, **kwargs):
+        with lock:
+            results[huc].update(kwargs)
+
+    def _network_stage(huc):
+        t0 = time.time()
+        if download:
+            DownloadHUC8(
+                huc, stream_order=stream_order, version=version, setup_owp=False
+            )
+        t1 = time.time()
+        getNWMretrospectivedata(
+            huc=huc,
+            start_date=start_date,
+            end_date=end_date,
+            value_times=huc_events[huc],
+            discharge_sortby=discharge_sortby,
+        )
+        t2 = time.time()
+        _record(
+            huc,
+            **{
+                "HUC8 raster download time": round(t1 - t0, 2),
+                "NWM retrospective download time": round(t2 - t1, 2),
+            },
+        )
+        return huc
+
+    def _cpu_stage(huc, engine):
+        t0 = time.time()
+        failed = runOWPHANDFIM(huc, depth=depth, engine=engine) or []
+        _record(
+            huc,
+            **{
+                "Generating FIM time": round(time.time() - t0, 2),
+                "status": "failed" if failed else "ok",
+                "error": (
+                    f"{len(failed)} discharge file(s) failed" if failed else None
+                ),
+            },
+        )
+
+    batch_start = time.time()
+    with HANDInundationEngine(code_dir, output_dir, workers=cpu_workers) as engine:
+        # Fork the HAND workers now, before any download thread exists
+        engine.start()
+        # The FIM dispatcher only hands work to the engine; the engine bounds CPU use
+        with (
+            ThreadPoolExecutor(
+                max_workers=max(1, network_workers), thread_name_prefix="fim-net"
+            ) as net_pool,
+            ThreadPoolExecutor(
+                max_workers=max(1, min(len(hucs), engine.workers)),
+                thread_name_prefix="fim-cpu",
+            ) as cpu_pool,
+        ):
+            net_futures = {net_pool.submit(_network_stage, h): h for h in hucs}
+            cpu_futures = {}
+
+            for fut in as_completed(net_futures):
+                huc = net_futures[fut]
+                try:
+                    fut.result()
+                except Exception as e:
+                    print(f"Streamflow/download stage failed for HUC {huc}: {e}")
+                    _record(huc, status="failed", error=str(e))
+                    continue
+                cpu_futures[cpu_pool.submit(_cpu_stage, huc, engine)] = huc
+
+            for fut in as_completed(cpu_futures):
+                huc = cpu_futures[fut]
+                try:
+                    fut.result()
+                except Exception as e:
+                    print(f"FIM stage failed for HUC {huc}: {e}")
+                    _record(huc, status="failed", error=str(e))
+
+    summary = pd.DataFrame([results[h] for h in hucs])
+    print(
+        f"Batch of {len(hucs)} HUC(s) completed in {time.time() - batch_start:.1f} s "
+        f"({(summary['status'] == 'ok').sum()} succeeded)."
+    )
+    if summary_csv:
+        os.makedirs(os.path.dirname(os.path.abspath(summary_csv)), exist_ok=True)
+        summary.to_csv(summary_csv, index=False)
+    return summary
@@ -1,7 +1,17 @@
 import os
 import csv
+import json
+import threading
 import pandas as pd
 import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from botocore import UNSIGNED
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
 
 
 def setup_directories():
@@ -47,40 +57,390 @@ def clone_repository(code_dir, version=None):
     print(f"Repository cloned into: {repo_path} (version: {version_tag})")
 
 
-def download_data(huc_number, base_dir, version=None):
-    output_dir = os.path.join(base_dir, f"flood_{huc_number}", str(huc_number))
+# HAND FIM assets are public; an unsigned client is enough
+HAND_BUCKET = "ciroh-owp-hand-fim"
+HAND_PREFIX = {"4.5": "hand_fim_4_5_2_11", "default": "hand_fim_4_8_7_2"}
+MANIFEST_NAME = "download_manifest.json"
+
+_S3_CLIENT = None
+_S3_LOCK = threading.Lock()
+
+
+def _s3_client():
+    global _S3_CLIENT
+    with _S3_LOCK:
+        if _S3_CLIENT is None:
+            _S3_CLIENT = boto3.client(
+                "s3",
+                config=Config(
+                    signature_version=UNSIGNED,
+                    max_pool_connections=64,
+                    retries={"max_attempts": 10, "mode": "adaptive"},
+                ),
+            )
+    return _S3_CLIENT
+
+
+def _hand_s3_prefix(huc_number, version=None):
+    root = HAND_PREFIX.get(version, HAND_PREFIX["default"])
+    return f"{root}/{huc_number}/"
+
+
+def _list_objects(client, bucket, prefix):
+    """List every object under prefix as {relative_key: {size, etag}}."""
+    objects = {}
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []) or []:
+            rel = obj["Key"][len(prefix) :]
+            if not rel or rel.endswith("/"):
+                continue
+            objects[rel] = {"size": obj["Size"], "etag": obj["ETag"].strip('"')}
+    return objects
+
+
+def _read_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(manifest_path, manifest):
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, manifest_path)
+
+
+def _manifest_is_complete(manifest, output_dir, source):
+    """True when the manifest says the prefix is fully synced and every file is still on disk."""
+    if not manifest or not manifest.get("complete") or manifest.get("source") != source:
+        return False
+    for rel, meta in manifest.get("objects", {}).items():
+        local = os.path.join(output_dir, rel)
+        if not os.path.exists(local) or os.path.getsize(local) != meta["size"]:
+            return False
+    return True
+
+
+def _is_up_to_date(local, meta, previous):
+    if not os.path.exists(local) or os.path.getsize(local) != meta["size"]:
+        return False
+    # Same size; if we recorded an ETag before it must also match
+    return previous is None or previous.get("etag") == meta["etag"]
+
+
+def _remove_if_exists(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _get_range(client, bucket, key, etag, start, end=None):
+    """Body of a ranged GET; IfMatch makes S3 answer 412 if the object was replaced."""
+    kwargs = {
+        "Bucket": bucket,
+        "Key": key,
+        "Range": f"bytes={start}-{'' if end is None else end}",
+    }
+    if etag:
+        kwargs["IfMatch"] = f'"{etag}"'
+    return client.get_object(**kwargs)["Body"]
+
+
+def _is_precondition_failed(error):
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get(
+        "Code"
+    ) in ("PreconditionFailed", "412")
+
+
+def _fetch_stream(client, bucket, key, size, etag, part):
+    """Single ranged GET appended to part, resuming from its current size."""
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset >= size or os.path.exists(part + ".json"):
+        # A preallocated part from _fetch_ranges is not a contiguous prefix
+        _remove_if_exists(part + ".json")
+        offset = 0
+    body = _get_range(client, bucket, key, etag, offset)
+    with open(part, "ab" if offset else "wb") as f:
+        for chunk in body.iter_chunks(chunk_size=1024 * 1024):
+            f.write(chunk)
+
+
+def _fetch_ranges(client, bucket, key, size, etag, part, transfer_config):
+    """
+    Parallel ranged GETs written in place into a preallocated part file.
+    Finished ranges are recorded in part + ".json" so a re-run only fetches the rest.
+    """
+    state_path = part + ".json"
+    chunk = transfer_config.multipart_chunksize
+    expected = {"etag": etag, "size": size, "chunk": chunk}
+    state = _read_manifest(state_path) if os.path.exists(part) else None
+    if not state or any(state.get(k) != v for k, v in expected.items()):
+        state = dict(expected, done=[])
+        with open(part, "wb") as f:
+            f.truncate(size)
+        _write_manifest(state_path, state)
+
+    done = set(state["done"])
+    lock = threading.Lock()
+
+    def _fetch(start):
+        body = _get_range(
+            client, bucket, key, etag, start, min(start + chunk, size) - 1
+        )
+        with open(part, "r+b") as f:
+            f.seek(start)
+            for data in body.iter_chunks(chunk_size=1024 * 1024):
+                f.write(data)
+        with lock:
+            done.add(start)
+            state["done"] = sorted(done)
+            _write_manifest(state_path, state)
+
+    pending = [start for start in range(0, size, chunk) if start not in done]
+    with ThreadPoolExecutor(
+        max_workers=max(1, transfer_config.max_concurrency)
+    ) as pool:
+        for fut in [pool.submit(_fetch, start) for start in pending]:
+            fut.result()
+    os.remove(state_path)
+
+
+def _fetch_object(client, bucket, key, size, dest, transfer_config, etag=None):
+    """
+    Download one object to dest through a .part file with ranged GETs.
+    Files of at least multipart_threshold are split into parallel byte ranges. An
+    interrupted .part is resumed with IfMatch on the listed ETag; if the object was
+    replaced on S3 the partial is dropped so the next sync starts over.
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    part = dest + ".part"
+    try:
+        if size >= transfer_config.multipart_threshold:
+            _fetch_ranges(client, bucket, key, size, etag, part, transfer_config)
+        else:
+            _fetch_stream(client, bucket, key, size, etag, part)
+    except ClientError as e:
+        if not _is_precondition_failed(e):
+            raise
+        # Replaced on S3 since it was listed: drop the partial and start over
+        for path in (part, part + ".json"):
+            _remove_if_exists(path)
+        raise IOError(
+            f"s3://{bucket}/{key} changed since it was listed; re-run to fetch the new version"
+        ) from e
+
+    if os.path.getsize(part) != size:
+        raise IOError(
+            f"Size mismatch for s3://{bucket}/{key}: expected {size}, got {os.path.getsize(part)}"
+        )
+    os.replace(part, dest)
+    return dest
+
+
+def sync_s3_prefix(
+    bucket,
+    prefix,
+    output_dir,
+    workers=16,
+    refresh=False,
+    include=None,
+    source=None,
+    manifest_path=None,
+):
+    """
+    Mirror s3://bucket/prefix into output_dir with a thread pool.
+
+    - Skips files whose size (and recorded ETag) already match.
+    - Resumes partially downloaded files.
+    - Writes a manifest so later calls can skip the network entirely.
+    - include: optional callable(relative_key) -> bool to download only a subset.
+    """
     os.makedirs(output_dir, exist_ok=True)
+    source = source or f"s3://{bucket}/{prefix}"
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
 
-    # Determine S3 path based on version
-    if version == "4.5":
-        s3_path = f"s3://ciroh-owp-hand-fim/hand_fim_4_5_2_11/{huc_number}/"
-    else:
-        s3_path = f"s3://ciroh-owp-hand-fim/hand_fim_4_8_7_2/{huc_number}/"
+    if (
+        not refresh
+        and include is None
+        and _manifest_is_complete(manifest, output_dir, source)
+    ):
+        print(f"All files already present for {source} (manifest), skipping download.")
+        return manifest
 
-    # Run the AWS CLI command with no-sign-request
-    cmd = f"aws s3 sync {s3_path} {output_dir} --no-sign-request"
-    os.system(cmd)
-    print(f"Data for HUC {huc_number} downloaded to {output_dir}")
+    client = _s3_client()
+    remote = _list_objects(client, bucket, prefix)
+    if not remote:
+        raise FileNotFoundError(f"No objects found at {source}")
 
-    # Copy branch_ids.csv to fim_inputs.csv
-    hydrotable_path = os.path.join(output_dir, "branch_ids.csv")
-    fim_inputs_path = os.path.join(base_dir, f"flood_{huc_number}", "fim_inputs.csv")
+    selected = {
+        rel: meta for rel, meta in remote.items() if include is None or include(rel)
+    }
+    previous = (manifest or {}).get("objects", {}) if not refresh else {}
+    pending = {
+        rel: meta
+        for rel, meta in selected.items()
+        if not _is_up_to_date(os.path.join(output_dir, rel), meta, previous.get(rel))
+    }
+
+    transfer_config = TransferConfig(
+        multipart_threshold=32 * 1024 * 1024,
+        multipart_chunksize=16 * 1024 * 1024,
+        max_concurrency=4,
+        use_threads=True,
+    )
 
+    failed = {}
+    done = 0
+    if pending:
+        print(
+            f"Downloading {len(pending)} of {len(selected)} file(s) from {source} with {workers} workers..."
+        )
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {
+                pool.submit(
+                    _fetch_object,
+                    client,
+                    bucket,
+                    prefix + rel,
+                    meta["size"],
+                    os.path.join(output_dir, rel),
+                    transfer_config,
+                    meta["etag"],
+                ): rel
+                for rel, meta in pending.items()
+            }
+            for fut in as_completed(futures):
+                rel = futures[fut]
+                try:
+                    fut.result()
+                    done += 1
+                except Exception as e:
+                    failed[rel] = str(e)
+
+    objects = {rel: meta for rel, meta in selected.items() if rel not in failed}
+    manifest = {
+        "source": source,
+        "complete": not failed and include is None,
+        "updated": datetime.now(timezone.utc).isoformat(),
+        "objects": objects,
+    }
+    _write_manifest(manifest_path, manifest)
+
+    if failed:
+        details = "\n".join(f" - {k}: {v}" for k, v in list(failed.items())[:10])
+        raise RuntimeError(
+            f"{len(failed)} file(s) failed to download from {source} (re-run to resume):\n{details}"
+        )
+    print(f"{done} file(s) downloaded, {len(selected) - done} already up to date.")
+    return manifest
+
+
+def _branch_of(rel_key):
+    """Branch ID of a HUC-relative key like 'branches/<id>/...', or None for HUC-level files."""
+    parts = rel_key.split("/")
+    if len(parts) > 2 and parts[0] == "branches":
+        return parts[1]
+    return None
+
+
+def select_branches(hydrotable_path, stream_order=None, feature_ids=None):
+    """Branch IDs whose hydrotable rows contain the requested stream orders / feature IDs."""
+    hydrotable_df = pd.read_csv(
+        hydrotable_path,
+        usecols=["branch_id", "feature_id", "order_"],
+        dtype={"branch_id": str},
+    )
+    filtered = _filter_hydrotable(hydrotable_df, stream_order, feature_ids)
+    return set(filtered["branch_id"].astype(str).unique())
+
+
+def _write_fim_inputs(branch_ids_path, fim_inputs_path, branches=None):
+    # fim_inputs.csv drives which branches OWP inundates; keep it in sync with what is on disk
     with (
-        open(hydrotable_path, "r") as infile,
+        open(branch_ids_path, "r") as infile,
         open(fim_inputs_path, "w", newline="") as outfile,
     ):
         reader = csv.reader(infile)
         writer = csv.writer(outfile)
         for row in reader:
-            writer.writerow(row)
+            if branches is None or len(row) < 2 or row[1].strip() in branches:
+                writer.writerow(row)
 
-    print(f"Copied {hydrotable_path} to {fim_inputs_path} as fim_inputs.csv.")
 
+def download_data(
+    huc_number,
+    base_dir,
+    version=None,
+    workers=16,
+    refresh=False,
+    stream_order=None,
+    feature_ids=None,
+    selective=False,
+):
+    output_dir = os.path.join(base_dir, f"flood_{huc_number}", str(huc_number))
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(base_dir, f"flood_{huc_number}", MANIFEST_NAME)
+
+    # Determine S3 path based on version
+    prefix = _hand_s3_prefix(huc_number, version)
+    branches = None
 
-def uniqueFID(hydrotable, fid_dir, stream_order=None):
-    hydrotable_df = pd.read_csv(hydrotable)
+    if selective and (stream_order is not None or feature_ids is not None):
+        # Fetch the branch/hydrotable index first, then only the branches that are needed
+        sync_s3_prefix(
+            HAND_BUCKET,
+            prefix,
+            output_dir,
+            workers=workers,
+            refresh=refresh,
+            include=lambda rel: rel in ("branch_ids.csv", "hydrotable.csv"),
+            manifest_path=manifest_path,
+        )
+        branches = select_branches(
+            os.path.join(output_dir, "hydrotable.csv"), stream_order, feature_ids
+        )
+        if not branches:
+            raise ValueError(
+                f"No branches in HUC {huc_number} contain the requested stream orders/feature IDs."
+            )
+        print(
+            f"Selective download: {len(branches)} branch(es) needed for {huc_number}."
+        )
+        sync_s3_prefix(
+            HAND_BUCKET,
+            prefix,
+            output_dir,
+            workers=workers,
+            refresh=refresh,
+            include=lambda rel: _branch_of(rel) is None or _branch_of(rel) in branches,
+            manifest_path=manifest_path,
+        )
+    else:
+        sync_s3_prefix(
+            HAND_BUCKET,
+            prefix,
+            output_dir,
+            workers=workers,
+            refresh=refresh,
+            manifest_path=manifest_path,
+        )
+    print(f"Data for HUC {huc_number} downloaded to {output_dir}")
+
+    # Copy branch_ids.csv to fim_inputs.csv
+    hydrotable_path = os.path.join(output_dir, "branch_ids.csv")
+    fim_inputs_path = os.path.join(base_dir, f"flood_{huc_number}", "fim_inputs.csv")
+    _write_fim_inputs(hydrotable_path, fim_inputs_path, branches)
+
+    print(f"Copied {hydrotable_path} to {fim_inputs_path} as fim_inputs.csv.")
 
+
+def _filter_hydrotable(hydrotable_df, stream_order=None, feature_ids=None):
     if stream_order:
         if isinstance(stream_order, str) and (
             ">=" in stream_order
@@ -125,6 +485,22 @@ def uniqueFID(hydrotable, fid_dir, stream_order=None):
         # No filter, use the whole dataset
         hydrotable_df_filtered = hydrotable_df
 
+    if feature_ids is not None:
+        if isinstance(feature_ids, (str, int)):
+            feature_ids = [feature_ids]
+        wanted = {int(fid) for fid in feature_ids}
+        hydrotable_df_filtered = hydrotable_df_filtered[
+            hydrotable_df_filtered["feature_id"].astype("int64").isin(wanted)
+        ]
+    return hydrotable_df_filtered
+
+
+def uniqueFID(hydrotable, fid_dir, stream_order=None, feature_ids=None):
+    hydrotable_df = pd.read_csv(hydrotable)
+    hydrotable_df_filtered = _filter_hydrotable(
+        hydrotable_df, stream_order, feature_ids
+    )
+
     unique_FIDs = hydrotable_df_filtered["feature_id"].drop_duplicates()
     unique_FIDs_df = pd.DataFrame(unique_FIDs, columns=["feature_id"])
     unique_FIDs_df.to_csv(fid_dir, index=False)
@@ -140,22 +516,56 @@ def EnvFile(code_dir):
     """
     os.makedirs(os.path.dirname(env_dir), exist_ok=True)
 
-    with open(env_dir, "w") as f:
+    # Written to a temp file and swapped in, so readers never see a truncated .env
+    tmp = f"{env_dir}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
         f.write(env_content)
+    os.replace(tmp, env_dir)
 
 
-def DownloadHUC8(huc, stream_order=None, version=None):
+def DownloadHUC8(
+    huc,
+    stream_order=None,
+    version=None,
+    workers=16,
+    refresh=False,
+    feature_ids=None,
+    selective=False,
+    setup_owp=True,
+):
+    """
+    Download the OWP HAND FIM rasters/hydrotables of a HUC8.
+
+    :param stream_order: Keep only these stream orders (list, single value or condition like '>=3').
+    :param feature_ids: Keep only these NWM feature IDs.
+    :param workers: Number of parallel S3 transfers.
+    :param refresh: If True, ignore the local manifest and re-check every file against S3.
+    :param selective: If True with stream_order/feature_ids, download only the branches that contain them.
+    :param setup_owp: If False, skip cloning the OWP repository and writing its .env
+        (already set up once, e.g. by run_batch).
+    """
     code_dir, data_dir, output_dir = setup_directories()
-    clone_repository(code_dir, version)
+    if setup_owp:
+        clone_repository(code_dir, version)
 
     # if huc is not str:
     huc = str(huc)
-    download_data(huc, output_dir, version)
-    EnvFile(code_dir)
+    download_data(
+        huc,
+        output_dir,
+        version,
+        workers=workers,
+        refresh=refresh,
+        stream_order=stream_order,
+        feature_ids=feature_ids,
+        selective=selective,
+    )
+    if setup_owp:
+        EnvFile(code_dir)
     HUC_dir = os.path.join(output_dir, f"flood_{huc}")
     hydrotable_dir = os.path.join(HUC_dir, str(huc), "hydrotable.csv")
     featureID_dir = os.path.join(HUC_dir, f"feature_IDs.csv")
-    if stream_order is None:
+    if stream_order is None and feature_ids is None:
         uniqueFID(hydrotable_dir, featureID_dir)
     else:
-        uniqueFID(hydrotable_dir, featureID_dir, stream_order)
+        uniqueFID(hydrotable_dir, featureID_dir, stream_order, feature_ids)
@@ -0,0 +1,218 @@
+"""
+CPU inference mode for the surrogate model (AttentionUNet) on nodes without a GPU.
+
+The fp32 eager model is wrapped in CPUInferenceModel, which:
+- pins the intra-op thread count,
+- feeds channels-last input (faster oneDNN convolutions),
+- runs the network as a frozen TorchScript graph (conv + BatchNorm folded) or
+  through torch.compile,
+- optionally runs under bf16 autocast.
+
+The first patches of a run are checked against the fp32 output (IoU of the
+binarized maps); below min_iou the wrapper falls back to the fp32 eager model.
+"""
+
+import os
+import copy
+import time
+
+import numpy as np
+import torch
+
+CPU_PRECISIONS = ("fp32", "bf16")
+CPU_JIT = ("trace", "compile", None)
+
+# Same cut-off as predict_optimized / predict_streaming
+THRESHOLD = 0.01
+
+
+def set_cpu_threads(threads=None):
+    """Intra-op threads for CPU inference (default: all cores); returns the count in use."""
+    threads = int(threads or os.getenv("FIMSERVE_SM_THREADS") or os.cpu_count() or 1)
+    torch.set_num_threads(threads)
+    try:
+        # Patches are batched, so a single inter-op thread avoids oversubscription
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel op
+        pass
+    return torch.get_num_threads()
+
+
+def _trace(net, sample):
+    """
+    TorchScript trace of net. Lightning modules go through to_torchscript, which
+    traces outside the Trainer checks of LightningModule properties.
+    """
+    if hasattr(net, "to_torchscript"):
+        return net.to_torchscript(
+            method="trace", example_inputs=sample, check_trace=False
+        )
+    return torch.jit.trace(net, sample, check_trace=False)
+
+
+def _autocast(precision):
+    if precision == "bf16":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return torch.autocast("cpu", enabled=False)
+
+
+class CPUInferenceModel:
+    """
+    Callable (B, C, H, W) -> (B, 1, H, W) fp32 logits, like the eager model.
+
+    :param model: The loaded fp32 AttentionUNet (eval mode, on CPU).
+    :param precision: "fp32" or "bf16" (autocast).
+    :param jit: "trace" (frozen TorchScript), "compile" (torch.compile) or None (eager).
+    :param channels_last: Use the channels-last memory format for weights and input.
+    :param sample_shape: Input shape used to trace the graph.
+    """
+
+    def __init__(
+        self,
+        model,
+        precision="fp32",
+        jit="trace",
+        channels_last=True,
+        threads=None,
+        sample_shape=(1, 8, 256, 256),
+    ):
+        if precision not in CPU_PRECISIONS:
+            raise ValueError(f"precision must be one of {CPU_PRECISIONS}.")
+        if jit not in CPU_JIT:
+            raise ValueError(f"jit must be one of {CPU_JIT}.")
+
+        self.model = model.eval()
+        self.precision = precision
+        self.jit = jit
+        self.channels_last = channels_last
+        self.threads = set_cpu_threads(threads)
+        self.parity = None
+
+        net = model
+        if channels_last:
+            # Module.to works in place; the shared fp32 model keeps its layout
+            net = copy.deepcopy(model).to(memory_format=torch.channels_last)
+        if jit == "trace":
+            sample = self._prepare(torch.zeros(sample_shape))
+            with torch.no_grad(), _autocast(precision):
+                traced = _trace(net, sample)
+                # Freezing folds BatchNorm into the convolutions
+                net = torch.jit.freeze(traced)
+                if precision == "fp32":
+                    net = torch.jit.optimize_for_inference(net)
+                # Warm-up runs let the profiling executor specialize the graph
+                net(sample)
+                net(sample)
+        elif jit == "compile":
+            net = torch.compile(net)
+        self.net = net
+
+    @property
+    def mode(self):
+        layout = "cl" if self.channels_last else "nchw"
+        return f"{self.precision}-{self.jit or 'eager'}-{layout}"
+
+    def _prepare(self, x):
+        x = x.float()
+        if self.channels_last:
+            return x.contiguous(memory_format=torch.channels_last)
+        return x.contiguous()
+
+    def __call__(self, x):
+        with torch.no_grad(), _autocast(self.precision):
+            out = self.net(self._prepare(x))
+        return out.float().contiguous()
+
+    def verify(self, batch, min_iou=0.99):
+        """
+        Parity check against the fp32 eager model on batch; falls back to it when the
+        IoU of the binarized outputs is below min_iou. Returns the parity report.
+        """
+        self.parity = cpu_parity(self.model, self, batch)
+        print(
+            f"   CPU mode {self.mode}: IoU vs fp32 {self.parity['iou']:.4f}, "
+            f"max |diff| {self.parity['max_abs_diff']:.3g}"
+        )
+        if self.parity["iou"] < min_iou:
+            print(f"   IoU below {min_iou}; falling back to fp32 eager inference.")
+            self.net = self.model
+            self.precision, self.jit, self.channels_last = "fp32", None, False
+        return self.parity
+
+
+def _binary_iou(a, b):
+    inter = np.logical_and(a, b).sum()
+    union = np.logical_or(a, b).sum()
+    return 1.0 if union == 0 else float(inter / union)
+
+
+def cpu_parity(reference, fast, batch, threshold=THRESHOLD):
+    """Max absolute logit difference and IoU of the binarized outputs of two models."""
+    with torch.no_grad():
+        ref = reference(batch.float()).float()
+        out = fast(batch).float()
+    return {
+        "max_abs_diff": float((ref - out).abs().max()),
+        "iou": _binary_iou((ref > threshold).numpy(), (out > threshold).numpy()),
+    }
+
+
+def sample_patches(stack, M=256, N=256, count=4):
+    """Up to count (M, N) patches across the middle row band of a (C, H, W) stack, zero-padded."""
+    C, H, W = stack.shape
+    r0 = max(0, H // 2 - M // 2)
+    starts = np.linspace(0, max(W - N, 0), num=count).astype(int)
+    patches = []
+    for c0 in dict.fromkeys(starts.tolist()):
+        patch = torch.zeros((C, M, N), dtype=torch.float32)
+        block = stack[:, r0 : r0 + M, c0 : c0 + N]
+        patch[:, : block.shape[1], : block.shape[2]] = block
+        patches.append(patch)
+    return torch.stack(patches)
+
+
+def benchmark_cpu_modes(model, batch, modes=None, repeats=3, threads=None):
+    """
+    Patches/sec and IoU drift against fp32 eager for each CPU mode.
+
+    :param modes: (precision, jit, channels_last) tuples; defaults to every combination
+        of CPU_PRECISIONS and CPU_JIT with channels-last.
+    :return: One dict per mode (mode, patches_per_sec, iou, max_abs_diff).
+    """
+    if modes is None:
+        modes = [(p, j, True) for p in CPU_PRECISIONS for j in CPU_JIT]
+    set_cpu_threads(threads)
+
+    def _rate(fn):
+        fn(batch)
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            fn(batch)
+        return repeats * batch.shape[0] / (time.perf_counter() - t0)
+
+    def _eager(x):
+        with torch.no_grad():
+            return model(x.float())
+
+    rows = [
+        {
+            "mode": "fp32-eager-nchw",
+            "patches_per_sec": _rate(_eager),
+            "iou": 1.0,
+            "max_abs_diff": 0.0,
+        }
+    ]
+    for precision, jit, channels_last in modes:
+        fast = CPUInferenceModel(
+            model,
+            precision=precision,
+            jit=jit,
+            channels_last=channels_last,
+            threads=threads,
+            sample_shape=tuple(batch.shape),
+        )
+        row = {"mode": fast.mode, "patches_per_sec": _rate(fast)}
+        row.update(cpu_parity(model, fast, batch))
+        rows.append(row)
+    return rows
@@ -1,28 +1,45 @@
 import gc
-import tempfile
+import os
+import threading
 from pathlib import Path
 import torch.nn.functional as F
+from rasterio.features import geometry_mask, bounds as geom_bounds
+from rasterio.windows import Window, bounds as window_bounds
 
 
 from .SM_preprocess import *
 from .surrogate_model import *
 from .utlis import *
 from .preprocessFIM import *
+from .SM_cpu import CPUInferenceModel, sample_patches
+from ..s3cache import s3_cached_file, s3_pinned_file
+
+MODEL_BUCKET = "sdmlab"
+MODEL_KEY = "SM_dataset/trained_model/SM_trainedmodel.ckpt"
+
+# Warm models per (checkpoint, device), reused across HUCs and events
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
 
 
 # MODEL LOADING
-def load_model(model):
-    """Downloads and loads the model checkpoint."""
-    fs = s3fs.S3FileSystem(anon=True)
-    bucket_path = "sdmlab/SM_dataset/trained_model/SM_trainedmodel.ckpt"
+def checkpoint_path(etag=None):
+    """
+    Local (cached) surrogate model checkpoint. Pin a version with etag or
+    FIMSERVE_SM_MODEL_ETAG; otherwise the latest upload is used.
+    """
+    etag = etag or os.getenv("FIMSERVE_SM_MODEL_ETAG")
+    if etag:
+        return s3_pinned_file(MODEL_BUCKET, MODEL_KEY, etag)
+    return s3_cached_file(MODEL_BUCKET, MODEL_KEY)
+
 
-    with fs.open(bucket_path, "rb") as s3file:
-        with tempfile.NamedTemporaryFile(suffix=".ckpt", delete=False) as tmp_ckpt:
-            tmp_ckpt.write(s3file.read())
-            tmp_ckpt_path = tmp_ckpt.name
+def load_model(model, ckpt_path=None):
+    """Loads the cached model checkpoint into model."""
+    ckpt_path = ckpt_path or checkpoint_path()
 
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    checkpoint = torch.load(tmp_ckpt_path, map_location=device)
+    checkpoint = torch.load(ckpt_path, map_location=device)
     model.load_state_dict(checkpoint["state_dict"])
     model.to(device)
     model.eval()
@@ -30,6 +47,35 @@ def load_model(model):
     return model, device
 
 
+def get_model(etag=None, cpu_mode=None):
+    """
+    Long-lived (model, device): the AttentionUNet is built and loaded once per checkpoint.
+    On CPU, cpu_mode ("fp32" or "bf16") wraps it in a CPUInferenceModel (traced,
+    channels-last, thread-tuned); None keeps the eager model.
+    """
+    ckpt_path = checkpoint_path(etag)
+    device_type = "cuda" if torch.cuda.is_available() else "cpu"
+    key = (ckpt_path, device_type)
+    with _MODELS_LOCK:
+        if key not in _MODELS:
+            _MODELS[key] = load_model(AttentionUNet(channel=8), ckpt_path)
+        model, device = _MODELS[key]
+        if device_type != "cpu" or cpu_mode is None:
+            return model, device
+
+        cpu_key = key + (cpu_mode,)
+        if cpu_key not in _MODELS:
+            try:
+                _MODELS[cpu_key] = (
+                    CPUInferenceModel(model, precision=cpu_mode),
+                    device,
+                )
+            except (RuntimeError, torch.jit.Error) as e:
+                print(f"CPU mode {cpu_mode} unavailable ({e}); using eager fp32.")
+                _MODELS[cpu_key] = (model, device)
+        return _MODELS[cpu_key]
+
+
 # HELPER FUNCTIONS
 def create_weight_map(M: int, N: int, device):
     """Creates a Gaussian weight map for smooth patch merging."""
@@ -206,47 +252,268 @@ def predict_optimized(
     return final_prediction, y, lf
 
 
-# MAIN FUNCTION
-def enhanceFIM(huc_id, patch_size=(256, 256), batch_size=32):
+# STREAMING PREDICTION
+def _pwb_shapes(reference_tif):
+    """Permanent water body polygons overlapping the reference raster, with their bounds."""
+    shapes = load_shapes(PWB_inS3(fs, bucket_name))
+    with rasterio.open(reference_tif) as ref:
+        b = ref.bounds
+    kept = []
+    for shp in shapes:
+        x0, y0, x1, y1 = geom_bounds(shp)
+        if x0 <= b.right and x1 >= b.left and y0 <= b.top and y1 >= b.bottom:
+            kept.append((shp, (x0, y0, x1, y1)))
+    return kept
+
+
+def _write_rows(dst, rows, row_off, pwb):
+    """Mask permanent water bodies in a block of final rows and write it."""
+    window = Window(0, row_off, rows.shape[1], rows.shape[0])
+    if pwb:
+        transform = dst.window_transform(window)
+        left, bottom, right, top = window_bounds(window, dst.transform)
+        shapes = [
+            shp
+            for shp, (x0, y0, x1, y1) in pwb
+            if x0 <= right and x1 >= left and y0 <= top and y1 >= bottom
+        ]
+        if shapes:
+            inside = geometry_mask(
+                shapes, out_shape=rows.shape, transform=transform, invert=True
+            )
+            rows[inside] = 0
+    dst.write(rows, 1, window=window)
 
-    device_type = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"\n{'='*60}\nSYSTEM: {device_type.upper()}\n{'='*60}")
 
-    data_dir = Path(f"./HUC{huc_id}_forcings/")
-    model = AttentionUNet(channel=8)
-    preprocessor = InferenceDataPreprocessor(
-        data_dir=Path(data_dir), patch_size=patch_size, verbose=True
+def predict_streaming(
+    stack,
+    model,
+    out_path,
+    reference_tif,
+    M: int = 256,
+    N: int = 256,
+    stride: int = 128,
+    device=None,
+    batch_size=32,
+    threshold=0.01,
+    mask_pwb=True,
+):
+    """
+    Row-band streaming version of predict_optimized + save_image.
+
+    Only a band of M input rows is held (stride new rows are read per step), patch
+    predictions are blended into M x W accumulators with F.fold, and output rows are
+    binarized, water-masked and written to a tiled GeoTIFF as soon as no later patch
+    can touch them. Peak memory is O(channels x M x W) instead of O(HUC).
+    """
+    C, H, W = stack.shape
+    # Same patch grid as predict_optimized: one column per stride, zero-padded at the edge
+    n_cols = (W - 1) // stride + 1
+    Wp = (n_cols - 1) * stride + N
+    keep = M - stride
+
+    weight = create_weight_map(M, N, "cpu").reshape(M * N, 1)
+    row_weight = F.fold(
+        weight.expand(M * N, n_cols).unsqueeze(0),
+        output_size=(M, Wp),
+        kernel_size=(M, N),
+        stride=(M, stride),
+    )[0, 0]
+
+    band = torch.zeros((C, M, Wp), dtype=torch.float32)
+    acc = torch.zeros((M, Wp), dtype=torch.float32)
+    wsum = torch.zeros((M, Wp), dtype=torch.float32)
+
+    with rasterio.open(reference_tif) as ref:
+        meta = ref.meta.copy()
+    meta.update(
+        {
+            "driver": "GTiff",
+            "height": H,
+            "width": W,
+            "count": 1,
+            "dtype": "float32",
+            "compress": "lzw",
+            "tiled": True,
+            "blockxsize": 256,
+            "blockysize": 256,
+            "BIGTIFF": "IF_SAFER",
+        }
     )
+    pwb = _pwb_shapes(reference_tif) if mask_pwb else []
 
-    print("Loading model...")
-    model, device = load_model(model)
+    total_rows = (H - 1) // stride + 1
+    print(f"   Starting streaming inference on {H}x{W} image...")
 
-    lf_files = preprocessor.get_all_lf_maps(huc_id)
+    pending, pending_off = [], 0
+    with rasterio.open(out_path, "w", **meta) as dst:
+        for step, r in enumerate(range(0, H, stride)):
+            # Input band rows [r, r + M): reuse the overlap, read only the new rows
+            if step == 0:
+                lo = 0
+            else:
+                band[:, :keep] = band[:, stride:].clone()
+                band[:, keep:] = 0
+                lo = keep
+            a, b = r + lo, min(r + M, H)
+            if b > a:
+                band[:, lo : lo + (b - a), :W] = stack[:, a:b, :]
+
+            # Predict the patch row in batches and fold it into the accumulators
+            patches = band.unfold(2, N, stride).permute(2, 0, 1, 3)
+            for i in range(0, n_cols, batch_size):
+                batch = patches[i : i + batch_size].contiguous().to(device)
+                with torch.no_grad():
+                    preds = model(batch).float().cpu()
+                n = preds.shape[0]
+                blended = (preds[:, :1] * weight.reshape(1, 1, M, N)).reshape(n, M * N)
+                width = (n - 1) * stride + N
+                c0 = i * stride
+                acc[:, c0 : c0 + width] += F.fold(
+                    blended.T.unsqueeze(0),
+                    output_size=(M, width),
+                    kernel_size=(M, N),
+                    stride=(M, stride),
+                )[0, 0]
+                del batch, preds
+            wsum += row_weight
+
+            # Rows [r, r + stride) are final: no later patch row starts above r + stride
+            n_final = min(stride, H - r)
+            final = acc[:n_final, :W] / (wsum[:n_final, :W] + 1e-8)
+            pending.append((final > threshold).numpy().astype(np.float32))
+            if sum(p.shape[0] for p in pending) >= meta["blockysize"]:
+                rows = np.concatenate(pending)
+                _write_rows(dst, rows, pending_off, pwb)
+                pending_off += rows.shape[0]
+                pending = []
+
+            acc[:keep] = acc[stride:].clone()
+            acc[keep:] = 0
+            wsum[:keep] = wsum[stride:].clone()
+            wsum[keep:] = 0
+
+            print(
+                f"   Progress: {step + 1}/{total_rows} row bands ({100*(step + 1)/total_rows:.1f}%)",
+                end="\r",
+            )
 
-    for idx, lf_path in enumerate(lf_files, 1):
-        lf_filename = lf_path.name
-        print(f"\nProcessing [{idx}/{len(lf_files)}]: {lf_filename}")
+        if pending:
+            _write_rows(dst, np.concatenate(pending), pending_off, pwb)
 
-        static_stack = preprocessor.get_static_stack(huc_id)
-        lf_tensor = preprocessor.tif_to_tensor(lf_path, feature_name="low_fidelity")
+    print(f"   Progress: 100% - Inference Complete.")
+    return Path(out_path)
 
-        print("Merging tensors...")
-        area_tensor = torch.cat([static_stack, lf_tensor], dim=0)
 
-        del static_stack
-        del lf_tensor
+def _predict_streaming_map(
+    area_tensor, model, device, pred_path, lf_path, patch_size, batch_size
+):
+    """predict_streaming with the OOM retry at batch_size=4."""
+    try:
+        predict_streaming(
+            area_tensor,
+            model,
+            pred_path,
+            str(lf_path),
+            M=patch_size[0],
+            N=patch_size[1],
+            stride=patch_size[0] // 2,
+            device=device,
+            batch_size=batch_size,
+        )
+    except RuntimeError as e:
+        if "out of memory" not in str(e):
+            raise e
+        print("OOM Error. Retrying with batch_size=4...")
+        torch.cuda.empty_cache()
         gc.collect()
-
-        print(
-            f"Tensor Shape: {area_tensor.shape} | Memory: {area_tensor.element_size() * area_tensor.nelement() / 1e9:.2f} GB"
+        predict_streaming(
+            area_tensor,
+            model,
+            pred_path,
+            str(lf_path),
+            M=patch_size[0],
+            N=patch_size[1],
+            stride=patch_size[0] // 2,
+            device=device,
+            batch_size=4,
         )
 
-        class Dummy:
-            x_feature_index = slice(None)
-            y_feature_index = [area_tensor.shape[0] - 1]
-            lf_index = area_tensor.shape[0] - 1
 
+# MAIN FUNCTION
+def predict_lf_map(
+    huc_id,
+    lf_path,
+    model,
+    device,
+    preprocessor,
+    out_dir,
+    patch_size=(256, 256),
+    batch_size=32,
+    streaming=True,
+):
+    """
+    Predicts one low-fidelity map of a HUC and saves SMprediction_<name>; returns its path.
+    streaming=True uses predict_streaming (bounded memory); False the in-memory predict_optimized.
+    """
+    lf_path = Path(lf_path)
+    lf_filename = lf_path.name
+
+    # Static layers are memory-mapped (built once per HUC); patches are read lazily
+    static_stack = preprocessor.get_static_stack_mmap(huc_id)
+    if static_stack is None:
+        raise FileNotFoundError(f"Static forcings are incomplete for HUC {huc_id}.")
+    # Streaming reads the LF map row band by row band; the in-memory path loads it whole
+    if streaming:
+        lf_tensor = LowFidelityRaster(lf_path)
+    else:
+        lf_tensor = preprocessor.tif_to_tensor(lf_path, feature_name="low_fidelity")
+    area_tensor = ForcingStack(static_stack, lf_tensor)
+
+    print(
+        f"Stack Shape: {area_tensor.shape} | Static stack (memory-mapped): {static_stack.nbytes / 1e9:.2f} GB"
+    )
+
+    class Dummy:
+        x_feature_index = slice(None)
+        y_feature_index = [area_tensor.shape[0] - 1]
+        lf_index = area_tensor.shape[0] - 1
+
+    # CPU mode: check parity against fp32 on real patches before the first map
+    if isinstance(model, CPUInferenceModel) and model.parity is None:
+        model.verify(sample_patches(area_tensor, patch_size[0], patch_size[1]))
+
+    pred_dir = Path(out_dir)
+    pred_dir.mkdir(parents=True, exist_ok=True)
+    pred_path = pred_dir / f"SMprediction_{lf_filename}"
+
+    if streaming:
         try:
+            _predict_streaming_map(
+                area_tensor, model, device, pred_path, lf_path, patch_size, batch_size
+            )
+        finally:
+            lf_tensor.close()
+        print(f"✓ Saved: {pred_path}")
+        return pred_path
+
+    try:
+        x, y, lf = predict_optimized(
+            Dummy,
+            model,
+            area_tensor,
+            M=patch_size[0],
+            N=patch_size[1],
+            stride=patch_size[0] // 2,
+            device=device,
+            batch_size=batch_size,
+        )
+
+    except RuntimeError as e:
+        if "out of memory" in str(e):
+            print("OOM Error. Retrying with batch_size=4...")
+            torch.cuda.empty_cache()
+            gc.collect()
             x, y, lf = predict_optimized(
                 Dummy,
                 model,
@@ -255,37 +522,76 @@ def enhanceFIM(huc_id, patch_size=(256, 256), batch_size=32):
                 N=patch_size[1],
                 stride=patch_size[0] // 2,
                 device=device,
-                batch_size=batch_size,
+                batch_size=4,
             )
+        else:
+            raise e
 
-        except RuntimeError as e:
-            if "out of memory" in str(e):
-                print("OOM Error. Retrying with batch_size=4...")
-                torch.cuda.empty_cache()
-                gc.collect()
-                x, y, lf = predict_optimized(
-                    Dummy,
-                    model,
-                    area_tensor,
-                    M=patch_size[0],
-                    N=patch_size[1],
-                    stride=patch_size[0] // 2,
-                    device=device,
-                    batch_size=4,
-                )
-            else:
-                raise e
+    del area_tensor, static_stack, lf_tensor
+    gc.collect()
+    if device.type == "cuda":
+        torch.cuda.empty_cache()
 
-        del area_tensor
-        gc.collect()
-        if device.type == "cuda":
-            torch.cuda.empty_cache()
+    save_image(x, pred_path, str(lf_path))
+    print(f"✓ Saved: {pred_path}")
+    return pred_path
 
-        pred_dir = Path(f"./Results/HUC{huc_id}/")
-        pred_dir.mkdir(parents=True, exist_ok=True)
-        pred_path = pred_dir / f"SMprediction_{lf_filename}"
 
-        save_image(x, pred_path, str(lf_path))
-        print(f"✓ Saved: {pred_path}")
+def enhanceFIM(
+    huc_id,
+    patch_size=(256, 256),
+    batch_size=32,
+    lf_paths=None,
+    forcing_dir=None,
+    out_dir=None,
+    streaming=True,
+    cpu_mode="fp32",
+):
+    """
+    Surrogate model enhancement of the low-fidelity FIMs of a HUC.
+
+    :param lf_paths: Only these low-fidelity maps (default: every LF map in the forcing folder).
+    :param forcing_dir: Forcing folder (default ./HUC<huc_id>_forcings).
+    :param out_dir: Prediction folder (default ./Results/HUC<huc_id>).
+    :param streaming: Row-band streaming inference with bounded memory (False: whole HUC in memory).
+    :param cpu_mode: Without a GPU: "fp32" or "bf16" traced channels-last inference, checked
+        against fp32 on the first map (None: eager fp32). Threads: FIMSERVE_SM_THREADS.
+    :return: Paths of the saved predictions.
+    """
+    device_type = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"\n{'='*60}\nSYSTEM: {device_type.upper()}\n{'='*60}")
+
+    data_dir = Path(forcing_dir or f"./HUC{huc_id}_forcings/")
+    out_dir = Path(out_dir or f"./Results/HUC{huc_id}/")
+    preprocessor = InferenceDataPreprocessor(
+        data_dir=Path(data_dir), patch_size=patch_size, verbose=True
+    )
+
+    print("Loading model...")
+    model, device = get_model(cpu_mode=cpu_mode)
+
+    lf_files = (
+        [Path(p) for p in lf_paths]
+        if lf_paths
+        else preprocessor.get_all_lf_maps(huc_id)
+    )
+
+    predictions = []
+    for idx, lf_path in enumerate(lf_files, 1):
+        print(f"\nProcessing [{idx}/{len(lf_files)}]: {lf_path.name}")
+        predictions.append(
+            predict_lf_map(
+                huc_id,
+                lf_path,
+                model,
+                device,
+                preprocessor,
+                out_dir,
+                patch_size=patch_size,
+                batch_size=batch_size,
+                streaming=streaming,
+            )
+        )
 
     print(f"\n{'='*60}\nCOMPLETED\n{'='*60}")
+    return predictions
@@ -1,9 +1,11 @@
+import os
+import json
 import torch
 import rasterio
+from rasterio.windows import Window
 import numpy as np
 from pathlib import Path
 import torch.nn as nn
-from scipy.stats import boxcox
 
 GLOBAL_STATS = {
     "elevation": {"mean": 651.62, "std": 935.30},
@@ -15,6 +17,39 @@ GLOBAL_STATS = {
 }
 
 
+# LULC classes -> model classes (anything else -> 0)
+LULC_RECLASS = {1: 1, 2: 2, 4: 3, 3: 4, 8: 5, 6: 6, 7: 7, 5: 8, 9: 9}
+LULC_LUT = np.zeros(max(LULC_RECLASS) + 2, dtype=np.float32)
+for _k, _v in LULC_RECLASS.items():
+    LULC_LUT[_k] = _v
+
+
+def _zscore_inplace(array: np.ndarray, mean: float, std: float) -> np.ndarray:
+    array -= mean
+    array /= std + 1e-7
+    return array
+
+
+def _boxcox_inplace(array: np.ndarray, lmbda: float = 0.5) -> np.ndarray:
+    """Box-Cox of (array + 1e-6) in place; same values as scipy.stats.boxcox(x, lmbda)."""
+    array += 1e-6
+    with np.errstate(invalid="ignore", divide="ignore"):
+        np.log(array, out=array)
+        if lmbda != 0:
+            array *= lmbda
+            np.expm1(array, out=array)
+            array /= lmbda
+    return array
+
+
+def _reclass_inplace(array: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Lookup-table reclassification of integer class codes stored in a float array."""
+    codes = array.astype(np.int32)
+    codes[(codes < 0) | (codes >= len(lut) - 1)] = len(lut) - 1
+    np.take(lut, codes, out=array)
+    return array
+
+
 # INFERENCE DATA PREPROCESSOR
 class InferenceDataPreprocessor:
 
@@ -48,46 +83,37 @@ class InferenceDataPreprocessor:
         self.global_stats = global_stats if global_stats else GLOBAL_STATS
 
     def tif_to_tensor(self, path: Path, feature_name: str = None) -> torch.Tensor:
+        # Everything below works in place on the array read from the raster, which
+        # then backs the returned tensor (no further full-size copies)
         with rasterio.open(path) as src:
-            array = src.read(1).astype(np.float32)
+            array = src.read(1, out_dtype=np.float32)
             nodata_value = src.nodata
-            if nodata_value is not None:
-                array[array == nodata_value] = np.nan
-            array = np.nan_to_num(array, nan=0.0)
-            tensor = torch.tensor(array, dtype=torch.float32).unsqueeze(0)
-
-            if feature_name == "elevation":
-                mean, std = self.global_stats["elevation"].values()
-                tensor = (tensor - mean) / (std + 1e-7)
-            elif feature_name == "slope":
-                tensor = self.apply_boxcox(tensor)
-                mean, std = self.global_stats["slope"].values()
-                tensor = (tensor - mean) / (std + 1e-7)
-            elif feature_name == "flow_acc":
-                tensor = self.apply_boxcox(tensor)
-                mean, std = self.global_stats["flow_acc"].values()
-                tensor = (tensor - mean) / (std + 1e-7)
-            elif feature_name == "lulc":
-                reclass_map = {1: 1, 2: 2, 4: 3, 3: 4, 8: 5, 6: 6, 7: 7, 5: 8, 9: 9}
-                array = array.astype(np.int32)
-                reclass_array = np.vectorize(lambda x: reclass_map.get(x, 0))(
-                    array
-                ).astype(np.float32)
-                tensor = torch.tensor(reclass_array, dtype=torch.float32).unsqueeze(0)
-            elif feature_name == "low_fidelity":
-                tensor = (tensor > 0).float()
-            elif feature_name in self.global_stats:
-                min_val = self.global_stats[feature_name]["min"]
-                max_val = self.global_stats[feature_name]["max"]
-                tensor = (tensor - min_val) / (max_val - min_val + 1e-7)
-
-            return tensor
+        if nodata_value is not None:
+            array[array == nodata_value] = 0.0
+        np.nan_to_num(array, copy=False, nan=0.0)
+
+        if feature_name == "elevation":
+            stats = self.global_stats["elevation"]
+            _zscore_inplace(array, stats["mean"], stats["std"])
+        elif feature_name in ("slope", "flow_acc"):
+            _boxcox_inplace(array)
+            stats = self.global_stats[feature_name]
+            _zscore_inplace(array, stats["mean"], stats["std"])
+        elif feature_name == "lulc":
+            _reclass_inplace(array, LULC_LUT)
+        elif feature_name == "low_fidelity":
+            np.copyto(array, array > 0)
+        elif feature_name in self.global_stats:
+            min_val = self.global_stats[feature_name]["min"]
+            max_val = self.global_stats[feature_name]["max"]
+            array -= min_val
+            array /= max_val - min_val + 1e-7
+
+        return torch.from_numpy(array).unsqueeze(0)
 
     def apply_boxcox(self, tensor: torch.Tensor, lmbda=0.5) -> torch.Tensor:
-        tensor = tensor + 1e-6
-        flat_np = tensor.flatten().numpy()
-        transformed = boxcox(flat_np, lmbda=lmbda)
-        return torch.tensor(transformed).reshape(tensor.shape)
+        array = tensor.numpy().astype(np.float32, copy=True)
+        return torch.from_numpy(_boxcox_inplace(array, lmbda))
 
     def patchify(self, data: torch.Tensor):
         C, H, W = data.shape
@@ -101,16 +127,67 @@ class InferenceDataPreprocessor:
         patches = patches.permute(1, 2, 0, 3, 4).reshape(-1, C, self.M, self.N)
         return patches
 
-    def get_static_stack(self, huc_id: str):
-        tensors = []
+    def _static_sources(self, huc_id: str):
+        sources = []
         for feature in self.STATIC_FEATURES:
             search_key = self.FEATURE_FILENAME_MAP[feature]
             match = list(self.data_dir.glob(f"*{search_key}*{huc_id}*.tif"))
             if not match:
                 print(f"Missing static feature: {feature} for {huc_id}")
                 return None
-            tensors.append(self.tif_to_tensor(match[0], feature_name=feature))
-        return torch.cat(tensors, dim=0)
+            sources.append((feature, match[0]))
+        return sources
+
+    def static_stack_path(self, huc_id: str) -> Path:
+        return self.data_dir / f"static_stack_{huc_id}.npy"
+
+    def get_static_stack_mmap(self, huc_id: str):
+        """
+        Normalized static layers of a HUC as a read-only memory-mapped (C, H, W) float32
+        array. It is built once (one layer in memory at a time) into
+        static_stack_<huc>.npy and rebuilt only when the static rasters or the
+        normalization statistics change.
+        """
+        sources = self._static_sources(huc_id)
+        if sources is None:
+            return None
+
+        path = self.static_stack_path(huc_id)
+        meta_path = path.with_suffix(".json")
+        signature = {
+            "features": [f for f, _ in sources],
+            "files": [
+                [p.name, p.stat().st_size, p.stat().st_mtime_ns] for _, p in sources
+            ],
+            "stats": self.global_stats,
+        }
+        try:
+            if path.exists() and json.loads(meta_path.read_text()) == signature:
+                return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            pass
+
+        if self.verbose:
+            print(f"Building static forcing stack for {huc_id}...")
+        with rasterio.open(sources[0][1]) as src:
+            height, width = src.height, src.width
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp.npy")
+        stack = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=np.float32, shape=(len(sources), height, width)
+        )
+        for i, (feature, tif) in enumerate(sources):
+            stack[i] = self.tif_to_tensor(tif, feature_name=feature)[0].numpy()
+        stack.flush()
+        del stack
+        os.replace(tmp, path)
+        meta_path.write_text(json.dumps(signature))
+        return np.load(path, mmap_mode="r")
+
+    def get_static_stack(self, huc_id: str):
+        stack = self.get_static_stack_mmap(huc_id)
+        if stack is None:
+            return None
+        return torch.from_numpy(np.array(stack))
 
     def get_all_lf_maps(self, huc_id: str):
         return sorted(
@@ -138,3 +215,64 @@ class InferenceDataPreprocessor:
                 print(f"Processed {lf_path.name} with {patches.shape[0]} patches.")
 
         return results
+
+
+# LAZY (C, H, W) STACK FOR INFERENCE
+class LowFidelityRaster:
+    """
+    Low-fidelity map indexed like a (1, H, W) tensor. Every slice is a windowed read,
+    binarized like tif_to_tensor(..., "low_fidelity"); the full map is never loaded.
+    """
+
+    def __init__(self, path: Path):
+        self.src = rasterio.open(path)
+        self.shape = (1, self.src.height, self.src.width)
+
+    def __getitem__(self, idx):
+        _, rows, cols = idx
+        r0, r1, _ = rows.indices(self.shape[1])
+        c0, c1, _ = cols.indices(self.shape[2])
+        window = Window(c0, r0, max(c1 - c0, 0), max(r1 - r0, 0))
+        array = self.src.read(1, window=window, out_dtype=np.float32)
+        if self.src.nodata is not None:
+            array[array == self.src.nodata] = 0.0
+        np.nan_to_num(array, copy=False, nan=0.0)
+        np.copyto(array, array > 0)
+        return torch.from_numpy(array)
+
+    def close(self):
+        self.src.close()
+
+
+class ForcingStack:
+    """
+    Memory-mapped static layers plus the low-fidelity layer(s), indexed like a
+    (C, H, W) tensor. Only the requested channels and window are read, so patches
+    are sliced from the mmap (and the LF raster, for a LowFidelityRaster) without
+    materializing the full-HUC tensor.
+    """
+
+    def __init__(self, static: np.ndarray, lf):
+        self.static = static
+        self.lf = lf
+        self.n_static = static.shape[0]
+        self.shape = (self.n_static + lf.shape[0], *static.shape[1:])
+
+    def _layer(self, c, rows, cols):
+        if c < self.n_static:
+            return torch.from_numpy(np.array(self.static[c, rows, cols]))
+        return self.lf[c - self.n_static, rows, cols]
+
+    def __getitem__(self, idx):
+        if not isinstance(idx, tuple):
+            idx = (idx,)
+        ch = idx[0]
+        rows = idx[1] if len(idx) > 1 else slice(None)
+        cols = idx[2] if len(idx) > 2 else slice(None)
+
+        if isinstance(ch, slice) and ch == slice(None) and len(idx) == 1:
+            return self
+        if isinstance(ch, (int, np.integer)):
+            return self._layer(int(ch) % self.shape[0], rows, cols)
+        channels = range(self.shape[0])[ch] if isinstance(ch, slice) else ch
+        return torch.stack([self._layer(int(c), rows, cols) for c in channels])
@@ -0,0 +1,154 @@
+"""
+Local inference service for the surrogate model.
+
+The model is loaded once and kept warm; batch jobs send requests instead of paying
+the model load for every enhanceFIM call. A request names a HUC and (optionally) its
+forcing folder, low-fidelity maps and output folder; the reply lists the prediction
+GeoTIFFs:
+
+    {"huc_id": "03020202", "forcing_dir": "./HUC03020202_forcings",
+     "lf_paths": ["..._hand_....tif"], "out_dir": "./Results/HUC03020202"}
+    -> {"status": "ok", "predictions": ["./Results/HUC03020202/SMprediction_....tif"]}
+
+Run it over HTTP on localhost (POST /enhance, GET /health) or over stdin/stdout with
+one JSON request per line:
+
+    python -m fimserve.enhancement_withSM.SM_server --port 8765
+    python -m fimserve.enhancement_withSM.SM_server --stdin
+"""
+
+import sys
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .SM_prediction import enhanceFIM, get_model
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# One prediction at a time on the shared model
+_INFERENCE_LOCK = threading.Lock()
+
+
+def handle_request(req):
+    """Run one enhancement request against the warm model."""
+    if not req.get("huc_id"):
+        return {"status": "error", "message": "huc_id is required."}
+    patch = req.get("patch_size", 256)
+    patch_size = tuple(patch) if isinstance(patch, (list, tuple)) else (patch, patch)
+    try:
+        with _INFERENCE_LOCK:
+            predictions = enhanceFIM(
+                str(req["huc_id"]),
+                patch_size=patch_size,
+                batch_size=int(req.get("batch_size", 32)),
+                lf_paths=req.get("lf_paths"),
+                forcing_dir=req.get("forcing_dir"),
+                out_dir=req.get("out_dir"),
+                streaming=bool(req.get("streaming", True)),
+                cpu_mode=req.get("cpu_mode", "fp32"),
+            )
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "ok", "predictions": [str(p) for p in predictions]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, code, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"status": "error", "message": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/enhance":
+            self._reply(404, {"status": "error", "message": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._reply(400, {"status": "error", "message": f"bad request: {e}"})
+            return
+        res = handle_request(req)
+        self._reply(200 if res["status"] == "ok" else 500, res)
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write(f"[SM-server] {fmt % args}\n")
+
+
+def serve_http(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serve POST /enhance on host:port (localhost by default) until interrupted."""
+    get_model(cpu_mode="fp32")
+    server = ThreadingHTTPServer((host, port), _Handler)
+    print(f"Surrogate model server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def serve_stdin(stdin=None, stdout=None):
+    """Answer one JSON request per stdin line with one JSON line on stdout."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    get_model(cpu_mode="fp32")
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            res = handle_request(json.loads(line))
+        except ValueError as e:
+            res = {"status": "error", "message": f"bad request: {e}"}
+        stdout.write(json.dumps(res) + "\n")
+        stdout.flush()
+
+
+def request_enhancement(
+    huc_id, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=None, **kwargs
+):
+    """Client helper: send one request to a running server and return its prediction paths."""
+    import requests
+
+    res = requests.post(
+        f"{url.rstrip('/')}/enhance",
+        json={"huc_id": huc_id, **kwargs},
+        timeout=timeout,
+    ).json()
+    if res.get("status") != "ok":
+        raise RuntimeError(res.get("message", "enhancement failed"))
+    return res["predictions"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Surrogate model inference service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--stdin", action="store_true", help="read JSON requests from stdin"
+    )
+    args = parser.parse_args(argv)
+
+    if args.stdin:
+        # Keep stdout for replies only
+        real_stdout, sys.stdout = sys.stdout, sys.stderr
+        serve_stdin(stdout=real_stdout)
+    else:
+        serve_http(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
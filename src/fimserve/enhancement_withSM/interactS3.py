@@ -1,35 +1,20 @@
 import s3fs
 import geopandas as gpd
 import os
-import tempfile
 import fiona
 import rasterio
 from pathlib import Path
 import numpy as np
 from rasterio.mask import mask
 
+# HUC8 boundaries come from the same cached helper used by getIntersectedHUC8ID
+from ..intersectedHUC import HUC8_inS3
+from ..s3cache import s3_cached_bundle, s3_cached_file_by_suffix
+
 fs = s3fs.S3FileSystem(anon=True)
 bucket_name = "sdmlab"
 
 
-# FINDING THE INTERSECTED HUC8 AND RETURNING GEOMETRY IN WGS84
-def HUC8_inS3(fs, bucket, prefix="HUC8_boundaries/"):
-    files = fs.ls(f"{bucket}/{prefix}")
-    gpkg_key = next((f for f in files if f.endswith(".gpkg")), None)
-
-    if gpkg_key is None:
-        raise FileNotFoundError(f"No .gpkg file found in s3://{bucket}/{prefix}")
-
-    # Download and read GeoPackage into a GeoDataFrame
-    with fs.open(gpkg_key, "rb") as s3file:
-        with tempfile.NamedTemporaryFile(suffix=".gpkg", delete=False) as tmp_file:
-            tmp_file.write(s3file.read())
-            tmp_path = tmp_file.name
-
-    gdf = gpd.read_file(tmp_path)
-    return gdf
-
-
 # WRAPPING ALL FUNCTIONS
 def getHUC8BoundaryByID(huc_id):
     huc8_gdf = HUC8_inS3(fs, bucket_name)
@@ -44,24 +29,14 @@ def getHUC8BoundaryByID(huc_id):
 
 # PWB of CONUS rivers
 def PWB_inS3(fs, bucket, prefix="PWB/"):
-    tmp_dir = tempfile.mkdtemp()
-    files = fs.ls(f"{bucket}/{prefix}")
-
-    # Filter out relevant shapefile components
-    for file_key in files:
-        file_name = os.path.basename(file_key)
-        if file_name.endswith((".shp", ".shx", ".dbf", ".prj", ".cpg")):
-            with fs.open(file_key, "rb") as s3file:
-                local_path = os.path.join(tmp_dir, file_name)
-                with open(local_path, "wb") as local_file:
-                    local_file.write(s3file.read())
+    files = s3_cached_bundle(bucket, prefix, (".shp", ".shx", ".dbf", ".prj", ".cpg"))
 
     # Ensure we got a .shp file
-    shp_files = [f for f in os.listdir(tmp_dir) if f.endswith(".shp")]
+    shp_files = [f for f in files if f.endswith(".shp")]
     if not shp_files:
         raise ValueError("No .shp file found after download.")
 
-    return os.path.join(tmp_dir, shp_files[0])
+    return shp_files[0]
 
 
 # GET FORCINGS
@@ -91,16 +66,7 @@ def get_forcings(huc_id, downloadforcings=True):
 def get_population_GRID(
     boundary_gdf, fs=fs, bucket=bucket_name, prefix="SM_dataset/gridded_population/"
 ):
-    files = fs.ls(f"{bucket}/{prefix}")
-    tif_key = next((f for f in files if f.endswith(".tif")), None)
-
-    if tif_key is None:
-        raise FileNotFoundError(f"No .tif file found in s3://{bucket}/{prefix}")
-
-    with fs.open(tif_key, "rb") as s3file:
-        with tempfile.NamedTemporaryFile(suffix=".tif", delete=False) as tmp_file:
-            tmp_file.write(s3file.read())
-            tmp_tif_path = tmp_file.name
+    tmp_tif_path = s3_cached_file_by_suffix(bucket, prefix, ".tif")
 
     # Clip gridded population raster with geometry
     with rasterio.open(tmp_tif_path) as src:
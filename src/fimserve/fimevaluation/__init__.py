@@ -1,4 +1,4 @@
 from .fims_setup import FIMService, fim_lookup
-from .run_fimeval import run_evaluation
+from .run_fimeval import run_evaluation, run_parallel_evaluation
 
-__all__ = ["FIMService", "fim_lookup", "run_evaluation"]
+__all__ = ["FIMService", "fim_lookup", "run_evaluation", "run_parallel_evaluation"]
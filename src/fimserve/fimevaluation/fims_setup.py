@@ -9,13 +9,13 @@ from pathlib import Path
 import os
 import rasterio
 from rasterio.merge import merge
-import tempfile
 import shutil
 from collections import defaultdict
 
 # Internal utilities
 from .utils import (
-    load_catalog_core,
+    benchmark_catalog,
+    BenchmarkCatalog,
     download_fim_assets,
     _to_date,
     _to_hour_or_none,
@@ -26,14 +26,16 @@ from .utils import (
     _record_huc8_list,
     _folder_from_record,
     _list_prefix,
-    _download,
+    _fetch_asset,
     BUCKET,
 )
 
 from ..datadownload import DownloadHUC8, setup_directories
 from ..streamflowdata.nwmretrospective import getNWMretrospectivedata
 from ..intersectedHUC import HUC8RESTFinder
+from ..s3cache import s3_cached_file
 from ..runFIM import runOWPHANDFIM
+from .mosaic import mosaic_rasters
 
 
 class FIMService:
@@ -55,10 +57,15 @@ class FIMService:
 
         self._roots_initialized = True
 
+    @property
+    def catalog(self) -> BenchmarkCatalog:
+        """Indexed benchmark catalog, shared across calls and revalidated by ETag."""
+        return benchmark_catalog()
+
     def availability(self, HUCID: str) -> str:
-        from .utils import availability as _avail
+        from .utils import summarize_huc_availability
 
-        return _avail(HUCID)
+        return summarize_huc_availability(self.catalog, HUCID)
 
     @staticmethod
     def _site_of(rec: Dict[str, Any]) -> str:
@@ -89,12 +96,9 @@ class FIMService:
         Download the Tier_4 BLE flow CSV for this HUC8 + return period into ./data/inputs.
         This is used instead of event-based NWM retrospective download.
         """
-        catalog = load_catalog_core()
-        records = catalog.get("records", [])
-
         # Find matching records by HUC and return period (Tier_4 BLE records have no date)
         matches = find_fims(
-            records=records,
+            records=self.catalog,
             huc8=str(huc8).strip(),
             date_input=None,
             file_name=None,
@@ -142,7 +146,7 @@ class FIMService:
         local = flows_dir / os.path.basename(src_key)
 
         if not local.exists():
-            _download(BUCKET, src_key, str(local))
+            _fetch_asset(src_key, str(local))
 
         return local
 
@@ -229,8 +233,7 @@ class FIMService:
         huc_intersectedarea: bool = False,
         huc_thresholdarea: float = 0.0,
     ) -> Dict[str, Any]:
-        catalog = load_catalog_core()
-        records = catalog.get("records", [])
+        records = self.catalog
         huc8 = str(HUCID).strip()
 
         # strict set
@@ -260,6 +263,8 @@ class FIMService:
         )
 
         if huc_intersectedarea and relaxed_matches:
+            # Annotate copies; the catalog records are shared across queries
+            relaxed_matches = [dict(r) for r in relaxed_matches]
             finder = HUC8RESTFinder(debug=False)
             for rec in relaxed_matches:
                 gpkg_url = rec.get("gpkg_url")
@@ -269,11 +274,9 @@ class FIMService:
                 # Derive S3 Key from URL
                 s3_key = gpkg_url.split(".amazonaws.com/")[1]
 
-                with tempfile.NamedTemporaryFile(suffix=".gpkg") as tmp:
-                    # Download only the small AOI polygon
-                    _download(BUCKET, s3_key, tmp.name)
-                    # Run REST-based mapping and attach to record
-                    rec["huc_area_results"] = finder.get_huc_area_mapping(tmp.name)
+                # Only the small AOI polygon (cached); the mapping uses the local HUC8 index
+                aoi_path = s3_cached_file(BUCKET, s3_key)
+                rec["huc_area_results"] = finder.get_huc_area_mapping(aoi_path)
 
         status = (
             "ok"
@@ -323,8 +326,7 @@ class FIMService:
     ) -> Dict[str, Any]:
         # Initialize roots and load benchmark catalog data
         self._ensure_roots()
-        catalog = load_catalog_core()
-        records = catalog.get("records", [])
+        records = self.catalog
 
         target_recs = []
         huc8_list = []
@@ -332,7 +334,7 @@ class FIMService:
         # Resolve target record and associated HUC list based on filename or HUC ID
         if file_name:
             fname = file_name.strip()
-            found = [r for r in records if str(r.get("file_name", "")).strip() == fname]
+            found = records.records_for_file(fname)
 
             # Apply tier filtering to narrow down the specific benchmark file
             if tier:
@@ -356,18 +358,18 @@ class FIMService:
             target_rec = found[0]
             target_recs = [target_rec]
 
-            # Filter HUCs using ArcGIS REST API if area threshold is provided
+            # Filter HUCs by overlap area if area threshold is provided
             if huc_thresholdarea > 0:
                 finder = HUC8RESTFinder(debug=False)
                 gpkg_url = target_rec.get("gpkg_url")
                 if gpkg_url:
                     s3_key = gpkg_url.split(".amazonaws.com/")[1]
-                    with tempfile.NamedTemporaryFile(suffix=".gpkg") as tmp:
-                        _download(BUCKET, s3_key, tmp.name)
-                        area_map = finder.get_huc_area_mapping(tmp.name)
-                        huc8_list = [
-                            h for h, pct in area_map.items() if pct >= huc_thresholdarea
-                        ]
+                    area_map = finder.get_huc_area_mapping(
+                        s3_cached_file(BUCKET, s3_key)
+                    )
+                    huc8_list = [
+                        h for h, pct in area_map.items() if pct >= huc_thresholdarea
+                    ]
                 else:
                     huc8_list = _record_huc8_list(target_rec)
             else:
@@ -449,40 +451,17 @@ class FIMService:
 
         # Mosaic all generated HUC rasters into a single descriptive file
         if not eval_individual_huc and len(generated_tif_paths) > 1:
-            import rasterio
-            from rasterio.merge import merge
-
             print(
                 f"Mosaicking {len(generated_tif_paths)} rasters into descriptive composite..."
             )
-            src_files = [rasterio.open(p) for p in generated_tif_paths]
-            mosaic, out_trans = merge(src_files)
-
-            # Configure final metadata with LZW compression and tiling
-            out_meta = src_files[0].meta.copy()
-            out_meta.update(
-                {
-                    "driver": "GTiff",
-                    "height": mosaic.shape[1],
-                    "width": mosaic.shape[2],
-                    "transform": out_trans,
-                    "compress": "lzw",
-                    "tiled": True,
-                    "blockxsize": 256,
-                    "blockysize": 256,
-                }
-            )
 
             # Create the final descriptive filename
             original_name = generated_tif_paths[0].name
             mosaic_name = original_name.replace(huc8_list[0], "mosaicked_allhuc")
             mosaic_path = target_folder / mosaic_name
 
-            with rasterio.open(mosaic_path, "w", **out_meta) as dest:
-                dest.write(mosaic)
-
-            for src in src_files:
-                src.close()
+            # Windowed, tiled (256) LZW GeoTIFF; memory bounded by the window size
+            mosaic_rasters(generated_tif_paths, mosaic_path)
 
             # Clean up individual HUC rasters to keep the folder tidy
             print("Cleaning up intermediate individual HUC rasters...")
@@ -0,0 +1,114 @@
+"""
+Streaming mosaic of HUC inundation rasters for multi-HUC evaluation composites.
+
+The union grid of all inputs is computed from their headers only, and the output is
+written as a tiled GeoTIFF window by window: for every output window only the parts
+of the inputs overlapping it are read and merged. Peak memory is bounded by the
+window size instead of the event extent.
+"""
+
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import rasterio
+from rasterio.merge import merge
+from rasterio.transform import from_origin
+from rasterio.windows import Window, bounds as window_bounds
+
+
+def _union_grid(srcs):
+    """Transform, width and height of the grid covering srcs at the first raster's resolution."""
+    res_x, res_y = srcs[0].res
+    left = min(s.bounds.left for s in srcs)
+    bottom = min(s.bounds.bottom for s in srcs)
+    right = max(s.bounds.right for s in srcs)
+    top = max(s.bounds.top for s in srcs)
+    width = max(1, int(round((right - left) / res_x)))
+    height = max(1, int(round((top - bottom) / res_y)))
+    return from_origin(left, top, res_x, res_y), width, height
+
+
+def _overlaps(src, b, res):
+    left, bottom, right, top = b
+    sb = src.bounds
+    return (
+        sb.left < right - res[0] / 2
+        and sb.right > left + res[0] / 2
+        and sb.bottom < top - res[1] / 2
+        and sb.top > bottom + res[1] / 2
+    )
+
+
+def mosaic_rasters(
+    paths: Sequence[Union[str, Path]],
+    out_path: Union[str, Path],
+    window_size: int = 2048,
+    block_size: int = 256,
+    compress: str = "lzw",
+    nodata: Optional[float] = None,
+) -> Path:
+    """
+    Mosaic rasters (same CRS) into a tiled GeoTIFF, like rasterio.merge.merge with
+    method="first" (earlier rasters win where they have data), without holding the
+    full mosaic in memory.
+
+    :param paths: Input rasters, in priority order.
+    :param out_path: Output GeoTIFF.
+    :param window_size: Edge length (pixels) of the windows merged at a time; a multiple of block_size.
+    :param block_size: GeoTIFF tile size.
+    :param nodata: Output nodata value; defaults to the first raster's (None keeps the
+        mosaic without a nodata value, uncovered cells are 0 as with merge()).
+    """
+    out_path = Path(out_path)
+    window_size = max(block_size, (window_size // block_size) * block_size)
+    srcs: List = [rasterio.open(p) for p in paths]
+    try:
+        first = srcs[0]
+        res = first.res
+        if nodata is None:
+            nodata = first.nodata
+        fill = nodata if nodata is not None else 0
+        transform, width, height = _union_grid(srcs)
+
+        meta = first.meta.copy()
+        meta.update(
+            {
+                "driver": "GTiff",
+                "height": height,
+                "width": width,
+                "transform": transform,
+                "nodata": nodata,
+                "compress": compress,
+                "tiled": True,
+                "blockxsize": block_size,
+                "blockysize": block_size,
+                "BIGTIFF": "IF_SAFER",
+            }
+        )
+
+        with rasterio.open(out_path, "w", **meta) as dst:
+            for row in range(0, height, window_size):
+                for col in range(0, width, window_size):
+                    window = Window(
+                        col,
+                        row,
+                        min(window_size, width - col),
+                        min(window_size, height - row),
+                    )
+                    shape = (meta["count"], int(window.height), int(window.width))
+                    b = window_bounds(window, transform)
+                    parts = [s for s in srcs if _overlaps(s, b, res)]
+                    if not parts:
+                        block = np.full(shape, fill, dtype=meta["dtype"])
+                    else:
+                        merged, _ = merge(parts, bounds=b, res=res, nodata=nodata)
+                        block = np.full(shape, fill, dtype=meta["dtype"])
+                        h = min(shape[1], merged.shape[1])
+                        w = min(shape[2], merged.shape[2])
+                        block[:, :h, :w] = merged[:, :h, :w]
+                    dst.write(block, window=window)
+    finally:
+        for s in srcs:
+            s.close()
+    return out_path
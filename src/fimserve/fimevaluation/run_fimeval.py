@@ -5,8 +5,14 @@ Date: 18 Nov, 2025
 """
 
 import os
+import json
+import time
+import hashlib
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
 import fimeval as fe  # type: ignore
 
 
@@ -109,3 +115,217 @@ class run_evaluation:
                 )
             except Exception as e:
                 print("Skipping evaluation with building footprint due to error:", e)
+
+
+# PARALLEL EVALUATION DRIVER
+STATE_NAME = "evaluation_state.json"
+SUMMARY_NAME = "evaluation_summary.csv"
+
+
+def discover_cases(main_dir: str) -> List[Path]:
+    """Case folders (HUC*_<site>, All_HUC_MOSAICED_<site>, ...) that contain rasters."""
+    main_dir = Path(main_dir)
+    if not main_dir.is_dir():
+        return []
+    return sorted(
+        p
+        for p in main_dir.iterdir()
+        if p.is_dir() and p.name != "processing" and any(p.glob("*.tif"))
+    )
+
+
+def _case_fingerprint(case_dir: Path, settings: Dict[str, Any]) -> str:
+    """Digest of the case inputs (name, size, mtime) and the evaluation settings."""
+    h = hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode())
+    for p in sorted(case_dir.iterdir()):
+        if p.is_file():
+            st = p.stat()
+            h.update(f"{p.name}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _metrics_csv(output_dir: str, case: str, method_name: str) -> Path:
+    return (
+        Path(output_dir)
+        / case
+        / method_name
+        / "EvaluationMetrics"
+        / "EvaluationMetrics.csv"
+    )
+
+
+def _evaluate_case(case_dir: str, output_dir: str, settings: Dict[str, Any]):
+    """Worker: evaluate one case folder (same steps as run_evaluation.run_eval)."""
+    start = time.perf_counter()
+    error = None
+    try:
+        # A metrics file left by an earlier run would make a failed case look "ok"
+        _metrics_csv(output_dir, Path(case_dir).name, settings["method_name"]).unlink(
+            missing_ok=True
+        )
+        fe.EvaluateFIM(
+            main_dir=case_dir,
+            method_name=settings["method_name"],
+            output_dir=output_dir,
+            PWB_dir=settings["PWB_dir"],
+            shapefile_dir=settings["shapefile_path"],
+            target_crs=settings["target_crs"],
+            target_resolution=settings["target_resolution"],
+        )
+        if settings["print_graphs"]:
+            fe.PrintContingencyMap(
+                main_dir=case_dir,
+                method_name=settings["method_name"],
+                out_dir=output_dir,
+            )
+            fe.PlotEvaluationMetrics(
+                main_dir=case_dir,
+                method_name=settings["method_name"],
+                out_dir=output_dir,
+            )
+        if settings["Evalwith_BF"]:
+            try:
+                fe.EvaluationWithBuildingFootprint(
+                    main_dir=case_dir,
+                    method_name=settings["method_name"],
+                    output_dir=output_dir,
+                    building_footprint=settings["building_footprint"],
+                )
+            except Exception as e:
+                print("Skipping evaluation with building footprint due to error:", e)
+    except Exception as e:
+        error = str(e)
+    return {
+        "case": Path(case_dir).name,
+        "error": error,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _case_rows(output_dir, case, method_name, status, seconds, error=None):
+    """One summary row per candidate FIM of a case, with its evaluation metrics."""
+    base = {"case": case, "status": status, "seconds": seconds, "error": error}
+    csv_path = _metrics_csv(output_dir, case, method_name)
+    if not csv_path.exists():
+        return [base]
+    metrics = pd.read_csv(csv_path).set_index("Metrics")
+    return [
+        {**base, "candidate": candidate, **metrics[candidate].to_dict()}
+        for candidate in metrics.columns
+    ]
+
+
+def run_parallel_evaluation(
+    Main_dir: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    shapefile_path: Optional[str] = None,
+    PWB_dir: Optional[str] = None,
+    building_footprint: Optional[str] = None,
+    target_crs: Optional[str] = None,
+    target_resolution: Optional[float] = None,
+    method_name: Optional[str] = None,
+    print_graphs: bool = False,
+    Evalwith_BF: bool = False,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> pd.DataFrame:
+    """
+    Evaluate every case folder under Main_dir concurrently (one process per case).
+
+    Takes the same parameters as run_evaluation, plus:
+    workers : Optional[int]; Number of worker processes (defaults to CPU count).
+    force : bool; Re-evaluate cases whose inputs and settings are unchanged since the last run.
+
+    Cases are skipped when their inputs (file names, sizes, modification times) and the
+    evaluation settings match the last successful run recorded in
+    <output_dir>/evaluation_state.json. Per-case timings and metrics are collected into
+    <output_dir>/evaluation_summary.csv, which is also returned.
+    """
+    Main_dir = Main_dir or os.path.join(os.getcwd(), "FIMevaluation_inputs")
+    output_dir = output_dir or os.path.join(os.getcwd(), "FIMevaluation_results")
+    method_name = method_name or "AOI"
+    os.makedirs(output_dir, exist_ok=True)
+
+    settings = {
+        "method_name": method_name,
+        "PWB_dir": PWB_dir,
+        "shapefile_path": shapefile_path,
+        "building_footprint": building_footprint,
+        "target_crs": target_crs,
+        "target_resolution": target_resolution,
+        "print_graphs": print_graphs,
+        "Evalwith_BF": Evalwith_BF,
+    }
+
+    state_path = Path(output_dir) / STATE_NAME
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        state = {}
+
+    rows = []
+    pending = []
+    for case_dir in discover_cases(Main_dir):
+        fingerprint = _case_fingerprint(case_dir, settings)
+        prev = state.get(case_dir.name, {})
+        if (
+            not force
+            and prev.get("fingerprint") == fingerprint
+            and _metrics_csv(output_dir, case_dir.name, method_name).exists()
+        ):
+            print(f"Skipping {case_dir.name}: inputs unchanged since the last run.")
+            rows += _case_rows(
+                output_dir, case_dir.name, method_name, "skipped", prev.get("seconds")
+            )
+        else:
+            pending.append(case_dir)
+
+    if pending:
+        workers = workers or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_evaluate_case, str(c), output_dir, settings): c
+                for c in pending
+            }
+            for fut in as_completed(futures):
+                case_dir = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = {"case": case_dir.name, "error": str(e), "seconds": None}
+
+                has_metrics = _metrics_csv(
+                    output_dir, case_dir.name, method_name
+                ).exists()
+                status = (
+                    "error" if res["error"] else ("ok" if has_metrics else "no_results")
+                )
+                print(f"{case_dir.name}: {status} ({res['seconds'] or 0:.1f} s)")
+                rows += _case_rows(
+                    output_dir,
+                    case_dir.name,
+                    method_name,
+                    status,
+                    res["seconds"],
+                    res["error"],
+                )
+
+                if status == "ok":
+                    # Fingerprint after the run: evaluation may touch the inputs
+                    state[case_dir.name] = {
+                        "fingerprint": _case_fingerprint(case_dir, settings),
+                        "seconds": res["seconds"],
+                        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    }
+                else:
+                    state.pop(case_dir.name, None)
+
+        tmp = state_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state, indent=1))
+        os.replace(tmp, state_path)
+
+    summary = pd.DataFrame(rows)
+    if not summary.empty:
+        summary = summary.sort_values("case", kind="stable").reset_index(drop=True)
+    summary.to_csv(Path(output_dir) / SUMMARY_NAME, index=False)
+    return summary
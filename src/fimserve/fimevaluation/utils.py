@@ -8,14 +8,18 @@ for HAND FIM model outputs along with other supporting functions
 """
 
 from __future__ import annotations
-import os, re, json, datetime as dt
+import os, re, json, time, threading, datetime as dt
 from typing import List, Dict, Any, Optional
 
 import urllib.parse
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 from botocore import UNSIGNED
 from botocore.config import Config
 
+from ..s3cache import s3_cached_file
+
 # constants
 BUCKET = "sdmlab"
 CATALOG_KEY = (
@@ -233,18 +237,206 @@ def format_records_for_print(
 
 
 # S3 and json catalog
+CATALOG_TTL = 300  # seconds before the cached catalog's ETag is checked again
+
+_CATALOG = {"path": None, "checked": 0.0, "catalog": None}
+_CATALOG_LOCK = threading.Lock()
+
+
+class BenchmarkCatalog:
+    """
+    Parsed benchmark catalog (catalog_core.json). Record fields used for matching
+    (HUC8 list, day, hour, date range, tier, file name) are normalized once into
+    columns, and HUC8 -> records, day -> records and file name -> records indexes
+    are built so lookups only touch the matching records.
+    """
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = raw
+        self.records: List[Dict[str, Any]] = raw.get("records", [])
+
+        self.hucs: List[List[str]] = []
+        self.days: List[Optional[dt.date]] = []
+        self.hours: List[Optional[int]] = []
+        self.ranges: List[Optional[tuple]] = []
+        self.tiers: List[str] = []
+        self.files: List[str] = []
+
+        self.by_huc: Dict[str, List[int]] = {}
+        self.by_day: Dict[dt.date, List[int]] = {}
+        self.by_file: Dict[str, List[int]] = {}
+
+        for i, r in enumerate(self.records):
+            hucs = list(dict.fromkeys(_record_huc8_list(r)))
+            day = _record_day(r)
+            span = None
+            if r.get("start_date_ymd") and r.get("end_date_ymd"):
+                try:
+                    span = (
+                        _to_date(str(r["start_date_ymd"])),
+                        _to_date(str(r["end_date_ymd"])),
+                    )
+                except Exception:
+                    # Malformed range: fall back to the record's single day
+                    span = None
+            fname = str(r.get("file_name", "")).strip()
+
+            self.hucs.append(hucs)
+            self.days.append(day)
+            self.hours.append(_record_hour_or_none(r))
+            self.ranges.append(span)
+            self.tiers.append(_normalize_tier_for_comparison(_tier_label(r)))
+            self.files.append(fname)
+
+            for h in hucs:
+                self.by_huc.setdefault(h, []).append(i)
+            if span is not None:
+                d = span[0]
+                while d <= span[1]:
+                    self.by_day.setdefault(d, []).append(i)
+                    d += dt.timedelta(days=1)
+            elif day is not None:
+                self.by_day.setdefault(day, []).append(i)
+            if fname:
+                self.by_file.setdefault(fname, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def records_for_huc(self, huc8: str) -> List[Dict[str, Any]]:
+        return [self.records[i] for i in self.by_huc.get(str(huc8).strip(), [])]
+
+    def records_for_file(self, file_name: str) -> List[Dict[str, Any]]:
+        return [self.records[i] for i in self.by_file.get(file_name.strip(), [])]
+
+    def find(
+        self,
+        huc8: str,
+        date_input: Optional[str] = None,
+        file_name: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        return_period: Optional[int] = None,
+        tier: Optional[str] = None,
+        relaxed_for_print: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Same matching rules (and order) as find_fims, answered from the indexes."""
+        idx = self.by_huc.get(str(huc8).strip(), [])
+
+        if file_name:
+            in_file = set(self.by_file.get(file_name.strip(), []))
+            idx = [i for i in idx if i in in_file]
+
+        d0 = d1 = None
+        if relaxed_for_print:
+            d0 = _to_date(start_date) if start_date else None
+            d1 = _to_date(end_date) if end_date else None
+            if not d0 and not d1 and date_input:
+                d0 = d1 = _to_date(date_input)
+        elif date_input is not None:
+            d0 = d1 = _to_date(date_input)
+
+        if d0 is not None and d0 == d1:
+            on_day = set(self.by_day.get(d0, []))
+            idx = [i for i in idx if i in on_day]
+
+        if tier:
+            target_t = _normalize_tier_for_comparison(tier)
+            idx = [i for i in idx if self.tiers[i] == target_t]
+
+        if return_period is not None:
+            trp = int(return_period)
+            idx = [
+                i
+                for i in idx
+                if self.records[i].get("return_period")
+                and int(self.records[i]["return_period"]) == trp
+            ]
+
+        # STRICT SEARCH
+        if not relaxed_for_print:
+            if date_input is not None:
+                target_hour = _to_hour_or_none(date_input)
+                idx = [
+                    i
+                    for i in idx
+                    if self.ranges[i] is not None
+                    or (self.days[i] == d0 and self.hours[i] == target_hour)
+                ]
+            return [self.records[i] for i in idx]
+
+        # RELAXED SEARCH
+        if not d0 and not d1:
+            return [self.records[i] for i in idx]
+
+        out = []
+        for i in idx:
+            span = self.ranges[i]
+            if span is not None:
+                if (not d1 or span[0] <= d1) and (not d0 or span[1] >= d0):
+                    out.append(i)
+            elif self.days[i]:
+                day = self.days[i]
+                if (not d0 or day >= d0) and (not d1 or day <= d1):
+                    out.append(i)
+        out.sort(key=lambda i: str(self.days[i] or ""))
+        return [self.records[i] for i in out]
+
+
+def benchmark_catalog(
+    refresh: bool = False, ttl: float = CATALOG_TTL
+) -> BenchmarkCatalog:
+    """
+    Shared, indexed BenchmarkCatalog. The JSON is cached locally by ETag; within ttl
+    seconds the parsed catalog is reused without asking S3, after that the ETag is
+    revalidated and the catalog is only re-parsed when the object changed.
+    """
+    with _CATALOG_LOCK:
+        now = time.time()
+        if refresh or _CATALOG["catalog"] is None or now - _CATALOG["checked"] > ttl:
+            path = s3_cached_file(BUCKET, CATALOG_KEY)
+            if refresh or path != _CATALOG["path"] or _CATALOG["catalog"] is None:
+                with open(path, "rb") as f:
+                    raw = json.loads(f.read().decode("utf-8", "replace"))
+                _CATALOG["catalog"] = BenchmarkCatalog(raw)
+                _CATALOG["path"] = path
+            _CATALOG["checked"] = now
+        return _CATALOG["catalog"]
+
+
 def load_catalog_core() -> Dict[str, Any]:
-    obj = _S3.get_object(Bucket=BUCKET, Key=CATALOG_KEY)
-    return json.loads(obj["Body"].read().decode("utf-8", "replace"))
+    return benchmark_catalog().raw
 
 
-def _list_prefix(prefix: str) -> List[str]:
-    keys: List[str] = []
+LISTING_TTL = 300  # seconds a prefix listing is reused
+
+_LISTINGS: Dict[str, tuple] = {}
+_LISTINGS_LOCK = threading.Lock()
+
+# Shared pool for benchmark asset transfers
+_ASSET_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fim-assets")
+
+
+def _list_prefix_etags(prefix: str, ttl: float = LISTING_TTL) -> Dict[str, str]:
+    """{key: etag} under prefix; listings are cached for ttl seconds."""
+    with _LISTINGS_LOCK:
+        hit = _LISTINGS.get(prefix)
+        if hit and time.time() - hit[0] <= ttl:
+            return hit[1]
+
+    listing: Dict[str, str] = {}
     paginator = _S3.get_paginator("list_objects_v2")
     for page in paginator.paginate(Bucket=BUCKET, Prefix=prefix):
         for obj in page.get("Contents", []) or []:
-            keys.append(obj["Key"])
-    return keys
+            listing[obj["Key"]] = obj["ETag"].strip('"')
+
+    with _LISTINGS_LOCK:
+        _LISTINGS[prefix] = (time.time(), listing)
+    return listing
+
+
+def _list_prefix(prefix: str) -> List[str]:
+    return list(_list_prefix_etags(prefix))
 
 
 def _download(bucket: str, key: str, dest_path: str) -> str:
@@ -366,6 +558,18 @@ def find_fims(
       - Else if date_input (day-only): ALL records that day (day-only + hourly)
       - Else (date with hour, or no date): fall back to strict behavior
     """
+    if isinstance(records, BenchmarkCatalog):
+        return records.find(
+            huc8,
+            date_input=date_input,
+            file_name=file_name,
+            start_date=start_date,
+            end_date=end_date,
+            return_period=return_period,
+            tier=tier,
+            relaxed_for_print=relaxed_for_print,
+        )
+
     huc8 = str(huc8).strip()
     recs = [r for r in records if huc8 in set(_record_huc8_list(r))]
 
@@ -465,7 +669,10 @@ def find_fims(
 
 def summarize_huc_availability(records: List[Dict[str, Any]], huc8: str) -> str:
     huc8 = str(huc8).strip()
-    recs = [r for r in records if huc8 in set(_record_huc8_list(r))]
+    if isinstance(records, BenchmarkCatalog):
+        recs = records.records_for_huc(huc8)
+    else:
+        recs = [r for r in records if huc8 in set(_record_huc8_list(r))]
     if not recs:
         return f"No benchmark FIMs on HUC {huc8}."
 
@@ -521,33 +728,58 @@ def _tif_key_from_record(rec: Dict[str, Any]) -> Optional[str]:
     return _folder_from_record(rec) + fname
 
 
+def _link_or_copy(src: str, dest: str) -> str:
+    """Hard-link src to dest (copy across filesystems)."""
+    if os.path.exists(dest):
+        return dest
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+def _fetch_asset(key: str, dest: str, etag: Optional[str] = None) -> str:
+    """Place s3://BUCKET/key at dest through the shared local cache."""
+    if os.path.exists(dest):
+        return dest
+    return _link_or_copy(s3_cached_file(BUCKET, key, etag), dest)
+
+
 def download_fim_assets(
     record, dest_dir, return_period=None, download_flows: bool = True
 ) -> Dict[str, Any]:
     """
     Download the .tif (if present) and any .gpkg from the record's folder to dest_dir.
     Optionally download FLOWS CSVs (Tier_4) if download_flows=True.
+
+    Files are fetched in parallel into the shared S3 cache (one copy per ETag) and
+    hard-linked into dest_dir, so the same benchmark in several HUC folders is
+    stored once.
     """
     os.makedirs(dest_dir, exist_ok=True)
     out = {"tif": None, "gpkg_files": [], "flow_csv_files": []}
 
+    folder = _folder_from_record(record)
+    listing = _list_prefix_etags(folder)
+    keys = list(listing)
+    jobs = []
+
     # TIF
     tif_key = _tif_key_from_record(record)
     if tif_key:
         local = os.path.join(dest_dir, os.path.basename(tif_key))
-        if not os.path.exists(local):
-            _download(BUCKET, tif_key, local)
+        jobs.append((tif_key, local))
         out["tif"] = local
 
     # GPKGs
-    folder = _folder_from_record(record)
-    keys = _list_prefix(folder)
-
     for key in keys:
         if key.lower().endswith(".gpkg"):
             local = os.path.join(dest_dir, os.path.basename(key))
-            if not os.path.exists(local):
-                _download(BUCKET, key, local)
+            jobs.append((key, local))
             out["gpkg_files"].append(local)
 
     # FLOWS CSVs-->optional
@@ -567,10 +799,16 @@ def download_fim_assets(
                 continue
 
             local = os.path.join(dest_dir, base)
-            if not os.path.exists(local):
-                _download(BUCKET, key, local)
+            jobs.append((key, local))
             out["flow_csv_files"].append(local)
 
+    futures = [
+        _ASSET_POOL.submit(_fetch_asset, key, local, listing.get(key))
+        for key, local in jobs
+    ]
+    for fut in futures:
+        fut.result()
+
     return out
 
 
@@ -594,8 +832,7 @@ def build_huc_event_dict(records: List[Dict[str, Any]]) -> Dict[str, List[str]]:
 
 
 def availability(HUC8: str) -> str:
-    catalog = load_catalog_core()
-    return summarize_huc_availability(catalog.get("records", []), HUC8)
+    return summarize_huc_availability(benchmark_catalog(), HUC8)
 
 
 # benchmark FIM find and download function
@@ -617,8 +854,7 @@ def bmFIMFindandDownload(
     - If download=False: DO NOT download. Return matches + availability text.
     - If download=True: require out_dir; download .tif and any .gpkg for STRICT matches only.
     """
-    catalog = load_catalog_core()
-    records = catalog.get("records", [])
+    records = benchmark_catalog()
 
     # STRICT set
     strict_matches = find_fims(
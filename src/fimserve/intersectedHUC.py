@@ -1,17 +1,22 @@
+import os
 import s3fs
-import tempfile
 from io import BytesIO
 import json
 import math
+import time
+import threading
 import requests
 import rasterio
 import geopandas as gpd
 import pandas as pd
 from pathlib import Path
 from typing import Dict, Optional, Union, Tuple, List, Any
+from shapely import STRtree
 from shapely.geometry import box, shape
 from shapely.ops import unary_union
 
+from .s3cache import cached_file_by_suffix, s3_cached_file_by_suffix
+
 # ---THIS S3 approach takes time- so it is retrieved now and used the arcgis REST API approach--
 # Initialize anonymous S3 filesystem
 fs = s3fs.S3FileSystem(anon=True)
@@ -33,23 +38,95 @@ def find_intersecting_huc8ID(huc8_gdf, user_boundary_path):
     return "\n".join(output)
 
 
-# GETTING THE HUC8 BOUNDARIES FROM S3
+# GETTING THE HUC8 BOUNDARIES FROM S3 (cached locally, re-downloaded only when the object changes)
 def HUC8_inS3(fs, bucket, prefix="HUC8_boundaries/"):
-    # List available files
-    files = fs.ls(f"{bucket}/{prefix}")
-    gpkg_key = next((f for f in files if f.endswith(".gpkg")), None)
+    gpkg_path = s3_cached_file_by_suffix(bucket, prefix, ".gpkg")
+    gdf = gpd.read_file(gpkg_path)
+    return gdf
 
-    if gpkg_key is None:
-        raise FileNotFoundError(f"No .gpkg file found in s3://{bucket}/{prefix}")
 
-    # Read file into temporary file
-    with fs.open(gpkg_key, "rb") as s3file:
-        with tempfile.NamedTemporaryFile(suffix=".gpkg", delete=False) as tmp_file:
-            tmp_file.write(s3file.read())
-            tmp_path = tmp_file.name
-
-    gdf = gpd.read_file(tmp_path)
-    return gdf
+# LOCAL HUC8 INDEX
+# Simplified HUC8 geometries (EPSG:5070) are derived once from the S3 GeoPackage and
+# kept as GeoParquet next to the cached GeoPackage, so a new upload rebuilds the index.
+HUC8_BUCKET = "sdmlab"
+HUC8_PREFIX = "HUC8_boundaries/"
+HUC8_SIMPLIFY_M = 30.0
+HUC8_INDEX_CRS = 5070
+# seconds before the S3 GeoPackage is checked for a new upload
+HUC8_INDEX_TTL = 24 * 3600
+
+_HUC8_INDEX = {}
+_HUC8_INDEX_LOCK = threading.Lock()
+_HUC8_INDEX_PATH = {"path": None, "checked": 0.0}
+
+
+class HUC8Index:
+    """STRtree over simplified HUC8 polygons (columns HUC8, name, geometry in EPSG:5070)."""
+
+    def __init__(self, gdf: gpd.GeoDataFrame):
+        self.hucs = gdf.reset_index(drop=True)
+        self.tree = STRtree(self.hucs.geometry.values)
+
+    def intersecting(self, geometry) -> gpd.GeoDataFrame:
+        """HUC8 rows intersecting a geometry given in EPSG:5070."""
+        idx = self.tree.query(geometry, predicate="intersects")
+        return self.hucs.iloc[sorted(idx)]
+
+
+def build_huc8_index(
+    gpkg_path: str, out_path: str, tolerance: float = HUC8_SIMPLIFY_M
+) -> str:
+    """Write the simplified HUC8 GeoParquet for a HUC8 GeoPackage."""
+    gdf = gpd.read_file(gpkg_path)
+    gdf = gdf[["HUC8", "name", "geometry"]].to_crs(HUC8_INDEX_CRS)
+    gdf["HUC8"] = gdf["HUC8"].astype(str)
+    gdf["geometry"] = gdf.geometry.simplify(tolerance, preserve_topology=True)
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    gdf.to_parquet(tmp, index=False)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def _default_index_path(ttl: float = HUC8_INDEX_TTL) -> str:
+    """
+    Index built from the cached S3 GeoPackage. The resolved path is reused for ttl
+    seconds, so repeated lookups neither list S3 nor touch the network.
+    """
+    with _HUC8_INDEX_LOCK:
+        path = _HUC8_INDEX_PATH["path"]
+        if path and os.path.exists(path):
+            if time.time() - _HUC8_INDEX_PATH["checked"] <= ttl:
+                return path
+
+        try:
+            gpkg_path = s3_cached_file_by_suffix(HUC8_BUCKET, HUC8_PREFIX, ".gpkg")
+        except Exception:
+            # S3 unreachable: keep using the index already built, in this process or
+            # (fresh process) next to the last cached GeoPackage
+            if path and os.path.exists(path):
+                return path
+            gpkg_path = cached_file_by_suffix(HUC8_BUCKET, HUC8_PREFIX, ".gpkg")
+            if gpkg_path is None:
+                raise
+        path = os.path.splitext(gpkg_path)[0] + "_index.parquet"
+        if not os.path.exists(path):
+            build_huc8_index(gpkg_path, path)
+        _HUC8_INDEX_PATH.update(path=path, checked=time.time())
+        return path
+
+
+def huc8_index(path: Optional[str] = None) -> HUC8Index:
+    """
+    Shared HUC8Index. path points to a prebuilt GeoParquet (also FIMSERVE_HUC8_INDEX);
+    otherwise the index is built once from the cached S3 HUC8 GeoPackage.
+    """
+    path = path or os.getenv("FIMSERVE_HUC8_INDEX") or _default_index_path()
+
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    with _HUC8_INDEX_LOCK:
+        if key not in _HUC8_INDEX:
+            _HUC8_INDEX[key] = HUC8Index(gpd.read_parquet(path))
+        return _HUC8_INDEX[key]
 
 
 # WRAPPING ALL FUNCTIONS
@@ -61,20 +138,33 @@ def getIntersectedHUC8ID_old(user_boundary):
 
 
 # NEW APPROACH USING ARCGIS REST API- MUCH FASTER THAN S3 DOWNLOAD
+# The local HUC8 index is used first; the REST service is the fallback when it is unavailable.
 class HUC8RESTFinder:
-    def __init__(self, debug: bool = False):
+    def __init__(self, debug: bool = False, use_index: bool = True):
         # Public ArcGIS REST Service (WBD HUC8)
         self.url = "https://services.arcgis.com/ts4gk3YgS68yLGFl/arcgis/rest/services/HUC8_Boundaries/FeatureServer/0"
         self.debug = debug
+        self.use_index = use_index
         self.target_albers = 5070  # Standard for USA Area Calculations
 
     def log(self, msg):
         if self.debug:
             print(f"[HUC8-LOG] {msg}")
 
+    def _local_index(self) -> Optional[HUC8Index]:
+        if not self.use_index:
+            return None
+        try:
+            return huc8_index()
+        except Exception as e:
+            self.log(f"Local HUC8 index unavailable ({e}); using the REST service.")
+            return None
+
     def _extract_geometry(
         self, path: Union[str, Path], layer: Optional[str] = None
     ) -> gpd.GeoDataFrame:
+        if isinstance(path, gpd.GeoDataFrame):
+            return path
         path = Path(path)
         ext = path.suffix.lower()
 
@@ -100,44 +190,51 @@ class HUC8RESTFinder:
             return [list(p.exterior.coords) for p in geometry.geoms]
         return []
 
-    # This function calculates the percentage area of the user's boundary that overlaps with each intersecting HUC8 region.
-    def get_huc_area_mapping(
-        self, boundary_path: Union[str, Path], layer: Optional[str] = None
-    ) -> Dict[str, float]:
-        """Returns a raw dictionary {HUC8: percentage} for evaluation logic."""
-        user_gdf = self._extract_geometry(boundary_path, layer)
-        if user_gdf.crs is None:
-            return {}
-
+    def _rest_hucs(self, user_gdf: gpd.GeoDataFrame, with_geometry: bool):
+        """HUC8 features intersecting the boundary from the ArcGIS REST service."""
         user_4326 = user_gdf.to_crs(4326)
-        user_geom_union = unary_union(user_4326.geometry)
-        rings = self._get_rings(user_geom_union)
-
+        rings = self._get_rings(unary_union(user_4326.geometry))
         esri_geom = {"rings": rings, "spatialReference": {"wkid": 4326}}
 
         params = {
-            "f": "geojson",
+            "f": "geojson" if with_geometry else "json",
             "where": "1=1",
             "geometry": json.dumps(esri_geom),
             "geometryType": "esriGeometryPolygon",
             "spatialRel": "esriSpatialRelIntersects",
             "inSR": 4326,
-            "outFields": "HUC8",
-            "returnGeometry": "true",
+            "outFields": "HUC8" if with_geometry else "HUC8,name",
+            "returnGeometry": "true" if with_geometry else "false",
             "outSR": 4326,
         }
-
         response = requests.post(f"{self.url}/query", data=params, timeout=30)
         if response.status_code != 200:
-            return {}
+            return None
+        if with_geometry:
+            return gpd.read_file(BytesIO(response.content))
+        return [f["attributes"] for f in response.json().get("features", [])]
 
-        huc_results = gpd.read_file(BytesIO(response.content))
-        if huc_results.empty:
+    # This function calculates the percentage area of the user's boundary that overlaps with each intersecting HUC8 region.
+    def get_huc_area_mapping(
+        self, boundary_path: Union[str, Path], layer: Optional[str] = None
+    ) -> Dict[str, float]:
+        """Returns a raw dictionary {HUC8: percentage} for evaluation logic."""
+        user_gdf = self._extract_geometry(boundary_path, layer)
+        if user_gdf.crs is None:
             return {}
 
         user_albers = user_gdf.to_crs(self.target_albers)
-        huc_albers = huc_results.to_crs(self.target_albers)
-        total_user_area = unary_union(user_albers.geometry).area
+        user_union = unary_union(user_albers.geometry)
+        total_user_area = user_union.area
+
+        index = self._local_index()
+        if index is not None:
+            huc_albers = index.intersecting(user_union)
+        else:
+            huc_results = self._rest_hucs(user_gdf, with_geometry=True)
+            if huc_results is None or huc_results.empty:
+                return {}
+            huc_albers = huc_results.to_crs(self.target_albers)
 
         mapping = {}
         for _, huc in huc_albers.iterrows():
@@ -165,27 +262,18 @@ class HUC8RESTFinder:
 
         # Simple intersection logic
         user_gdf = self._extract_geometry(boundary_path, layer)
-        user_4326 = user_gdf.to_crs(4326)
-        rings = self._get_rings(unary_union(user_4326.geometry))
-
-        params = {
-            "f": "json",
-            "where": "1=1",
-            "geometry": json.dumps({"rings": rings}),
-            "geometryType": "esriGeometryPolygon",
-            "spatialRel": "esriSpatialRelIntersects",
-            "inSR": 4326,
-            "outFields": "HUC8,name",
-            "returnGeometry": "false",
-        }
-        res = requests.post(f"{self.url}/query", data=params).json()
-        features = res.get("features", [])
+        index = self._local_index()
+        if index is not None:
+            user_albers = user_gdf.to_crs(self.target_albers)
+            hucs = index.intersecting(unary_union(user_albers.geometry))
+            features = hucs[["HUC8", "name"]].to_dict("records")
+        else:
+            features = self._rest_hucs(user_gdf, with_geometry=False)
         if not features:
             return "No HUC8 regions found."
 
         output = ["Your boundary falls within:\n" + "-" * 30]
-        for f in features:
-            attr = f["attributes"]
+        for attr in features:
             output.append(f"HUC8: {attr['HUC8']} | Name: {attr['name']}")
         return "\n".join(output)
 
@@ -7,10 +7,17 @@ from ..datadownload import setup_directories
 
 
 def plotcomparision(
-    data_dir_nwm, data_dir_usgs, feature_id, usgs_site, output_dir, start_date, end_date
+    data_dir_nwm,
+    data_dir_usgs,
+    feature_id,
+    usgs_site,
+    output_dir,
+    start_date,
+    end_date,
+    huc=None,
 ):
-    nwm_data = getFIDdata(data_dir_nwm, feature_id, start_date, end_date)
-    usgs_data = getUSGSdata(data_dir_usgs, usgs_site, start_date, end_date)
+    nwm_data = getFIDdata(data_dir_nwm, feature_id, start_date, end_date, huc)
+    usgs_data = getUSGSdata(data_dir_usgs, usgs_site, start_date, end_date, huc)
 
     plt.figure(figsize=(10, 5))
     # Plot NWM data with solid line
@@ -66,4 +73,5 @@ def CompareNWMnUSGSStreamflow(huc, feature_id, usgs_site, start_date, end_date):
         HUC_dir,
         start_date,
         end_date,
+        huc,
     )
@@ -3,9 +3,10 @@ import os
 import matplotlib.pyplot as plt
 
 from ..datadownload import setup_directories
+from ..streamflowstore import stored_series
 
 
-def getFIDdata(data_dir, feature_id, start_date, end_date):
+def getFIDdata(data_dir, feature_id, start_date, end_date, huc=None):
     location_id = f"nwm30-{feature_id}"
 
     if isinstance(start_date, str):
@@ -13,6 +14,15 @@ def getFIDdata(data_dir, feature_id, start_date, end_date):
     if isinstance(end_date, str):
         end_date = pd.to_datetime(end_date)
 
+    # Local streamflow store first, then the downloaded date-range file
+    stored = stored_series(
+        "nwm30_retrospective", huc, [location_id], start_date, end_date
+    )
+    if stored is not None:
+        return stored[["value_time", "value"]].rename(
+            columns={"value_time": "Date", "value": "Discharge"}
+        )
+
     start_dateSTR = start_date.strftime("%Y%m%d")
     end_dateSTR = end_date.strftime("%Y%m%d")
     target_file = f"{start_dateSTR}_{end_dateSTR}.parquet"
@@ -38,7 +48,11 @@ def getFIDdata(data_dir, feature_id, start_date, end_date):
 
 
 # For the default feature_id
-def getFeatureWithMaxDischarge(data_dir, start_date, end_date):
+def getFeatureWithMaxDischarge(data_dir, start_date, end_date, huc=None):
+    stored = stored_series("nwm30_retrospective", huc, None, start_date, end_date)
+    if stored is not None:
+        return stored.loc[stored["value"].idxmax(), "location_id"].split("-")[1]
+
     start_dateSTR = pd.to_datetime(start_date).strftime("%Y%m%d")
     end_dateSTR = pd.to_datetime(end_date).strftime("%Y%m%d")
     target_file = f"{start_dateSTR}_{end_dateSTR}.parquet"
@@ -57,14 +71,16 @@ def getFeatureWithMaxDischarge(data_dir, start_date, end_date):
     return max_feature_id
 
 
-def plotNWMStreamflowData(dischargedata, feature_ids, output_dir, start_date, end_date):
+def plotNWMStreamflowData(
+    dischargedata, feature_ids, output_dir, start_date, end_date, huc=None
+):
     plt.figure(figsize=(10, 5))
     missing_ids = []
     plotted_ids = []
 
     for feature_id in feature_ids:
         try:
-            data = getFIDdata(dischargedata, feature_id, start_date, end_date)
+            data = getFIDdata(dischargedata, feature_id, start_date, end_date, huc)
             if data.empty:
                 raise ValueError(f"No data for feature ID: {feature_id}")
 
@@ -114,10 +130,14 @@ def plotNWMStreamflow(huc, start_date, end_date, feature_ids=None):
         output_dir, f"flood_{huc}", "discharge", "nwm30_retrospective"
     )
     if feature_ids is None or not feature_ids:
-        max_feature_id = getFeatureWithMaxDischarge(discharge_dir, start_date, end_date)
+        max_feature_id = getFeatureWithMaxDischarge(
+            discharge_dir, start_date, end_date, huc
+        )
         print(
             f"*****No feature_id provided. Using the feature with max discharge: {max_feature_id}******"
         )
         feature_ids = [max_feature_id]
 
-    plotNWMStreamflowData(discharge_dir, feature_ids, huc_dir, start_date, end_date)
+    plotNWMStreamflowData(
+        discharge_dir, feature_ids, huc_dir, start_date, end_date, huc
+    )
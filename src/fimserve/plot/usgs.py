@@ -6,9 +6,10 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 
 from ..datadownload import setup_directories
+from ..streamflowstore import stored_series
 
 
-def getUSGSdata(data_dir, usgs_site, start_date, end_date):
+def getUSGSdata(data_dir, usgs_site, start_date, end_date, huc=None):
     location_id = f"usgs-{usgs_site}"
 
     if isinstance(start_date, str):
@@ -16,6 +17,13 @@ def getUSGSdata(data_dir, usgs_site, start_date, end_date):
     if isinstance(end_date, str):
         end_date = pd.to_datetime(end_date)
 
+    # Local streamflow store first, then the downloaded date-range file
+    stored = stored_series("usgs", huc, [location_id], start_date, end_date)
+    if stored is not None:
+        return stored[["value_time", "value"]].rename(
+            columns={"value_time": "Date", "value": "Discharge"}
+        )
+
     start_dateSTR = start_date.strftime("%Y-%m-%d")
     end_dateSTR = end_date.strftime("%Y-%m-%d")
     target_file = f"{start_dateSTR}_{end_dateSTR}.parquet"
@@ -35,12 +43,14 @@ def getUSGSdata(data_dir, usgs_site, start_date, end_date):
     return filtered_data if not filtered_data.empty else None
 
 
-def plotUSGSStreamflowData(dischargedata, usgs_sites, output_dir, start_date, end_date):
+def plotUSGSStreamflowData(
+    dischargedata, usgs_sites, output_dir, start_date, end_date, huc=None
+):
     plt.figure(figsize=(10, 5))
     missing_sites = []
 
     for usgs_site in usgs_sites:
-        data = getUSGSdata(dischargedata, usgs_site, start_date, end_date)
+        data = getUSGSdata(dischargedata, usgs_site, start_date, end_date, huc)
         if data is None:
             missing_sites.append(usgs_site)  # Track missing data
             continue
@@ -81,4 +91,6 @@ def plotUSGSStreamflow(huc, usgs_sites, start_date, end_date):
         output_dir, f"flood_{huc}", "discharge", "usgs_streamflow"
     )
     HUC_dir = os.path.join(output_dir, f"flood_{huc}")
-    plotUSGSStreamflowData(discharge_dir, usgs_sites, HUC_dir, start_date, end_date)
+    plotUSGSStreamflowData(
+        discharge_dir, usgs_sites, HUC_dir, start_date, end_date, huc
+    )
@@ -8,9 +8,11 @@ import sys
 import glob
 import shutil
 import rasterio
+import pandas as pd
 import subprocess
 from dotenv import load_dotenv
 from rasterio.io import MemoryFile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from .datadownload import setup_directories
 
@@ -39,102 +41,306 @@ def _retag_5070_lzw_inplace(tif_path: str) -> None:
     os.replace(tmp, tif_path)
 
 
+def _prepare_owp_env(code_dir):
+    """Load the OWP .env and make the inundation-mapping sources importable."""
+    tools_path = os.path.join(code_dir, "tools")
+    src_path = os.path.join(code_dir, "src")
+    load_dotenv(os.path.join(code_dir, ".env"))
+    for p in (src_path, code_dir, tools_path):
+        if p not in sys.path:
+            sys.path.append(p)
+    return tools_path, src_path
+
+
+def _inundation_paths(output_dir, HUC_code, data_dir, depth=False):
+    HUC_code = str(HUC_code)
+    HUC_dir = os.path.join(output_dir, f"flood_{HUC_code}")
+    discharge_basename = os.path.basename(data_dir).split(".")[0]
+    inundation_dir = os.path.join(HUC_dir, f"{HUC_code}_inundation")
+
+    # Each discharge file gets its own staging folder so parallel runs never collide
+    temp_dir = os.path.join(inundation_dir, "temp", discharge_basename)
+    os.makedirs(temp_dir, exist_ok=True)
+
+    inundation_file = os.path.join(temp_dir, f"{discharge_basename}_inundation.tif")
+    depth_file = (
+        os.path.join(temp_dir, f"{discharge_basename}_depth.tif") if depth else None
+    )
+    return HUC_dir, inundation_dir, temp_dir, inundation_file, depth_file
+
+
+def _move_into_place(tmp_file, inundation_dir):
+    dest_file = os.path.join(inundation_dir, os.path.basename(tmp_file))
+    os.makedirs(inundation_dir, exist_ok=True)
+    try:
+        os.replace(tmp_file, dest_file)
+    except Exception:
+        if os.path.exists(dest_file):
+            os.remove(dest_file)
+        shutil.move(tmp_file, dest_file)
+    _retag_5070_lzw_inplace(dest_file)
+    return dest_file
+
+
+def _finalize_outputs(inundation_dir, temp_dir, inundation_file, depth_file=None):
+    if os.path.exists(inundation_file):
+        _move_into_place(inundation_file, inundation_dir)
+    if depth_file and os.path.exists(depth_file):
+        _move_into_place(depth_file, inundation_dir)
+    _remove_temp(temp_dir)
+
+
+def _remove_temp(temp_dir):
+    if os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+    parent_temp = os.path.dirname(temp_dir)
+    try:
+        os.rmdir(parent_temp)
+    except OSError:
+        # Other discharge files of this HUC are still being staged
+        pass
+
+
 # Main module for the FIM execution
 def runfim(code_dir, output_dir, HUC_code, data_dir, depth=False):
-    original_dir = os.getcwd()
+    tools_path, src_path = _prepare_owp_env(code_dir)
+
+    HUC_code = str(HUC_code)
+    csv_path = data_dir
+    HUC_dir, inundation_dir, temp_dir, inundation_file, depth_file = _inundation_paths(
+        output_dir, HUC_code, data_dir, depth
+    )
+
+    Command = [
+        sys.executable,
+        "inundate_mosaic_wrapper.py",
+        "-y",
+        HUC_dir,
+        "-u",
+        HUC_code,
+        "-f",
+        csv_path,
+        "-i",
+        inundation_file,
+    ]
+    if depth_file:
+        Command += ["-d", depth_file]
+
+    env = os.environ.copy()
+    env["PYTHONPATH"] = f"{src_path}{os.pathsep}{code_dir}"
+
+    result = subprocess.run(
+        Command,
+        cwd=tools_path,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    print(result.stdout.decode())
+    if result.stderr:
+        print(result.stderr.decode())
+
+    if result.returncode == 0:
+        print(f"Inundation mapping for {HUC_code} completed successfully.")
+        _finalize_outputs(inundation_dir, temp_dir, inundation_file, depth_file)
+    else:
+        print(f"Failed to complete inundation mapping for {HUC_code}.")
+        _remove_temp(temp_dir)
+    return result.returncode == 0
+
+
+# IN-PROCESS WORKER POOL
+# Each worker imports the OWP inundation code once and then serves many discharge files.
+_OWP_MOSAIC = None
+_OWP_CODE_DIR = None
+
+# Branch hydrotables parsed in this worker for the HUC it is mapping. OWP reads every
+# branch hydroTable_<branch>.csv again for each discharge file; the parsed frames are
+# reused for the following files of the same HUC (copies, so OWP may modify them).
+_HYDROTABLES = {}
+_HYDROTABLES_HUC = None
+_READ_CSV = pd.read_csv
+
+
+def _cached_read_csv(filepath_or_buffer, *args, **kwargs):
+    path = filepath_or_buffer
+    if not (
+        isinstance(path, (str, os.PathLike))
+        and os.path.basename(str(path)).startswith("hydroTable")
+    ):
+        return _READ_CSV(filepath_or_buffer, *args, **kwargs)
+
+    key = (
+        os.path.abspath(path),
+        os.path.getmtime(path),
+        repr(args),
+        repr(sorted(kwargs.items())),
+    )
+    if key not in _HYDROTABLES:
+        frame = _READ_CSV(path, *args, **kwargs)
+        if not isinstance(frame, pd.DataFrame):
+            # chunksize/iterator readers are not cached
+            return frame
+        _HYDROTABLES[key] = frame
+    return _HYDROTABLES[key].copy()
+
+
+def _use_hydrotables_of(HUC_code):
+    """Keep only the cached hydrotables of the HUC being mapped."""
+    global _HYDROTABLES_HUC
+    if _HYDROTABLES_HUC != HUC_code:
+        _HYDROTABLES.clear()
+        _HYDROTABLES_HUC = HUC_code
+
+
+def _owp_worker_init(code_dir):
+    global _OWP_MOSAIC, _OWP_CODE_DIR
+    tools_path, _ = _prepare_owp_env(code_dir)
+    os.chdir(tools_path)
+    _OWP_CODE_DIR = code_dir
+    # OWP modules call pd.read_csv at run time, so they pick up the cached reader
+    pd.read_csv = _cached_read_csv
     try:
-        tools_path = os.path.join(code_dir, "tools")
-        src_path = os.path.join(code_dir, "src")
-        os.chdir(tools_path)
-        dotenv_path = os.path.join(code_dir, ".env")
-        load_dotenv(dotenv_path)
-        sys.path.append(src_path)
-        sys.path.append(code_dir)
-
-        HUC_code = str(HUC_code)
-        HUC_dir = os.path.join(output_dir, f"flood_{HUC_code}")
-        csv_path = data_dir
-
-        discharge_basename = os.path.basename(data_dir).split(".")[0]
-        inundation_dir = os.path.join(HUC_dir, f"{HUC_code}_inundation")
-        temp_dir = os.path.join(inundation_dir, "temp")
-
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-
-        inundation_file = os.path.join(temp_dir, f"{discharge_basename}_inundation.tif")
-        Command = [
-            sys.executable,
-            "inundate_mosaic_wrapper.py",
-            "-y",
+        import inundate_mosaic_wrapper
+
+        _OWP_MOSAIC = inundate_mosaic_wrapper
+    except Exception as e:
+        # Older/newer OWP trees that do not import cleanly fall back to the CLI
+        print(f"In-process OWP import failed ({e}); using subprocess per file.")
+        _OWP_MOSAIC = None
+
+
+def _owp_worker_run(output_dir, HUC_code, csv_path, depth):
+    if _OWP_MOSAIC is None:
+        if not runfim(_OWP_CODE_DIR, output_dir, HUC_code, csv_path, depth=depth):
+            raise RuntimeError("inundate_mosaic_wrapper.py exited with an error")
+        return csv_path
+
+    HUC_dir, inundation_dir, temp_dir, inundation_file, depth_file = _inundation_paths(
+        output_dir, HUC_code, csv_path, depth
+    )
+    _use_hydrotables_of(str(HUC_code))
+    try:
+        _OWP_MOSAIC.produce_mosaicked_inundation(
             HUC_dir,
-            "-u",
-            HUC_code,
-            "-f",
+            [str(HUC_code)],
             csv_path,
-            "-i",
-            inundation_file,
-        ]
-
-        if depth:
-            depth_file = os.path.join(temp_dir, f"{discharge_basename}_depth.tif")
-            Command += ["-d", depth_file]
-        else:
-            depth_file = None
-
-        env = os.environ.copy()
-        env["PYTHONPATH"] = f"{src_path}{os.pathsep}{code_dir}"
-
-        result = subprocess.run(
-            Command,
-            cwd=tools_path,
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            inundation_raster=inundation_file,
+            depths_raster=depth_file,
+            num_workers=1,
+            remove_intermediate=True,
         )
+        _finalize_outputs(inundation_dir, temp_dir, inundation_file, depth_file)
+    finally:
+        # Leave no staging folder behind when the mapping fails
+        _remove_temp(temp_dir)
+    return csv_path
+
+
+class HANDInundationEngine:
+    """
+    Persistent pool of OWP HAND inundation workers.
+
+    Every worker process pays the interpreter start-up and the inundation-mapping
+    imports once, then maps discharge CSVs across cores. The branch hydrotables of a
+    HUC are parsed once per worker and reused for its following discharge files; the
+    branch REM/catchment rasters are still opened by OWP for every file (only the
+    windows it needs are read). One engine can be reused for many HUCs (e.g.
+    ensemble/forecast members or a multi-HUC batch).
 
-        print(result.stdout.decode())
-        if result.stderr:
-            print(result.stderr.decode())
+    Usage:
+        with HANDInundationEngine(workers=8) as engine:
+            engine.run("03020202", discharge_files)
+    """
 
-        if result.returncode == 0:
-            print(f"Inundation mapping for {HUC_code} completed successfully.")
+    def __init__(self, code_dir=None, output_dir=None, workers=None):
+        if code_dir is None or output_dir is None:
+            _code_dir, _, _output_dir = setup_directories()
+            code_dir = code_dir or _code_dir
+            output_dir = output_dir or _output_dir
+        self.code_dir = os.path.abspath(code_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self._pool = None
 
-            if os.path.exists(inundation_file):
-                dest_file = os.path.join(
-                    inundation_dir, os.path.basename(inundation_file)
+    def _ensure_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_owp_worker_init,
+                initargs=(self.code_dir,),
+            )
+        return self._pool
+
+    def start(self):
+        """
+        Start every worker process now. Forking while other threads hold locks (e.g.
+        boto3/requests in download threads) can deadlock the children, so callers
+        that run threads next to the engine start it first.
+        """
+        pool = self._ensure_pool()
+        # With the fork start method the first submit spawns all workers at once
+        pool.submit(os.getpid).result()
+        return self
+
+    def submit(self, huc, discharge_file, depth=False):
+        return self._ensure_pool().submit(
+            _owp_worker_run,
+            self.output_dir,
+            str(huc),
+            os.path.abspath(discharge_file),
+            depth,
+        )
+
+    def run(self, huc, discharge_files, depth=False):
+        """Run every discharge file of a HUC and return the list of failed files."""
+        futures = {self.submit(huc, f, depth): f for f in discharge_files}
+        failed = []
+        for fut in as_completed(futures):
+            csv_path = futures[fut]
+            try:
+                fut.result()
+                print(
+                    f"Inundation mapping for {huc} ({os.path.basename(csv_path)}) completed successfully."
                 )
-                os.makedirs(inundation_dir, exist_ok=True)
-                try:
-                    os.replace(inundation_file, dest_file)
-                except Exception:
-                    if os.path.exists(dest_file):
-                        os.remove(dest_file)
-                    shutil.move(inundation_file, dest_file)
-                _retag_5070_lzw_inplace(dest_file)
+            except Exception as e:
+                failed.append(csv_path)
+                print(
+                    f"Failed to complete inundation mapping for {huc} ({os.path.basename(csv_path)}): {e}"
+                )
+        return failed
 
-            if depth and depth_file and os.path.exists(depth_file):
-                dest_depth = os.path.join(inundation_dir, os.path.basename(depth_file))
-                try:
-                    os.replace(depth_file, dest_depth)
-                except Exception:
-                    if os.path.exists(dest_depth):
-                        os.remove(dest_depth)
-                    shutil.move(depth_file, dest_depth)
-                _retag_5070_lzw_inplace(dest_depth)
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
 
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-        else:
-            print(f"Failed to complete inundation mapping for {HUC_code}.")
+    def __enter__(self):
+        return self
 
-    finally:
-        os.chdir(original_dir)
+    def __exit__(self, *exc):
+        self.close()
 
 
-def runOWPHANDFIM(huc, depth=False, version=None):
+def runOWPHANDFIM(huc, depth=False, version=None, workers=None, engine=None):
+    """
+    Generate OWP HAND FIM for every discharge CSV of the HUC in ./data/inputs.
+
+    :param workers: Number of worker processes; defaults to one per CPU (capped at the number of discharge files).
+    :param engine: An existing HANDInundationEngine to reuse across calls.
+    """
     code_dir, data_dir, output_dir = setup_directories()
 
-    discharge = glob.glob(os.path.join(data_dir, f"*{huc}*.csv"))
-    for file in discharge:
-        runfim(code_dir, output_dir, huc, file, depth=depth)
+    discharge = sorted(glob.glob(os.path.join(data_dir, f"*{huc}*.csv")))
+    if not discharge:
+        print(f"No discharge files found for {huc} in {data_dir}.")
+        return
+
+    if engine is not None:
+        return engine.run(huc, discharge, depth=depth)
+
+    if workers is None:
+        workers = min(len(discharge), os.cpu_count() or 1)
+    with HANDInundationEngine(code_dir, output_dir, workers=workers) as eng:
+        return eng.run(huc, discharge, depth=depth)
@@ -0,0 +1,313 @@
+"""
+Shared local cache for remote (S3) assets.
+
+Objects are stored under <cache_dir>/<sha(bucket/key)>/<etag>/<basename>, so a new
+upload of the same key gets a new entry while unchanged objects are reused across
+calls, HUCs and processes. Every entry has a meta.json whose mtime is refreshed on
+each hit; when the cache grows past its size cap the least recently used entries
+are evicted.
+
+Configuration (environment variables or configure_cache()):
+    FIMSERVE_CACHE_DIR     cache location (default ~/.cache/fimserve)
+    FIMSERVE_CACHE_MAX_GB  size cap in GB (default 20)
+    FIMSERVE_OFFLINE       "1" to never touch the network and only serve cached entries
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import boto3
+from botocore import UNSIGNED
+from botocore.config import Config
+
+META_NAME = "meta.json"
+
+_CONFIG = {"cache_dir": None, "max_gb": None, "offline": None}
+_CLIENT = None
+_LOCK = threading.Lock()
+
+
+def configure_cache(
+    cache_dir: Optional[str] = None,
+    max_gb: Optional[float] = None,
+    offline: Optional[bool] = None,
+) -> None:
+    """Override the cache location, size cap or offline mode for this process."""
+    if cache_dir is not None:
+        _CONFIG["cache_dir"] = cache_dir
+    if max_gb is not None:
+        _CONFIG["max_gb"] = float(max_gb)
+    if offline is not None:
+        _CONFIG["offline"] = bool(offline)
+
+
+def cache_dir() -> str:
+    d = _CONFIG["cache_dir"] or os.getenv(
+        "FIMSERVE_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "fimserve"),
+    )
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def max_bytes() -> int:
+    gb = _CONFIG["max_gb"]
+    if gb is None:
+        gb = float(os.getenv("FIMSERVE_CACHE_MAX_GB", "20"))
+    return int(gb * 1024**3)
+
+
+def is_offline() -> bool:
+    if _CONFIG["offline"] is not None:
+        return _CONFIG["offline"]
+    return os.getenv("FIMSERVE_OFFLINE", "0").lower() in ("1", "true", "yes")
+
+
+def _client():
+    global _CLIENT
+    with _LOCK:
+        if _CLIENT is None:
+            _CLIENT = boto3.client(
+                "s3",
+                config=Config(signature_version=UNSIGNED, max_pool_connections=32),
+            )
+    return _CLIENT
+
+
+def _key_dir(bucket: str, key: str) -> str:
+    digest = hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir(), digest[:2], digest)
+
+
+def _etag_dir(bucket: str, key: str, etag: str) -> str:
+    return os.path.join(_key_dir(bucket, key), etag.strip('"').replace("-", "_"))
+
+
+def _read_meta(entry_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(entry_dir, META_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _touch(entry_dir: str) -> None:
+    try:
+        os.utime(os.path.join(entry_dir, META_NAME), None)
+    except OSError:
+        pass
+
+
+def _entry_files(entry_dir: str, meta: Dict) -> Optional[List[str]]:
+    files = [os.path.join(entry_dir, name) for name in meta.get("files", [])]
+    if files and all(os.path.exists(p) for p in files):
+        return files
+    return None
+
+
+def _latest_cached(bucket: str, key: str) -> Optional[List[str]]:
+    """Most recently used complete entry for bucket/key regardless of ETag (offline mode)."""
+    kdir = _key_dir(bucket, key)
+    if not os.path.isdir(kdir):
+        return None
+    best, best_mtime = None, -1.0
+    for name in os.listdir(kdir):
+        entry = os.path.join(kdir, name)
+        meta = _read_meta(entry)
+        files = _entry_files(entry, meta) if meta else None
+        if files:
+            mtime = os.path.getmtime(os.path.join(entry, META_NAME))
+            if mtime > best_mtime:
+                best, best_mtime = (entry, files), mtime
+    if best is None:
+        return None
+    _touch(best[0])
+    return best[1]
+
+
+def _store(bucket: str, key: str, etag: str, objects: Dict[str, str]) -> List[str]:
+    """Download {s3_key: basename} into the entry for (bucket, key, etag)."""
+    entry = _etag_dir(bucket, key, etag)
+    meta = _read_meta(entry)
+    files = _entry_files(entry, meta) if meta else None
+    if files:
+        _touch(entry)
+        return files
+
+    os.makedirs(entry, exist_ok=True)
+    client = _client()
+    files = []
+    tmp = None
+    try:
+        for s3_key, name in objects.items():
+            dest = os.path.join(entry, name)
+            tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+            client.download_file(bucket, s3_key, tmp)
+            os.replace(tmp, dest)
+            files.append(dest)
+    except BaseException:
+        # Entries without meta.json are invisible to evict(); never leave one behind
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        if _read_meta(entry) is None:
+            shutil.rmtree(entry, ignore_errors=True)
+        raise
+
+    meta = {
+        "bucket": bucket,
+        "key": key,
+        "etag": etag,
+        "files": list(objects.values()),
+        "size": sum(os.path.getsize(p) for p in files),
+        "created": time.time(),
+    }
+    tmp_meta = os.path.join(entry, f"{META_NAME}.{os.getpid()}.tmp")
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(entry, META_NAME))
+
+    evict(keep=entry)
+    return files
+
+
+def s3_cached_file(bucket: str, key: str, etag: Optional[str] = None) -> str:
+    """
+    Local path of s3://bucket/key, downloading it only if the ETag is not cached yet.
+    Pass etag when it is already known (e.g. from a listing) to skip the HEAD request.
+    """
+    if is_offline():
+        files = _latest_cached(bucket, key)
+        if not files:
+            raise FileNotFoundError(f"Offline mode: s3://{bucket}/{key} is not cached.")
+        return files[0]
+
+    if etag is None:
+        etag = _client().head_object(Bucket=bucket, Key=key)["ETag"]
+    etag = etag.strip('"')
+    return _store(bucket, key, etag, {key: os.path.basename(key)})[0]
+
+
+def s3_pinned_file(bucket: str, key: str, etag: str) -> str:
+    """
+    Local path of s3://bucket/key at exactly this ETag. A cached copy is used without
+    touching S3; otherwise it is downloaded only if S3 still holds that version.
+    """
+    etag = etag.strip('"')
+    entry = _etag_dir(bucket, key, etag)
+    meta = _read_meta(entry)
+    files = _entry_files(entry, meta) if meta else None
+    if files:
+        _touch(entry)
+        return files[0]
+    if is_offline():
+        raise FileNotFoundError(
+            f"Offline mode: s3://{bucket}/{key} (ETag {etag}) is not cached."
+        )
+
+    current = _client().head_object(Bucket=bucket, Key=key)["ETag"].strip('"')
+    if current != etag:
+        raise ValueError(
+            f"s3://{bucket}/{key} is now at ETag {current}, not the pinned {etag}."
+        )
+    return _store(bucket, key, etag, {key: os.path.basename(key)})[0]
+
+
+def _list_with_etags(bucket: str, prefix: str) -> Dict[str, str]:
+    """Direct children of prefix (like s3fs ls) with their ETags."""
+    out = {}
+    paginator = _client().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        for obj in page.get("Contents", []) or []:
+            out[obj["Key"]] = obj["ETag"].strip('"')
+    return out
+
+
+def cached_file_by_suffix(bucket: str, prefix: str, suffix: str) -> Optional[str]:
+    """Last cached copy from s3_cached_file_by_suffix without touching the network, or None."""
+    files = _latest_cached(bucket, f"{prefix}*{suffix}")
+    return files[0] if files else None
+
+
+def s3_cached_file_by_suffix(bucket: str, prefix: str, suffix: str) -> str:
+    """Cached local path of the first object under prefix that ends with suffix."""
+    bundle_key = f"{prefix}*{suffix}"
+    if is_offline():
+        files = _latest_cached(bucket, bundle_key)
+        if not files:
+            raise FileNotFoundError(
+                f"Offline mode: no cached {suffix} file for s3://{bucket}/{prefix}"
+            )
+        return files[0]
+
+    listing = _list_with_etags(bucket, prefix)
+    key = next((k for k in sorted(listing) if k.endswith(suffix)), None)
+    if key is None:
+        raise FileNotFoundError(f"No {suffix} file found in s3://{bucket}/{prefix}")
+    return _store(bucket, bundle_key, listing[key], {key: os.path.basename(key)})[0]
+
+
+def s3_cached_bundle(bucket: str, prefix: str, suffixes: Iterable[str]) -> List[str]:
+    """
+    Cache every object under prefix with one of the suffixes into a single folder
+    (e.g. all components of a shapefile) and return their local paths.
+    """
+    suffixes = tuple(suffixes)
+    bundle_key = f"{prefix}*{'|'.join(suffixes)}"
+    if is_offline():
+        files = _latest_cached(bucket, bundle_key)
+        if not files:
+            raise FileNotFoundError(
+                f"Offline mode: s3://{bucket}/{prefix} bundle is not cached."
+            )
+        return files
+
+    listing = _list_with_etags(bucket, prefix)
+    keys = sorted(k for k in listing if k.endswith(suffixes))
+    if not keys:
+        raise FileNotFoundError(f"No {suffixes} files found in s3://{bucket}/{prefix}")
+    combined = hashlib.sha256("|".join(listing[k] for k in keys).encode()).hexdigest()
+    return _store(bucket, bundle_key, combined, {k: os.path.basename(k) for k in keys})
+
+
+def _entries():
+    root = cache_dir()
+    for shard in os.listdir(root):
+        shard_dir = os.path.join(root, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for kname in os.listdir(shard_dir):
+            kdir = os.path.join(shard_dir, kname)
+            if not os.path.isdir(kdir):
+                continue
+            for ename in os.listdir(kdir):
+                entry = os.path.join(kdir, ename)
+                meta_path = os.path.join(entry, META_NAME)
+                if os.path.exists(meta_path):
+                    yield entry, os.path.getmtime(meta_path), _read_meta(entry) or {}
+
+
+def evict(limit: Optional[int] = None, keep: Optional[str] = None) -> int:
+    """Remove least recently used entries until the cache fits in limit bytes. Returns bytes freed."""
+    limit = max_bytes() if limit is None else int(limit)
+    entries = sorted(_entries(), key=lambda e: e[1])
+    total = sum(meta.get("size", 0) for _, _, meta in entries)
+    freed = 0
+    for entry, _, meta in entries:
+        if total <= limit:
+            break
+        if keep and os.path.abspath(entry) == os.path.abspath(keep):
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= meta.get("size", 0)
+        freed += meta.get("size", 0)
+    return freed
+
+
+def clear_cache() -> None:
+    """Delete every cached object."""
+    evict(limit=0)
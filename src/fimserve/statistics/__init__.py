@@ -1,3 +1,3 @@
-from .calculatestatistics import CalculateStatistics
+from .calculatestatistics import CalculateStatistics, CalculateHUCStatistics
 
-__all__ = ["CalculateStatistics"]
+__all__ = ["CalculateStatistics", "CalculateHUCStatistics"]
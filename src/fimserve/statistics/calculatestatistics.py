@@ -1,13 +1,17 @@
 import os
 import pandas as pd
 import numpy as np
+import pyarrow.dataset as pads
+import pyarrow.compute as pc
 from matplotlib import pyplot as plt
 from sklearn.metrics import mean_squared_error, r2_score
 
 from ..plot.nwmfid import getFIDdata
 from ..plot.usgs import getUSGSdata
+from ..plot.usgsandfid import GetUSGSIDandCorrFID
 
 from ..datadownload import setup_directories
+from ..streamflowstore import stored_series
 
 
 # Metrics Calculation
@@ -97,6 +101,144 @@ def visualize_comparison(metrics, output_dir, usgs_site, huc):
     plt.show()
 
 
+def _load_series(source, huc, location_ids, start_date, end_date, legacy_file):
+    """
+    location_id/value_time/value rows for many locations in one columnar read.
+    The local store is used only when it covers the whole window for every location;
+    otherwise the complete <start>_<end> download is read, so metrics never run on
+    truncated series.
+    """
+    df = stored_series(source, huc, location_ids, start_date, end_date)
+    if df is None:
+        if not os.path.exists(legacy_file):
+            raise FileNotFoundError(
+                f"No complete {source} data for {start_date} - {end_date}: the local "
+                f"store does not cover the window and {legacy_file} does not exist."
+            )
+        df = (
+            pads.dataset(legacy_file, format="parquet")
+            .to_table(
+                columns=["location_id", "value_time", "value"],
+                filter=pc.field("location_id").isin(list(location_ids)),
+            )
+            .to_pandas()
+        )
+    df["value_time"] = pd.to_datetime(df["value_time"])
+    return df.drop_duplicates(["location_id", "value_time"])
+
+
+def batch_metrics(pair_codes, simulated, observed, n_pairs):
+    """
+    KGE, NSE and PBias for many series at once. pair_codes (0..n_pairs-1) labels
+    each aligned (simulated, observed) sample; all reductions are np.bincount sums.
+    """
+    count = np.bincount(pair_codes, minlength=n_pairs).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_s = np.bincount(pair_codes, simulated, n_pairs) / count
+        mean_o = np.bincount(pair_codes, observed, n_pairs) / count
+
+        ds = simulated - mean_s[pair_codes]
+        do = observed - mean_o[pair_codes]
+        var_s = np.bincount(pair_codes, ds * ds, n_pairs) / count
+        var_o = np.bincount(pair_codes, do * do, n_pairs) / count
+        cov = np.bincount(pair_codes, ds * do, n_pairs) / count
+
+        r = cov / np.sqrt(var_s * var_o)
+        beta = mean_s / mean_o
+        gamma = np.sqrt(var_s) / np.sqrt(var_o)
+        kge = 1 - np.sqrt((r - 1) ** 2 + (beta - 1) ** 2 + (gamma - 1) ** 2)
+
+        diff = simulated - observed
+        nse = 1 - np.bincount(pair_codes, diff * diff, n_pairs) / (var_o * count)
+        apb = (
+            np.bincount(pair_codes, np.abs(diff), n_pairs)
+            / np.bincount(pair_codes, observed, n_pairs)
+            * 100
+        )
+    return {"n": count.astype(int), "KGE": kge, "PBias (%)": apb, "NSE": nse}
+
+
+def CalculateHUCStatistics(
+    huc, start_date, end_date, pairs=None, plot=False, output_csv=None
+):
+    """
+    KGE, NSE and PBias for every gauge of a HUC in one pass.
+
+    :param pairs: List of (feature_id, usgs_site); defaults to GetUSGSIDandCorrFID(huc).
+    :param plot: Also save the per-gauge metric plots (off by default).
+    :param output_csv: Optional path to save the table.
+    :return: DataFrame with one row per (feature_id, USGS site) pair.
+    """
+    code_dir, data_dir, output_dir = setup_directories()
+    if pairs is None:
+        site_data = GetUSGSIDandCorrFID(huc)
+        pairs = list(zip(site_data["feature_id"], site_data["USGS gauge station ID"]))
+    pairs_df = pd.DataFrame(
+        {
+            "pair": np.arange(len(pairs)),
+            "feature_id": [str(int(float(f))) for f, _ in pairs],
+            "USGS site": [str(u).replace("usgs-", "") for _, u in pairs],
+        }
+    )
+    pairs_df["nwm_id"] = "nwm30-" + pairs_df["feature_id"]
+    pairs_df["usgs_id"] = "usgs-" + pairs_df["USGS site"]
+
+    huc_dir = os.path.join(output_dir, f"flood_{huc}", "discharge")
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    nwm = _load_series(
+        "nwm30_retrospective",
+        huc,
+        pairs_df["nwm_id"].unique(),
+        start,
+        end,
+        os.path.join(
+            huc_dir, "nwm30_retrospective", f"{start:%Y%m%d}_{end:%Y%m%d}.parquet"
+        ),
+    )
+    usgs = _load_series(
+        "usgs",
+        huc,
+        pairs_df["usgs_id"].unique(),
+        start,
+        end,
+        os.path.join(
+            huc_dir, "usgs_streamflow", f"{start:%Y-%m-%d}_{end:%Y-%m-%d}.parquet"
+        ),
+    )
+
+    # One columnar join of every pair's NWM and USGS series on value_time
+    aligned = (
+        pairs_df[["pair", "nwm_id", "usgs_id"]]
+        .merge(
+            nwm.rename(columns={"location_id": "nwm_id", "value": "nwm"}), on="nwm_id"
+        )
+        .merge(
+            usgs.rename(columns={"location_id": "usgs_id", "value": "usgs"}),
+            on=["usgs_id", "value_time"],
+        )
+        .dropna(subset=["nwm", "usgs"])
+    )
+    metrics = batch_metrics(
+        aligned["pair"].to_numpy(),
+        aligned["nwm"].to_numpy(dtype=float),
+        aligned["usgs"].to_numpy(dtype=float),
+        len(pairs_df),
+    )
+
+    table = pairs_df[["feature_id", "USGS site"]].copy()
+    table.insert(0, "HUC8", huc)
+    for key, values in metrics.items():
+        table[key] = values
+
+    if plot:
+        for _, row in table[table["n"] > 0].iterrows():
+            visualize_comparison(row, output_dir, row["USGS site"], huc)
+    if output_csv:
+        os.makedirs(os.path.dirname(os.path.abspath(output_csv)), exist_ok=True)
+        table.to_csv(output_csv, index=False)
+    return table
+
+
 def CalculateStatistics(huc, feature_id, usgs_site, start_date, end_date):
     code_dir, data_dir, output_dir = setup_directories()
     discharge_dir_nwm = os.path.join(
@@ -106,8 +248,8 @@ def CalculateStatistics(huc, feature_id, usgs_site, start_date, end_date):
         output_dir, f"flood_{huc}", "discharge", "usgs_streamflow"
     )
     # HUC_dir = os.path.join(output_dir, f"flood_{huc}")
-    nwm_data = getFIDdata(discharge_dir_nwm, feature_id, start_date, end_date)
-    usgs_data = getUSGSdata(discharge_dir_usgs, usgs_site, start_date, end_date)
+    nwm_data = getFIDdata(discharge_dir_nwm, feature_id, start_date, end_date, huc)
+    usgs_data = getUSGSdata(discharge_dir_usgs, usgs_site, start_date, end_date, huc)
 
     # Ensure dates are datetime objects
     nwm_data["Date"] = pd.to_datetime(nwm_data["Date"])
@@ -1,12 +1,19 @@
 import os
 import re
 import shutil
+import hashlib
+import threading
 import requests
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import netCDF4 as nc
 from datetime import datetime, timedelta, timezone
 from bs4 import BeautifulSoup
+from xml.etree import ElementTree
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from ..datadownload import setup_directories
 
@@ -53,29 +60,68 @@ def _rmtree(path: str, retries: int = 3, delay: float = 0.2) -> None:
             time.sleep(delay)
 
 
-def cleanup_download_tree(
-    download_dir: str, final_date_output_dir: str, csv_tmp_dir: str
-) -> None:
-    """Remove staging CSVs, the dated netCDF dir, the netCDF root, and the forecast folder."""
-    _rmtree(csv_tmp_dir)
+def cleanup_download_tree(download_dir: str, final_date_output_dir: str) -> None:
+    """Remove the dated netCDF dir, the netCDF root, and the forecast folder."""
     _rmtree(final_date_output_dir)
     _rmtree(os.path.join(download_dir, "netCDF"))
     _rmtree(download_dir)
 
 
-def download_public_file(url, destination_path):
-    try:
-        response = requests.get(url)
-        if response.status_code == 404:
-            return
-        response.raise_for_status()
-        with open(destination_path, "wb") as f:
-            f.write(response.content)
-    except requests.exceptions.RequestException as e:
-        raise e
+# Shared HTTP session: pooled keep-alive connections reused by all download threads
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _http_session(pool_size=32):
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET", "HEAD"),
+            )
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSION = session
+    return _SESSION
+
+
+def download_public_file(
+    url, destination_path, session=None, retries=3, chunk_size=1 << 20
+):
+    """
+    Stream url to destination_path in chunks (through a .part file).
+    Returns False if the file does not exist (404), True once it is on disk.
+    Interrupted transfers are retried up to `retries` times with backoff.
+    """
+    session = session or _http_session()
+    tmp_path = f"{destination_path}.part"
+    for attempt in range(retries + 1):
+        try:
+            with session.get(url, stream=True, timeout=(10, 120)) as response:
+                if response.status_code == 404:
+                    return False
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+            os.replace(tmp_path, destination_path)
+            return True
+        except requests.exceptions.RequestException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if attempt == retries:
+                raise
+            time.sleep(0.5 * 2**attempt)
 
 
-def download_nc_files(date_str, current_hour, download_dir, url_base, forecast_range):
+def _forecast_type(date_str, forecast_range):
     date_obj = datetime.strptime(date_str, "%Y%m%d")
     start_date = datetime(2018, 9, 17)
     end_date = datetime(2019, 6, 18)
@@ -96,185 +142,386 @@ def download_nc_files(date_str, current_hour, download_dir, url_base, forecast_r
     forecast_type = re.sub(
         r"(?i)longrange|long[-\s]?range", "long_range_mem1", forecast_type
     )
+    return forecast_type
 
-    url = f"{url_base}/nwm.{date_str}/{forecast_type}/"
-
-    date_output_dir = os.path.join(download_dir, "netCDF", date_str)
-    os.makedirs(date_output_dir, exist_ok=True)
 
-    # Possible File patterns for each forecast type
-    expected_forecast_files = []
+# Possible File patterns for each forecast type
+def _expected_forecast_files(forecast_type, current_hour):
     if forecast_type == "short_range":
-        expected_forecast_files = [
+        return [
             f"nwm.t{current_hour:02d}z.short_range.channel_rt.f{hour:03d}.conus.nc"
             for hour in range(1, 18)
         ]
     elif forecast_type == "medium_range":
-        expected_forecast_files = [
+        return [
             f"nwm.t{current_hour:02d}z.medium_range.channel_rt.f{hour:03d}.conus.nc"
             for hour in range(3, 240, 3)
         ]
     elif forecast_type == "medium_range_mem1":
-        expected_forecast_files = [
+        return [
             f"nwm.t{current_hour:02d}z.medium_range.channel_rt_1.f{hour:03d}.conus.nc"
             for hour in range(3, 240, 3)
         ]
     elif forecast_type == "long_range_mem1":
-        expected_forecast_files = [
+        return [
             f"nwm.t{current_hour:02d}z.long_range.channel_rt_1.f{hour:03d}.conus.nc"
             for hour in range(6, 720, 6)
         ]
+    return []
 
-    successful_downloads = []
 
-    for forecast_file in expected_forecast_files:  # Use the newly defined list
-        file_url = os.path.join(url, forecast_file)
-        file_path = os.path.join(date_output_dir, forecast_file)
+# Forecast cycle availability: bucket listing (or HEAD) results cached for a short TTL
+CYCLE_TTL = 300
+_CYCLE_CACHE = {}
+
+
+def _local_tag(element):
+    return element.tag.rsplit("}", 1)[-1]
+
 
+def _list_bucket_keys(url_base, prefix, session):
+    """
+    All object keys under prefix from the bucket's XML listing (GCS/S3 style),
+    or None if url_base does not serve bucket listings.
+    """
+    keys, marker = set(), None
+    while True:
+        params = {"prefix": prefix}
+        if marker:
+            params["marker"] = marker
+        response = session.get(url_base, params=params, timeout=(10, 60))
+        response.raise_for_status()
+        try:
+            root = ElementTree.fromstring(response.content)
+        except ElementTree.ParseError:
+            return None
+        if _local_tag(root) != "ListBucketResult":
+            return None
+        fields = {}
+        page = []
+        for el in root.iter():
+            tag = _local_tag(el)
+            if tag == "Key":
+                page.append(el.text)
+            elif tag in ("IsTruncated", "NextMarker"):
+                fields[tag] = (el.text or "").strip()
+        keys.update(page)
+        if not page or fields.get("IsTruncated", "").lower() != "true":
+            return keys
+        marker = fields.get("NextMarker") or page[-1]
+
+
+def _head_all(urls, session, workers=16):
+    def _exists(url):
         try:
-            download_public_file(file_url, file_path)
-            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                successful_downloads.append(forecast_file)
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to download {forecast_file}: {e}")
+            return session.head(url, timeout=(10, 30)).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return all(pool.map(_exists, urls))
+
+
+def forecast_cycle_available(
+    date_str, current_hour, forecast_range, url_base, ttl=CYCLE_TTL
+):
+    """
+    True if every channel_rt file of the cycle is published, without downloading any.
+    Uses one prefix listing of the bucket, falling back to HEAD requests if listing
+    is not supported; results are cached for ttl seconds.
+    """
+    forecast_type = _forecast_type(date_str, forecast_range)
+    expected = _expected_forecast_files(forecast_type, current_hour)
+    if not expected:
+        return False
+
+    key = (url_base, date_str, current_hour, forecast_type)
+    cached = _CYCLE_CACHE.get(key)
+    if cached and time.time() - cached[0] < ttl:
+        return cached[1]
+
+    folder = f"nwm.{date_str}/{forecast_type}/"
+    session = _http_session()
+    try:
+        keys = _list_bucket_keys(
+            url_base, folder + os.path.commonprefix(expected), session
+        )
+    except requests.exceptions.RequestException:
+        keys = None
+    if keys is not None:
+        available = all(folder + f in keys for f in expected)
+    else:
+        available = _head_all([f"{url_base}/{folder}{f}" for f in expected], session)
+
+    _CYCLE_CACHE[key] = (time.time(), available)
+    return available
+
+
+def download_nc_files(
+    date_str, current_hour, download_dir, url_base, forecast_range, workers=8
+):
+    forecast_type = _forecast_type(date_str, forecast_range)
+    url = f"{url_base}/nwm.{date_str}/{forecast_type}/"
+
+    date_output_dir = os.path.join(download_dir, "netCDF", date_str)
+    os.makedirs(date_output_dir, exist_ok=True)
+
+    expected_forecast_files = _expected_forecast_files(forecast_type, current_hour)
+    session = _http_session()
+    successful_downloads = []
+    incomplete = False
+
+    # Bounded parallel download; stop queueing as soon as one file of the cycle is missing
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(
+                download_public_file,
+                f"{url}{forecast_file}",
+                os.path.join(date_output_dir, forecast_file),
+                session,
+            ): forecast_file
+            for forecast_file in expected_forecast_files
+        }
+        for fut in as_completed(futures):
+            forecast_file = futures[fut]
+            if fut.cancelled():
+                continue
+            try:
+                if fut.result():
+                    successful_downloads.append(forecast_file)
+                else:
+                    incomplete = True
+            except requests.exceptions.RequestException as e:
+                print(f"Failed to download {forecast_file}: {e}")
+                incomplete = True
+            if incomplete:
+                for f in futures:
+                    f.cancel()
 
     # Return True only if ALL expected files were successfully downloaded
     if (
-        len(successful_downloads) == len(expected_forecast_files)
+        not incomplete
+        and len(successful_downloads) == len(expected_forecast_files)
         and len(expected_forecast_files) > 0
     ):
         return True, date_output_dir
     else:
-        for downloaded_file in os.listdir(date_output_dir):
-            os.remove(os.path.join(date_output_dir, downloaded_file))
-        os.rmdir(date_output_dir)
+        _rmtree(date_output_dir)
         return False, None
 
 
-# Process netcf and get the file in CSV format and extract all feature_is's discharge data
-def processnetCDF(netcdf_file_path, filter_df, output_folder_path):
-    base_filename = os.path.basename(netcdf_file_path).replace(".nc", "")
-    output_csv_file_path = os.path.join(output_folder_path, f"{base_filename}.csv")
+# Cached HUC feature_id -> channel_rt array position index (feature order is fixed per cycle)
+_INDEX_CACHE = {}
+INDEX_NAME = "channel_rt_index.npz"
+# Gap (in features) above which read_forecast_subset starts a new read
+RUN_GAP = 4096
 
-    try:
-        ds = nc.Dataset(netcdf_file_path, "r")
-        streamflow_data = ds.variables["streamflow"][:]
-        feature_ids = ds.variables["feature_id"][:]
-        ds.close()
-    except Exception as e:
-        print(f"Error reading NetCDF file {netcdf_file_path}: {e}")
-        return
 
-    if len(streamflow_data) == 0 or len(feature_ids) == 0:
-        print(f"No data found in {netcdf_file_path}")
-        return
+def _open_forecast(source):
+    """
+    Open a local channel_rt file, or a remote one over HTTP byte ranges.
+    ProcessForecasts always gets downloaded files; the remote form is for direct callers.
+    """
+    if str(source).startswith(("http://", "https://")):
+        return nc.Dataset(f"{source}#mode=bytes", "r")
+    return nc.Dataset(source, "r")
 
-    data_df = pd.DataFrame({"feature_id": feature_ids, "discharge": streamflow_data})
 
-    filtered_df = data_df[data_df["feature_id"].isin(filter_df["feature_id"])]
-    merged_df = pd.merge(filter_df[["feature_id"]], filtered_df, on="feature_id")
-    merged_df.to_csv(output_csv_file_path, index=False)
+def _ids_digest(feature_ids):
+    return hashlib.sha1(np.ascontiguousarray(feature_ids).tobytes()).hexdigest()
 
 
-def ProcessForecasts(
-    CSVFILES, forecast_date, hour, forecast_range, sort_by, data_dir, huc
-):
-    merge_folder = os.path.join(CSVFILES, "mergedAndSorted")
-    os.makedirs(merge_folder, exist_ok=True)
-
-    # Get all CSV files in the output folder
-    if forecast_range == "longrange":
-        csv_files = sorted(
-            [
-                file
-                for file in os.listdir(CSVFILES)
-                if file.endswith(".csv")
-                and file.startswith(f"nwm.t{hour:02d}z.long_range")
-            ]
-        )
-    elif forecast_range == "mediumrange":
-        csv_files = sorted(
-            [
-                file
-                for file in os.listdir(CSVFILES)
-                if file.endswith(".csv")
-                and file.startswith(f"nwm.t{hour:02d}z.medium_range")
-            ]
+def _index_matches(fid_var, index):
+    if fid_var.shape[0] != index["n"] or len(index["positions"]) == 0:
+        return fid_var.shape[0] == index["n"]
+    first, last = index["check"]
+    return (
+        int(fid_var[index["positions"][first]]) == index["ids"][first]
+        and int(fid_var[index["positions"][last]]) == index["ids"][last]
+    )
+
+
+def forecast_feature_index(netcdf_source, feature_ids, cache_path=None):
+    """
+    Positions of feature_ids in the channel_rt feature_id array.
+
+    Built once from one file (a full feature_id read) and reused for every forecast
+    hour; kept in memory and optionally in cache_path (.npz) across runs. A cached
+    index is only reused if the array length and two sampled IDs still match.
+    :return: dict with "ids" (found feature IDs in request order), "positions", "check", "n".
+    """
+    wanted = np.asarray(feature_ids, dtype=np.int64)
+    digest = _ids_digest(wanted)
+
+    with _open_forecast(netcdf_source) as ds:
+        fid_var = ds.variables["feature_id"]
+        n = fid_var.shape[0]
+        index = _INDEX_CACHE.get((n, digest))
+        if index is None and cache_path and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                if str(cached["digest"]) == digest and int(cached["n"]) == n:
+                    index = {k: cached[k] for k in ("ids", "positions", "check")}
+                    index["n"] = n
+        if index is not None and _index_matches(fid_var, index):
+            _INDEX_CACHE[(n, digest)] = index
+            return index
+
+        all_ids = np.asarray(fid_var[:], dtype=np.int64)
+
+    sorter = np.argsort(all_ids, kind="stable")
+    pos = np.searchsorted(all_ids, wanted, sorter=sorter).clip(0, max(n - 1, 0))
+    found = all_ids[sorter[pos]] == wanted if n else np.zeros(len(wanted), bool)
+    positions = sorter[pos[found]]
+    ids = wanted[found]
+    check = np.array(
+        [int(np.argmin(positions)), int(np.argmax(positions))]
+        if len(positions)
+        else [0, 0]
+    )
+    index = {"ids": ids, "positions": positions, "check": check, "n": n}
+    _INDEX_CACHE[(n, digest)] = index
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        np.savez(
+            cache_path, ids=ids, positions=positions, check=check, n=n, digest=digest
         )
+    return index
+
+
+def _position_runs(positions, max_gap=RUN_GAP):
+    """Sorted positions split into [start, stop) runs wherever the gap exceeds max_gap."""
+    ordered = np.sort(positions)
+    breaks = np.flatnonzero(np.diff(ordered) > max_gap) + 1
+    starts = ordered[np.r_[0, breaks]]
+    stops = ordered[np.r_[breaks - 1, len(ordered) - 1]] + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def read_forecast_subset(netcdf_source, index, max_gap=RUN_GAP):
+    """
+    Streamflow for the indexed features only. The positions are grouped into runs
+    (split where more than max_gap unused features lie between them) and each run is
+    read separately, so scattered HUC features do not pull in most of the CONUS array.
+    How much this saves depends on the file's chunking and compression; main() only
+    passes local files, the HTTP byte-range path of _open_forecast is for direct callers.
+    :return: (feature_ids, discharge) numpy arrays in index order.
+    """
+    positions = index["positions"]
+    if len(positions) == 0:
+        return index["ids"], np.array([], dtype=np.float64)
+    values = np.empty(len(positions), dtype=np.float64)
+    with _open_forecast(netcdf_source) as ds:
+        streamflow = ds.variables["streamflow"]
+        for start, stop in _position_runs(positions, max_gap):
+            run = streamflow[start:stop]
+            run = np.ma.filled(np.ma.asarray(run, dtype=np.float64), np.nan)
+            inside = (positions >= start) & (positions < stop)
+            values[inside] = run[positions[inside] - start]
+    return index["ids"], values
+
+
+class ForecastDailyReducer:
+    """
+    Folds every forecast hour's feature-subset array into running per-day
+    accumulators and writes the final data/inputs CSVs directly.
+
+    - shortrange: each hour is written as {range}_{huc}_{date}_{HH}UTC.csv
+    - medium/longrange: one {HH}UTC_{range}_{date}_{huc}.csv per day with the
+      minimum, median or maximum (default) discharge of that day's forecast hours.
+    """
+
+    def __init__(
+        self, feature_ids, forecast_date, hour, forecast_range, sort_by, data_dir, huc
+    ):
+        self.feature_ids = np.asarray(feature_ids)
+        self.start = datetime.strptime(forecast_date, "%Y%m%d")
+        self.hour = int(hour)
+        self.forecast_range = forecast_range
+        self.sort_by = sort_by
+        self.data_dir = data_dir
+        self.huc = huc
+        self.days = {}
+
+    def add(self, forecast_hour, values):
+        valid_hour = self.hour + int(forecast_hour)
+        group_date = (self.start + timedelta(days=valid_hour // 24)).strftime("%Y%m%d")
+
+        if self.forecast_range == "shortrange":
+            fname = f"{self.forecast_range}_{self.huc}_{group_date}_{valid_hour % 24:02d}UTC.csv"
+            self._write(fname, self.feature_ids, values)
+            return
 
-    elif forecast_range == "shortrange":
-        csv_files = sorted(
-            [
-                file
-                for file in os.listdir(CSVFILES)
-                if file.endswith(".csv")
-                and file.startswith(f"nwm.t{hour:02d}z.short_range")
-            ]
+        if self.sort_by == "median":
+            self.days.setdefault(group_date, []).append(values)
+            return
+        reduce = np.fmin if self.sort_by == "minimum" else np.fmax
+        acc = self.days.get(group_date)
+        self.days[group_date] = values.copy() if acc is None else reduce(acc, values)
+
+    def finish(self):
+        order = np.argsort(self.feature_ids, kind="stable")
+        for group_date, acc in self.days.items():
+            if isinstance(acc, list):
+                with np.errstate(all="ignore"):
+                    acc = np.nanmedian(np.vstack(acc), axis=0)
+            fname = (
+                f"{self.hour:02d}UTC_{self.forecast_range}_{group_date}_{self.huc}.csv"
+            )
+            self._write(fname, self.feature_ids[order], acc[order])
+        self.days = {}
+
+    def _write(self, fname, feature_ids, values):
+        pd.DataFrame({"feature_id": feature_ids, "discharge": values}).to_csv(
+            os.path.join(self.data_dir, fname), index=False
         )
-        # Process each file for shortrange
-        pattern = re.compile(r"\.f(\d{3})\.")
-        current_date = datetime.strptime(forecast_date, "%Y%m%d")
-        base_hour = hour
-        day_shift = 0
-
-        for csv_file in csv_files:
-            match = pattern.search(csv_file)
-            if match:
-                forecast_hour = int(match.group(1))
-                adjusted_forecast_hour = base_hour + forecast_hour
-                if adjusted_forecast_hour >= 24:
-                    adjusted_forecast_hour %= 24
-                    if adjusted_forecast_hour == 0:
-                        day_shift += 1
-                adjusted_date = (current_date + timedelta(days=day_shift)).strftime(
-                    "%Y%m%d"
-                )
 
-                sorted_file_name = f"{forecast_range}_{huc}_{adjusted_date}_{adjusted_forecast_hour:02d}UTC.csv"
-                sorted_file_path = os.path.join(data_dir, sorted_file_name)
-                original_file_path = os.path.join(CSVFILES, csv_file)
-                os.rename(original_file_path, sorted_file_path)
-        return
 
-    # Calculating the day offset based on the forecast hour
+def ProcessForecasts(
+    netcdf_files,
+    filter_df,
+    forecast_date,
+    hour,
+    forecast_range,
+    sort_by,
+    data_dir,
+    huc,
+    index_path=None,
+):
+    """
+    Read the HUC features from each forecast file of a cycle and reduce them per day
+    in memory (see ForecastDailyReducer); no per-hour staging files are written.
+    """
     pattern = re.compile(r"\.f(\d{3})\.")
-    current_date = datetime.strptime(forecast_date, "%Y%m%d")
-    daily_groups = {}
-
-    for csv_file in csv_files:
-        match = pattern.search(csv_file)
-        if match:
-            forecast_hour = int(match.group(1))
-            day_offset = (forecast_hour + hour) // 24
-            group_date = (current_date + timedelta(days=day_offset)).strftime("%Y%m%d")
-
-            if group_date not in daily_groups:
-                daily_groups[group_date] = []
-            daily_groups[group_date].append(csv_file)
-        else:
-            print(f"Filename does not match expected pattern: {csv_file}")
+    index = None
+    reducer = None
 
-    # Merge and sort files for each day
-    for group_date, group_files in daily_groups.items():
-        combined_df = pd.concat(
-            [pd.read_csv(os.path.join(CSVFILES, file)) for file in group_files]
-        )
-        if sort_by == "minimum":
-            sorted_df = (
-                combined_df.groupby("feature_id")["discharge"].min().reset_index()
-            )
-        elif sort_by == "median":
-            sorted_df = (
-                combined_df.groupby("feature_id")["discharge"].median().reset_index()
-            )
-        else:
-            sorted_df = (
-                combined_df.groupby("feature_id")["discharge"].max().reset_index()
-            )
+    for netcdf_file_path in sorted(netcdf_files):
+        match = pattern.search(os.path.basename(netcdf_file_path))
+        if not match:
+            print(f"Filename does not match expected pattern: {netcdf_file_path}")
+            continue
+        try:
+            if index is None:
+                index = forecast_feature_index(
+                    netcdf_file_path, filter_df["feature_id"], index_path
+                )
+                reducer = ForecastDailyReducer(
+                    index["ids"],
+                    forecast_date,
+                    hour,
+                    forecast_range,
+                    sort_by,
+                    data_dir,
+                    huc,
+                )
+            _, values = read_forecast_subset(netcdf_file_path, index)
+        except Exception as e:
+            print(f"Error reading NetCDF file {netcdf_file_path}: {e}")
+            continue
+        reducer.add(int(match.group(1)), values)
 
-        sorted_file_name = f"{hour:02d}UTC_{forecast_range}_{group_date}_{huc}.csv"
-        sorted_file_path = os.path.join(data_dir, sorted_file_name)
-        sorted_df.to_csv(sorted_file_path, index=False)
+    if reducer is not None:
+        reducer.finish()
 
 
 def main(
@@ -348,13 +595,18 @@ def main(
             f"Attempt {attempts + 1}/{max_attempts}: Trying date {current_download_date}, hour {current_download_hour:02d}Z for {forecast_range}..."
         )
 
-        success, retrieved_date_output_dir = download_nc_files(
-            current_download_date,
-            current_download_hour,
-            download_dir,
-            url_base,
-            forecast_range,
-        )
+        # Probe the bucket listing first; only a complete cycle is downloaded
+        success, retrieved_date_output_dir = False, None
+        if forecast_cycle_available(
+            current_download_date, current_download_hour, forecast_range, url_base
+        ):
+            success, retrieved_date_output_dir = download_nc_files(
+                current_download_date,
+                current_download_hour,
+                download_dir,
+                url_base,
+                forecast_range,
+            )
 
         if success:
             final_date_output_dir = retrieved_date_output_dir
@@ -391,32 +643,30 @@ def main(
         return
 
     filter_csv_file_path = os.path.join(output_dir, output_csv_filename)
-    CSVFILES = os.path.join(download_dir, "csvFiles")
-    os.makedirs(CSVFILES, exist_ok=True)
     filter_df = pd.read_csv(filter_csv_file_path)
 
-    # Process files from the *successful* directory
-    if os.path.exists(final_date_output_dir):
-        for root, _, files in os.walk(final_date_output_dir):
-            for filename in files:
-                if filename.endswith(".nc"):
-                    netcdf_file_path = os.path.join(root, filename)
-                    processnetCDF(netcdf_file_path, filter_df, CSVFILES)
-
-    # Pass the current_download_hour and current_download_date that were successful
+    # Stream the *successful* cycle into the final CSVs, reusing one feature index
+    netcdf_files = [
+        os.path.join(root, filename)
+        for root, _, files in os.walk(final_date_output_dir)
+        for filename in files
+        if filename.endswith(".nc")
+    ]
     ProcessForecasts(
-        CSVFILES,
+        netcdf_files,
+        filter_df,
         current_download_date,
         current_download_hour,
         forecast_range,
         sort_by,
         data_dir,
         HUC,
+        index_path=os.path.join(os.path.dirname(download_dir), INDEX_NAME),
     )
 
     print(f"The final discharge values saved to {data_dir}")
     try:
-        cleanup_download_tree(download_dir, final_date_output_dir, CSVFILES)
+        cleanup_download_tree(download_dir, final_date_output_dir)
     except Exception as e:
         print(f"Cleanup warning: {e}")
 
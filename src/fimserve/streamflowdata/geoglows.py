@@ -1,5 +1,6 @@
 # Import Libraries
 import os
+import threading
 import numpy as np
 import pandas as pd
 from pathlib import Path
@@ -8,17 +9,31 @@ import xarray
 from datetime import datetime, timedelta
 
 from ..datadownload import setup_directories
+from ..streamflowstore import default_store
 
+# The zarr store (and its consolidated metadata) is opened once per process
+_DATASET = None
+_DATASET_LOCK = threading.Lock()
 
-def get_geoglowsdatafromS3():
-    bucket_uri = "s3://geoglows-v2-retrospective/retrospective.zarr"
-    region_name = "us-west-2"
-    s3 = s3fs.S3FileSystem(anon=True, client_kwargs=dict(region_name=region_name))
-    s3store = s3fs.S3Map(root=bucket_uri, s3=s3, check=False)
 
-    # All data
-    ds = xarray.open_zarr(s3store)
-    return ds
+def get_geoglowsdatafromS3(refresh=False):
+    """
+    Lazily open the GeoGLOWS v2 retrospective zarr store. The handle is reused across
+    calls; data is only read when a selection is loaded, in native zarr chunks.
+    """
+    global _DATASET
+    with _DATASET_LOCK:
+        if _DATASET is None or refresh:
+            bucket_uri = "s3://geoglows-v2-retrospective/retrospective.zarr"
+            region_name = "us-west-2"
+            s3 = s3fs.S3FileSystem(
+                anon=True, client_kwargs=dict(region_name=region_name)
+            )
+            s3store = s3fs.S3Map(root=bucket_uri, s3=s3, check=False)
+
+            # All data
+            _DATASET = xarray.open_zarr(s3store, consolidated=True, chunks={})
+    return _DATASET
 
 
 def get_rivID(hydrotable):
@@ -26,70 +41,128 @@ def get_rivID(hydrotable):
     return df
 
 
-def getGLOWS_data(
-    event_time, hydrotable, data_dir, output_dir, huc, start_date=None, end_date=None
-):
-    """
-    Get GLOWS data for a specific event time and save it to a CSV file.
-    """
-
-    value_time = pd.to_datetime(event_time)
-
+def _event_window(value_time, start_date=None, end_date=None):
     if start_date is None or end_date is None:
-        value_time = pd.to_datetime(event_time)
-
         # Calculate start and end dates
         start_date = value_time - timedelta(days=1)
         tentative_end_date = value_time + timedelta(days=1)
         current_time = datetime.utcnow()
         end_date = min(tentative_end_date, current_time)
+    return start_date, end_date
+
+
+def _time_positions(time_index, windows):
+    """Integer positions of every time step inside any of the (start, end) windows."""
+    positions = [
+        np.arange(sl.start, sl.stop)
+        for sl in (
+            time_index.slice_indexer(pd.Timestamp(start), pd.Timestamp(end))
+            for start, end in windows
+        )
+    ]
+    return np.unique(np.concatenate(positions)) if positions else np.array([], int)
+
+
+def getGLOWS_events(
+    event_times, hydrotable, data_dir, output_dir, huc, start_date=None, end_date=None
+):
+    """
+    Get GLOWS data for many event times with a single chunked read.
+
+    The +-1 day windows (or start_date/end_date) of all events are resolved to time
+    positions first, and only those time steps of the HUC's rivids that are not in
+    the local streamflow store yet are loaded. Each event then gets the same CSV
+    files as getGLOWS_data.
+    """
+    if isinstance(event_times, (str, datetime, pd.Timestamp)):
+        event_times = [event_times]
+
+    events = []
+    for event_time in event_times:
+        value_time = pd.to_datetime(event_time)
+        events.append((value_time, *_event_window(value_time, start_date, end_date)))
 
-    # Get the retrospective dataset
-    ds = get_geoglowsdatafromS3()
     hydro_df = pd.read_csv(hydrotable)
 
     # Map LINKNO to feature_id
     linkno_to_featureid = hydro_df.set_index("LINKNO")["feature_id"].to_dict()
     riv_ids = hydro_df["LINKNO"].tolist()
-    filtered_ds = ds["Qout"].sel(rivid=riv_ids).to_dataframe()
-    filtered_ds.reset_index(inplace=True)
-    filtered_ds["time"] = pd.to_datetime(filtered_ds["time"])
-    filtered_df = filtered_ds[
-        (filtered_ds["time"] >= start_date) & (filtered_ds["time"] <= end_date)
-    ]
 
-    # Map rivid (LINKNO) to feature_id
-    filtered_df["feature_id"] = filtered_df["rivid"].map(linkno_to_featureid)
-    output_df = filtered_df[["feature_id", "Qout", "time"]]
+    # Only time ranges missing from the local store are read from the zarr store,
+    # time window first, then rivids: nothing is read before .load()
+    def _read_zarr(gaps):
+        ds = get_geoglowsdatafromS3()
+        positions = _time_positions(ds.indexes["time"], gaps)
+        qout = ds["Qout"].isel(time=positions).sel(rivid=riv_ids).load()
+        df = qout.to_dataframe().reset_index()
+        return pd.DataFrame(
+            {
+                "location_id": "geoglows-" + df["rivid"].astype(str),
+                "value_time": df["time"],
+                "value": df["Qout"],
+            }
+        )
+
+    windows = [(pd.Timestamp(s), pd.Timestamp(e)) for _, s, e in events]
+    stored = default_store().fetch(
+        "geoglows", huc, [f"geoglows-{r}" for r in riv_ids], windows, _read_zarr
+    )
 
-    output_df.rename(columns={"Qout": "discharge"}, inplace=True)
+    # Map rivid (LINKNO) to feature_id
+    rivid = stored["location_id"].str.slice(len("geoglows-")).astype(int)
+    all_df = pd.DataFrame(
+        {
+            "feature_id": rivid.map(linkno_to_featureid).astype(int),
+            "discharge": stored["value"],
+            "time": pd.to_datetime(stored["value_time"]),
+        }
+    )
 
-    # Export the filtered data to a CSV file
     out_dir = Path(output_dir) / "GEOGLOWS"
     out_dir.mkdir(parents=True, exist_ok=True)
-    output_file = out_dir / f"{huc}_{start_date}_{end_date}_streamflow.csv"
-    output_df["feature_id"] = output_df["feature_id"].astype(int)
-    output_df.to_csv(output_file, index=False)
 
-    # Filter based on value_time
-    value_time_df = output_df[output_df["time"] == value_time]
-    value_time_df = value_time_df[["feature_id", "discharge"]]
-    value_time_df["feature_id"] = value_time_df["feature_id"].astype(int)
+    for value_time, start, end in events:
+        output_df = all_df[
+            (all_df["time"] >= pd.Timestamp(start))
+            & (all_df["time"] <= pd.Timestamp(end))
+        ]
+
+        # Export the filtered data to a CSV file
+        output_file = out_dir / f"{huc}_{start}_{end}_streamflow.csv"
+        output_df.to_csv(output_file, index=False)
 
-    # Export the value_time data to a separate CSV file
-    value_timeSTR = pd.to_datetime(value_time).strftime("%Y%m%d")
-    value_time_file = Path(data_dir) / f"GeoGLOWS_{value_timeSTR}_{huc}.csv"
-    value_time_df.to_csv(value_time_file, index=False)
+        # Filter based on value_time
+        value_time_df = output_df[output_df["time"] == value_time]
+        value_time_df = value_time_df[["feature_id", "discharge"]]
+
+        # Export the value_time data to a separate CSV file
+        value_timeSTR = pd.to_datetime(value_time).strftime("%Y%m%d")
+        value_time_file = Path(data_dir) / f"GeoGLOWS_{value_timeSTR}_{huc}.csv"
+        value_time_df.to_csv(value_time_file, index=False)
+
+
+def getGLOWS_data(
+    event_time, hydrotable, data_dir, output_dir, huc, start_date=None, end_date=None
+):
+    """
+    Get GLOWS data for a specific event time and save it to a CSV file.
+    """
+    getGLOWS_events(
+        [event_time], hydrotable, data_dir, output_dir, huc, start_date, end_date
+    )
 
 
 # Function to call
 def getGEOGLOWSstreamflow(huc, event_time, hydrotable, start_date=None, end_date=None):
     """
     Get GLOWS data for a specific HUC and save it to a CSV file.
+    event_time can be a single time or a list of event times (fetched in one read).
     """
 
     code_dir, data_dir, output_dir = setup_directories()
 
     HUC_dir = os.path.join(output_dir, f"flood_{huc}")
     # Create a output directory
-    getGLOWS_data(event_time, hydrotable, data_dir, HUC_dir, huc, start_date, end_date)
+    getGLOWS_events(
+        event_time, hydrotable, data_dir, HUC_dir, huc, start_date, end_date
+    )
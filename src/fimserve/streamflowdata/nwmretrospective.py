@@ -1,22 +1,160 @@
 import os
 import shutil
+import tempfile
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+import pyarrow.compute as pc
 from datetime import datetime, timedelta
 import teehr.fetching.nwm.retrospective_points as nwm_retro
 
 from ..datadownload import setup_directories
+from ..streamflowstore import default_store
+
+# Aggregated discharge for a certain time range (max, min, mean, quantiles)
+_STAT_ALIASES = {
+    "maximum": "max",
+    "max": "max",
+    "minimum": "min",
+    "min": "min",
+    "mean": "mean",
+    "median": 0.5,
+}
+
+
+def _parse_stat(stat):
+    """
+    Normalize one discharge statistic to "max" | "min" | "mean" | quantile (0-1).
+    Accepts the names above, percentiles as strings like "q90"/"p99.5"/"p1" (always
+    0-100) and bare numbers as fractions (0.9); bare numbers above 1 are percentiles.
+    """
+    percent = False
+    if isinstance(stat, str):
+        key = stat.strip().lower()
+        if key in _STAT_ALIASES:
+            return _STAT_ALIASES[key]
+        if key[:1] in ("q", "p"):
+            key = key[1:]
+            percent = True
+        try:
+            stat = float(key)
+        except ValueError:
+            raise ValueError(f"Unsupported discharge statistic: {stat}")
+    q = float(stat)
+    q = q / 100.0 if percent or q > 1 else q
+    if not 0 <= q <= 1:
+        raise ValueError(f"Quantile must be between 0 and 1 (or 0-100): {stat}")
+    return q
+
+
+def _retrospective_filter(location_ids, start=None, end=None):
+    expr = pc.field("location_id").isin(location_ids)
+    if start is not None:
+        expr = expr & (pc.field("value_time") >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        expr = expr & (pc.field("value_time") <= pd.Timestamp(end).to_pydatetime())
+    return expr
+
+
+def aggregate_retrospective_parquet(
+    parquet_files,
+    location_ids,
+    stats=("maximum",),
+    start=None,
+    end=None,
+    prefix="nwm30-",
+    batch_size=1 << 20,
+):
+    """
+    Per-feature discharge statistics computed in one streaming pass over the parquet
+    row groups. Only location_id/value are read, with the location (and optional
+    value_time) filter pushed into the scan; min/max/sum/count are reduced batch by
+    batch into arrays sized by the number of features. Quantiles additionally keep a
+    compact (int32 feature index, float32 value) copy of the filtered rows.
+
+    :param stats: One statistic or a list, e.g. ["maximum", "mean", "q90", 0.99].
+    :return: DataFrame with feature_id and one column per statistic label.
+    """
+    if isinstance(stats, (str, int, float)):
+        stats = [stats]
+    parsed = {str(s): _parse_stat(s) for s in stats}
+    quantiles = sorted({v for v in parsed.values() if not isinstance(v, str)})
+
+    ids = pa.array(list(dict.fromkeys(location_ids)), type=pa.string())
+    n = len(ids)
+    count = np.zeros(n, dtype=np.int64)
+    total = np.zeros(n, dtype=np.float64)
+    vmin = np.full(n, np.inf)
+    vmax = np.full(n, -np.inf)
+    q_codes, q_values = [], []
+
+    dataset = pads.dataset([str(f) for f in parquet_files], format="parquet")
+    # Null and NaN values both stay out of the counts, sums and quantiles
+    expr = (
+        _retrospective_filter(ids, start, end)
+        & pc.field("value").is_valid()
+        & ~pc.is_nan(pc.field("value"))
+    )
+    scanner = dataset.scanner(
+        columns=["location_id", "value"], filter=expr, batch_size=batch_size
+    )
+    for batch in scanner.to_batches():
+        if batch.num_rows == 0:
+            continue
+        codes = pc.index_in(batch.column(0), value_set=ids).to_numpy()
+        values = batch.column(1).to_numpy(zero_copy_only=False).astype(np.float64)
+        count += np.bincount(codes, minlength=n)
+        total += np.bincount(codes, weights=values, minlength=n)
+        np.minimum.at(vmin, codes, values)
+        np.maximum.at(vmax, codes, values)
+        if quantiles:
+            q_codes.append(codes.astype(np.int32))
+            q_values.append(values.astype(np.float32))
+
+    present = np.flatnonzero(count)
+    result = pd.DataFrame(
+        {
+            "feature_id": pc.utf8_slice_codeunits(ids, len(prefix)).to_numpy(
+                zero_copy_only=False
+            )
+        }
+    )
+    if quantiles and q_codes:
+        q_df = pd.DataFrame(
+            {"code": np.concatenate(q_codes), "value": np.concatenate(q_values)}
+        )
+        q_table = q_df.groupby("code")["value"].quantile(quantiles).unstack()
+        q_table = q_table.reindex(range(n))
+
+    for label, stat in parsed.items():
+        if stat == "max":
+            result[label] = vmax
+        elif stat == "min":
+            result[label] = vmin
+        elif stat == "mean":
+            result[label] = total / np.maximum(count, 1)
+        else:
+            result[label] = (
+                q_table[stat].to_numpy(dtype=np.float64)
+                if q_codes
+                else np.full(n, np.nan)
+            )
+    return result.iloc[present].reset_index(drop=True)
 
 
-# Aggregated discharge for a certain time range (max, min, mean)
 def get_aggregated_discharge(
     retrospective_dir, location_ids_file, start_date, end_date, data_dir, huc, sortby
 ):
     """
-    Calculates max, min, or mean discharge over a specific parquet file range.
+    Calculates discharge statistics over a specific parquet file range.
+
+    sortby may be a single statistic or a list ("maximum", "minimum", "mean",
+    "median", or quantiles such as "q90" / 0.99); all of them are computed in one
+    streaming pass and written to NWM_<start>_<end>_<sortby>_<huc>.csv each.
     """
     retrospective_dir = Path(retrospective_dir)
-    all_data = pd.DataFrame()
 
     # Load only the relevant parquet file for this range
     formatted_filename = (
@@ -28,82 +166,121 @@ def get_aggregated_discharge(
         print(f"File {file_path} not found for aggregation.")
         return
 
-    df = pd.read_parquet(file_path)
-
-    # Filter by location IDs
-    locationID_df = pd.read_csv(location_ids_file)
-    target_ids = [f"nwm30-{int(fid)}" for fid in locationID_df["feature_id"]]
-    df = df[df["location_id"].isin(target_ids)].copy()
-    df["feature_id"] = df["location_id"].str.replace("nwm30-", "")
-
-    # Aggregate based on sortby
-    if sortby == "maximum":
-        discharge_data = df.groupby("feature_id")["value"].max().reset_index()
-    elif sortby == "minimum":
-        discharge_data = df.groupby("feature_id")["value"].min().reset_index()
-    elif sortby == "mean":
-        discharge_data = df.groupby("feature_id")["value"].mean().reset_index()
-    else:
+    sortby = [sortby] if isinstance(sortby, (str, int, float)) else list(sortby)
+    try:
+        stats = aggregate_retrospective_parquet(
+            [file_path], _location_ids(location_ids_file), sortby
+        )
+    except ValueError as e:
+        print(e)
         return
 
-    discharge_data.rename(columns={"value": "discharge"}, inplace=True)
-
     # Save with the requested filename format
-    fname = f"NWM_{start_date.replace('-', '')}_{end_date.replace('-', '')}_{sortby}_{huc}.csv"
-    output_path = os.path.join(data_dir, fname)
-    discharge_data.to_csv(output_path, index=False)
-    print(f"Sorted ({sortby}) discharge saved to {output_path}")
+    for label in sortby:
+        discharge_data = stats[["feature_id", str(label)]].rename(
+            columns={str(label): "discharge"}
+        )
+        fname = f"NWM_{start_date.replace('-', '')}_{end_date.replace('-', '')}_{label}_{huc}.csv"
+        output_path = os.path.join(data_dir, fname)
+        discharge_data.to_csv(output_path, index=False)
+        print(f"Sorted ({label}) discharge saved to {output_path}")
+    return stats
 
 
-def getdischargeforspecifiedtime(
-    retrospective_dir, location_ids, specific_date, data_dir, huc, date_type
+def _location_ids(location_ids_file, prefix="nwm30-"):
+    locationID_df = pd.read_csv(location_ids_file)
+    return [f"{prefix}{int(fid)}" for fid in locationID_df["feature_id"]]
+
+
+def read_retrospective_parquet(
+    parquet_files, location_ids, start=None, end=None, prefix="nwm30-"
 ):
-    retrospective_dir = Path(retrospective_dir)
-    all_data = pd.DataFrame()
-
-    # Loop through all parquet files in the directory
-    for file in retrospective_dir.glob("*.parquet"):
-        df = pd.read_parquet(file)
-        all_data = pd.concat([all_data, df], ignore_index=True)
-
-    all_data["value_time"] = pd.to_datetime(all_data["value_time"])
-
-    locationID_df = pd.read_csv(location_ids)
-    location_ids = [f"nwm30-{int(fid)}" for fid in locationID_df["feature_id"]]
-
-    specific_date = pd.to_datetime(specific_date)
-    if date_type == "date":
-        filtered_df = all_data[
-            (all_data["location_id"].isin(location_ids))
-            & (all_data["value_time"].dt.date == specific_date.date())
-        ].copy()
-        filtered_df["feature_id"] = filtered_df["location_id"].str.replace("nwm30-", "")
-        discharge_data = (
-            filtered_df.groupby("feature_id")["value"]
+    """
+    Read only location_id/value_time/value for the given locations (and optional
+    value_time window) from one or many teehr parquet files, with the filters pushed
+    down into the parquet scan.
+    """
+    dataset = pads.dataset([str(f) for f in parquet_files], format="parquet")
+    df = dataset.to_table(
+        columns=["location_id", "value_time", "value"],
+        filter=_retrospective_filter(location_ids, start, end),
+    ).to_pandas()
+    df["value_time"] = pd.to_datetime(df["value_time"])
+    df["feature_id"] = df["location_id"].str.slice(len(prefix))
+    return df
+
+
+def _retrospective_windows(value_times, max_gap_days=7):
+    """
+    Group value times into as few download windows as possible.
+    Each time needs +-1 day (dates) or +-1 hour (datetimes); windows closer than
+    max_gap_days are merged so a whole event catalog is fetched in one or a few pulls.
+    """
+    spans = []
+    for time in value_times:
+        dtype = determinedatatimeformat(time)
+        if dtype == "invalid":
+            print(f"Invalid date format: {time}")
+            continue
+        t_obj = pd.to_datetime(time)
+        pad = timedelta(days=1) if dtype == "date" else timedelta(hours=1)
+        spans.append((t_obj - pad, t_obj + pad, t_obj, dtype))
+
+    spans.sort(key=lambda x: x[0])
+    windows = []
+    for lag, lead, t_obj, dtype in spans:
+        if windows and lag - windows[-1]["end"] <= timedelta(days=max_gap_days):
+            windows[-1]["end"] = max(windows[-1]["end"], lead)
+            windows[-1]["times"].append((t_obj, dtype))
+        else:
+            windows.append({"start": lag, "end": lead, "times": [(t_obj, dtype)]})
+    return windows
+
+
+def getdischargeforvaluetimes(parquet_files, location_ids_file, times, data_dir, huc):
+    """
+    Write the NWM_<time>_<huc>.csv discharge files for many value times from a
+    single filtered read of the downloaded parquet window(s).
+    times: list of (pd.Timestamp, "date" | "datetime")
+    """
+    if not times:
+        return
+    location_ids = _location_ids(location_ids_file)
+    start = min(t for t, _ in times) - timedelta(days=1)
+    end = max(t for t, _ in times) + timedelta(days=1)
+    df = read_retrospective_parquet(parquet_files, location_ids, start, end)
+
+    # Every requested time gets its CSV, empty (header only) when it has no values
+    empty = pd.DataFrame(columns=["feature_id", "discharge"])
+
+    # Exact timestamps
+    exact = sorted({t for t, d in times if d == "datetime"})
+    if exact:
+        hits = df[df["value_time"].isin(exact)].rename(columns={"value": "discharge"})
+        groups = dict(tuple(hits.groupby("value_time")))
+        for t_obj in exact:
+            group = groups.get(t_obj, empty)
+            out = os.path.join(data_dir, f"NWM_{t_obj:%Y%m%d%H%M%S}_{huc}.csv")
+            group[["feature_id", "discharge"]].to_csv(out, index=False)
+            print(f"Discharge values saved to {out}")
+
+    # Whole days -> daily mean per feature
+    days = sorted({t.normalize() for t, d in times if d == "date"})
+    if days:
+        day_df = df.assign(day=df["value_time"].dt.normalize())
+        day_df = day_df[day_df["day"].isin(days)]
+        daily = (
+            day_df.groupby(["day", "feature_id"])["value"]
             .mean()
             .reset_index()
             .rename(columns={"value": "discharge"})
         )
-        formatted_datetime = specific_date.strftime("%Y%m%d")
-    else:
-        filtered_df = all_data[
-            (all_data["location_id"].isin(location_ids))
-            & (all_data["value_time"] == specific_date)
-        ].copy()
-        filtered_df.loc[:, "feature_id"] = filtered_df["location_id"].str.replace(
-            "nwm30-", ""
-        )
-        discharge_data = filtered_df[["feature_id", "value"]].rename(
-            columns={"value": "discharge"}
-        )
-        formatted_datetime = specific_date.strftime("%Y%m%d%H%M%S")
-
-    # Save to a CSV file with the date and HUC as filename
-    finalHANDdischarge_dir = os.path.join(
-        data_dir, f"NWM_{formatted_datetime}_{huc}.csv"
-    )
-    discharge_data.to_csv(finalHANDdischarge_dir, index=False)
-    print(f"Discharge values saved to {finalHANDdischarge_dir}")
+        groups = dict(tuple(daily.groupby("day")))
+        for day in days:
+            group = groups.get(day, empty)
+            out = os.path.join(data_dir, f"NWM_{day:%Y%m%d}_{huc}.csv")
+            group[["feature_id", "discharge"]].to_csv(out, index=False)
+            print(f"Discharge values saved to {out}")
 
 
 def getnwm_discharge(
@@ -113,7 +290,14 @@ def getnwm_discharge(
     output_root,
     nwm_version="nwm30",
     variable_name="streamflow",
+    huc=None,
 ):
+    """
+    Get NWM retrospective streamflow for start_date-end_date into
+    <output_root>/discharge/<nwm_version>_retrospective/<start>_<end>.parquet.
+    Data comes from the local streamflow store; only date ranges not yet in the
+    store are downloaded with teehr.
+    """
     output_dir = Path(output_root) / "discharge" / f"{nwm_version}_retrospective"
     output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -131,16 +315,57 @@ def getnwm_discharge(
 
     location_ids_df = pd.read_csv(fids)
     location_ids = location_ids_df["feature_id"].tolist()
-
-    nwm_retro.nwm_retro_to_parquet(
-        nwm_version=nwm_version,
-        variable_name=variable_name,
-        start_date=start_date,
-        end_date=end_date,
-        location_ids=location_ids,
-        output_parquet_dir=output_dir,
+    huc = huc or os.path.basename(os.path.normpath(output_root)).replace("flood_", "")
+
+    def _download(gaps):
+        frames = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for gap_start, gap_end in gaps:
+                day_dir = Path(tmp_dir) / f"{gap_start:%Y%m%d%H}"
+                nwm_retro.nwm_retro_to_parquet(
+                    nwm_version=nwm_version,
+                    variable_name=variable_name,
+                    start_date=gap_start.floor("D").strftime("%Y-%m-%d"),
+                    end_date=gap_end.ceil("D").strftime("%Y-%m-%d"),
+                    location_ids=location_ids,
+                    output_parquet_dir=day_dir,
+                )
+                files = sorted(day_dir.glob("*.parquet"))
+                if not files:
+                    # teehr logs failed requests instead of raising; keep the gaps missing
+                    print(
+                        f"No NWM retrospective data for {gap_start} - {gap_end}; not storing this download."
+                    )
+                    return None
+                frames.append(
+                    pads.dataset([str(f) for f in files], format="parquet")
+                    .to_table(columns=["location_id", "value_time", "value"])
+                    .to_pandas()
+                )
+        return pd.concat(frames, ignore_index=True)
+
+    # Covered range is start 00:00 - end 00:00; the export keeps every stored hour of the end day
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    store = default_store()
+    source = f"{nwm_version}_retrospective"
+    store_ids = [f"{nwm_version}-{int(fid)}" for fid in location_ids]
+    missing = store.missing(source, huc, store_ids, (start, end))
+    if missing:
+        downloaded = _download(missing)
+        if downloaded is None:
+            # Writing a partial export would make later calls skip the download
+            return
+        store.write(source, huc, store_ids, downloaded, missing)
+    df = store.read(
+        source, huc, (start, end + timedelta(days=1, microseconds=-1)), store_ids
     )
-    print(f"NWM discharge data saved to {output_dir}.")
+    df.to_parquet(file_path, index=False)
+    if missing:
+        print(f"NWM discharge data saved to {output_dir}.")
+    else:
+        print(
+            f"NWM discharge data for {start_date} - {end_date} taken from the local store."
+        )
 
 
 def determinedatatimeformat(date_str):
@@ -175,6 +400,8 @@ def getNWMretrospectivedata(
     :param end_date: End date for time range data.
     :param value_times: List of specific timestamps for a single HUC.
     :param huc_event_dict: Dictionary of HUCs with specific timestamps.
+    :param discharge_sortby: Statistic(s) over start_date-end_date: "maximum", "minimum",
+        "mean", "median", a quantile such as "q90", or a list of these (one pass).
     """
 
     code_dir, data_dir, output_dir = setup_directories()
@@ -216,7 +443,7 @@ def _process_huc_request(
 
     # Date Range provided
     if start_date and end_date:
-        getnwm_discharge(start_date, end_date, fid_path, huc_dir)
+        getnwm_discharge(start_date, end_date, fid_path, huc_dir, huc=huc)
         if discharge_sortby:
             get_aggregated_discharge(
                 retro_dir,
@@ -228,35 +455,28 @@ def _process_huc_request(
                 discharge_sortby,
             )
 
-    # Specific Timestamps provided
+    # Specific Timestamps provided: one download per merged window, one read for all times
     if value_times:
-        for time in value_times:
-            dtype = determinedatatimeformat(time)
-            t_obj = pd.to_datetime(time)
-
-            # Determine window
-            if dtype == "date":
-                lag = (t_obj - timedelta(days=1)).strftime("%Y-%m-%d")
-                lead = (t_obj + timedelta(days=1)).strftime("%Y-%m-%d")
-            elif dtype == "datetime":
-                lag = (t_obj - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
-                lead = (t_obj + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                continue
-            getnwm_discharge(lag, lead, fid_path, huc_dir)
-
-            # Extract specific time
-            getdischargeforspecifiedtime(
-                retro_dir, fid_path, time, data_dir, huc, dtype
+        for window in _retrospective_windows(value_times):
+            lag = window["start"].normalize().strftime("%Y-%m-%d")
+            lead = (window["end"].normalize() + timedelta(days=1)).strftime("%Y-%m-%d")
+            getnwm_discharge(lag, lead, fid_path, huc_dir, huc=huc)
+
+            window_file = os.path.join(
+                retro_dir, f"{lag.replace('-', '')}_{lead.replace('-', '')}.parquet"
+            )
+            window_files = (
+                [window_file]
+                if os.path.exists(window_file)
+                else sorted(Path(retro_dir).glob("*.parquet"))
+            )
+            getdischargeforvaluetimes(
+                window_files, fid_path, window["times"], data_dir, huc
             )
 
             # Cleanup temporary window file if we didn't have retro_dir before
-            if not initial_exists:
-                tmp_file = os.path.join(
-                    retro_dir, f"{lag.replace('-', '')}_{lead.replace('-', '')}.parquet"
-                )
-                if os.path.exists(tmp_file):
-                    os.remove(tmp_file)
+            if not initial_exists and os.path.exists(window_file):
+                os.remove(window_file)
 
     # Final cleanup if directory was created just for this session
     if (
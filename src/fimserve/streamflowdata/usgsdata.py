@@ -1,6 +1,7 @@
 import os
 import teehr
 import shutil
+import tempfile
 from pathlib import Path
 import pandas as pd
 from datetime import datetime, timedelta
@@ -8,6 +9,7 @@ import matplotlib.pyplot as plt
 from teehr.fetching.usgs.usgs import usgs_to_parquet
 
 from ..datadownload import setup_directories
+from ..streamflowstore import default_store
 from ..plot.usgs import getUSGSdata
 from ..plot import GetUSGSIDandCorrFID
 from .nwmretrospective import determinedatatimeformat
@@ -18,17 +20,59 @@ def getusgs_discharge(
     end_date,
     usgs_sites,
     output_root,
+    huc=None,
 ):
+    """
+    Get USGS streamflow into <output_root>/discharge/usgs_streamflow. With a huc the
+    data goes through the local streamflow store and only missing ranges are
+    downloaded; the window is written as <start>_<end>.parquet.
+    """
     output_dir = Path(output_root) / "discharge" / "usgs_streamflow"
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    usgs_to_parquet(
-        start_date=start_date,
-        end_date=end_date,
-        sites=usgs_sites,
-        output_parquet_dir=output_dir,
-        overwrite_output=True,
+    if huc is None:
+        usgs_to_parquet(
+            start_date=start_date,
+            end_date=end_date,
+            sites=usgs_sites,
+            output_parquet_dir=output_dir,
+            overwrite_output=True,
+        )
+        return
+
+    def _download(gaps):
+        frames = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, (gap_start, gap_end) in enumerate(gaps):
+                gap_dir = Path(tmp_dir) / str(i)
+                usgs_to_parquet(
+                    start_date=gap_start.to_pydatetime(),
+                    end_date=gap_end.to_pydatetime(),
+                    sites=usgs_sites,
+                    output_parquet_dir=gap_dir,
+                    overwrite_output=True,
+                )
+                files = sorted(gap_dir.glob("*.parquet"))
+                if not files:
+                    # teehr logs failed requests instead of raising; keep the gaps missing
+                    print(
+                        f"No USGS data for {gap_start} - {gap_end}; not storing this download."
+                    )
+                    return None
+                frames.extend(pd.read_parquet(f) for f in files)
+        return pd.concat(frames, ignore_index=True)
+
+    # Observations of the last day may still be revised, so they are not marked as covered
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    df = default_store().fetch(
+        "usgs",
+        huc,
+        [f"usgs-{site}" for site in usgs_sites],
+        (start, end),
+        _download,
+        settle=timedelta(days=1),
     )
+    df.to_parquet(output_dir / f"{start:%Y-%m-%d}_{end:%Y-%m-%d}.parquet", index=False)
 
 
 # If value_times is mentioned and user need the discharge for specific time
@@ -49,6 +93,7 @@ def getdischargeforspecifiedtime(
         all_data = pd.concat([all_data, df], ignore_index=True)
 
     all_data["value_time"] = pd.to_datetime(all_data["value_time"])
+    all_data = all_data.drop_duplicates(["location_id", "value_time"])
     location_ids = [str(lid) for lid in location_ids]
     usgs_formatted_ids = [f"usgs-{lid}" for lid in location_ids]
     specific_date = pd.to_datetime(specific_date)
@@ -142,7 +187,7 @@ def getUSGSsitedata(
                 continue
 
             # Download data
-            getusgs_discharge(start, end, usgs_ids, huc_output_dir)
+            getusgs_discharge(start, end, usgs_ids, huc_output_dir, huc=huc_key)
 
             # Extract specified discharge
             getdischargeforspecifiedtime(
@@ -179,7 +224,9 @@ def getUSGSsitedata(
             output_directory = os.path.join(output_dir, f"flood_{huc}")
             if usgs_sites is None:
                 usgs_sites = GetUSGSIDandCorrFID(huc)["USGS gauge station ID"].tolist()
-            getusgs_discharge(start_date, end_date, usgs_sites, output_directory)
+            getusgs_discharge(
+                start_date, end_date, usgs_sites, output_directory, huc=huc
+            )
 
         # process value times
         process_value_times(huc, value_times)
@@ -192,4 +239,4 @@ def getUSGSsitedata(
     if usgs_sites is None and huc is not None:
         usgs_sites = GetUSGSIDandCorrFID(huc)["USGS gauge station ID"].tolist()
 
-    getusgs_discharge(start_date, end_date, usgs_sites, output_directory)
+    getusgs_discharge(start_date, end_date, usgs_sites, output_directory, huc=huc)
@@ -0,0 +1,311 @@
+"""
+Persistent local store for streamflow time series (NWM retrospective, USGS, GeoGLOWS).
+
+Series are kept as parquet with the columns location_id, value_time, value and are
+partitioned by source/HUC/year:
+    <root>/source=<source>/huc=<huc>/year=<YYYY>/<timestamp>-<uuid>.parquet
+coverage.json records the [start, end] ranges already fetched for every
+(source, HUC, location set), so a request only downloads the gaps that are not in
+the store yet and overlapping windows are never fetched twice. locations.json keeps
+the location ids of every set, so coverage can be checked for any subset of them.
+
+Location: FIMSERVE_STREAMFLOW_STORE or <output_dir>/streamflow_store.
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as pads
+import pyarrow.compute as pc
+
+from .datadownload import setup_directories
+
+COLUMNS = ["location_id", "value_time", "value"]
+COVERAGE_NAME = "coverage.json"
+LOCATIONS_NAME = "locations.json"
+
+_STORES: Dict[str, "StreamflowStore"] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def _as_windows(windows) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    if isinstance(windows, tuple) and len(windows) == 2:
+        windows = [windows]
+    return [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in windows]
+
+
+def _merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def _subtract(start, end, covered):
+    """Parts of [start, end] not inside any covered interval."""
+    gaps, cursor = [], start
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, min(c_start, end)))
+        cursor = max(cursor, c_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[COLUMNS].copy()
+    df["location_id"] = df["location_id"].astype(str)
+    value_time = pd.to_datetime(df["value_time"])
+    if getattr(value_time.dt, "tz", None) is not None:
+        value_time = value_time.dt.tz_convert("UTC").dt.tz_localize(None)
+    df["value_time"] = value_time.astype("datetime64[ns]")
+    df["value"] = df["value"].astype("float64")
+    return df
+
+
+class StreamflowStore:
+    """Partitioned parquet store with a coverage index of fetched time ranges."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+
+    # Coverage index
+    def _coverage_path(self):
+        return os.path.join(self.root, COVERAGE_NAME)
+
+    def _load_coverage(self) -> Dict[str, List[List[str]]]:
+        try:
+            with open(self._coverage_path(), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_coverage(self, coverage):
+        self._save_json(self._coverage_path(), coverage, indent=1)
+
+    def _locations_path(self):
+        return os.path.join(self.root, LOCATIONS_NAME)
+
+    def _load_locations(self) -> Dict[str, List[str]]:
+        try:
+            with open(self._locations_path(), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_json(path, data, indent=None):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _key(source, huc, location_ids):
+        ids = sorted({str(i) for i in location_ids})
+        digest = hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+        return f"{source}/{huc}/{digest}"
+
+    def coverage(self, source, huc, location_ids) -> List[Tuple]:
+        """Merged [start, end] ranges already stored for this source/HUC/location set."""
+        intervals = self._load_coverage().get(self._key(source, huc, location_ids), [])
+        return _merge_intervals(
+            (pd.Timestamp(s), pd.Timestamp(e)) for s, e in intervals
+        )
+
+    def missing(self, source, huc, location_ids, windows) -> List[Tuple]:
+        """Sub-ranges of windows that still have to be fetched."""
+        covered = self.coverage(source, huc, location_ids)
+        gaps = []
+        for start, end in _merge_intervals(_as_windows(windows)):
+            gaps.extend(_subtract(start, end, covered))
+        return gaps
+
+    def covers(self, source, huc, location_ids, windows) -> bool:
+        """
+        Whether windows are fully stored for every location in location_ids, across
+        all location sets fetched for source/HUC. location_ids=None: for at least one
+        fetched set.
+        """
+        coverage = self._load_coverage()
+        prefix = f"{source}/{huc}/"
+        keys = [k for k in coverage if k.startswith(prefix)]
+        windows = _merge_intervals(_as_windows(windows))
+
+        def _covered(ks):
+            covered = _merge_intervals(
+                (pd.Timestamp(s), pd.Timestamp(e)) for k in ks for s, e in coverage[k]
+            )
+            for start, end in windows:
+                if start == end:
+                    if not any(s <= start <= e for s, e in covered):
+                        return False
+                elif _subtract(start, end, covered):
+                    return False
+            return True
+
+        if location_ids is None:
+            return any(_covered([k]) for k in keys)
+
+        requested = {str(i) for i in location_ids}
+        sets = self._load_locations()
+        known = {k: set(sets[k]) for k in keys if k in sets}
+        exact = self._key(source, huc, requested)
+        if exact in coverage:
+            known[exact] = requested
+
+        # Locations contained in the same fetched sets share their coverage
+        groups = {
+            tuple(k for k, ids in known.items() if loc in ids) for loc in requested
+        }
+        return bool(requested) and all(ks and _covered(ks) for ks in groups)
+
+    # Data
+    def _partition_dir(self, source, huc):
+        return os.path.join(self.root, f"source={source}", f"huc={huc}")
+
+    def write(self, source, huc, location_ids, df, windows, settle=None):
+        """
+        Append df (location_id, value_time, value) to the store and mark windows as
+        covered. With settle, coverage stops at now - settle so recent, still
+        changing observations are fetched again next time. df=None means the fetch
+        failed: nothing is written and the windows stay missing. An empty frame is a
+        successful fetch without data and does mark them covered.
+        """
+        if df is None:
+            return
+        windows = _as_windows(windows)
+        if not df.empty:
+            df = _normalize(df)
+            years = df["value_time"].dt.year
+            stamp = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+            for year, part in df.groupby(years):
+                out_dir = os.path.join(self._partition_dir(source, huc), f"year={year}")
+                os.makedirs(out_dir, exist_ok=True)
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                tmp = os.path.join(out_dir, f".{stamp}.parquet.tmp")
+                pq.write_table(table, tmp)
+                os.replace(tmp, os.path.join(out_dir, f"{stamp}.parquet"))
+
+        if settle is not None:
+            limit = pd.Timestamp(datetime.utcnow() - settle)
+            windows = [(s, min(e, limit)) for s, e in windows if s < limit]
+
+        key = self._key(source, huc, location_ids)
+        with self._lock:
+            coverage = self._load_coverage()
+            intervals = [
+                (pd.Timestamp(s), pd.Timestamp(e)) for s, e in coverage.get(key, [])
+            ]
+            merged = _merge_intervals(intervals + windows)
+            coverage[key] = [[s.isoformat(), e.isoformat()] for s, e in merged]
+            self._save_coverage(coverage)
+
+            locations = self._load_locations()
+            if key not in locations:
+                locations[key] = sorted({str(i) for i in location_ids})
+                self._save_json(self._locations_path(), locations)
+
+    def read(
+        self,
+        source,
+        huc,
+        windows=None,
+        location_ids: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """Stored rows for source/HUC, filtered (in the parquet scan) by windows and locations."""
+        part_dir = self._partition_dir(source, huc)
+        if not os.path.isdir(part_dir):
+            return pd.DataFrame(columns=COLUMNS)
+
+        dataset = pads.dataset(part_dir, format="parquet", partitioning="hive")
+        expr = None
+        if windows is not None:
+            windows = _merge_intervals(_as_windows(windows))
+            for start, end in windows:
+                w = (pc.field("year") >= start.year) & (pc.field("year") <= end.year)
+                w = w & (pc.field("value_time") >= start.to_pydatetime())
+                w = w & (pc.field("value_time") <= end.to_pydatetime())
+                expr = w if expr is None else expr | w
+        if location_ids is not None:
+            ids = pc.field("location_id").isin([str(i) for i in location_ids])
+            expr = ids if expr is None else expr & ids
+
+        df = dataset.to_table(columns=COLUMNS, filter=expr).to_pandas()
+        df = df.drop_duplicates(["location_id", "value_time"], keep="last")
+        return df.sort_values(["location_id", "value_time"]).reset_index(drop=True)
+
+    def fetch(
+        self,
+        source,
+        huc,
+        location_ids,
+        windows,
+        fetcher: Callable[[List[Tuple]], pd.DataFrame],
+        settle: Optional[timedelta] = None,
+    ) -> pd.DataFrame:
+        """
+        Return the rows for windows, calling fetcher(gaps) once for the uncovered
+        ranges only. fetcher must return a DataFrame with location_id, value_time, value,
+        or None when the download failed (the gaps are then retried on the next call).
+        """
+        windows = _as_windows(windows)
+        gaps = self.missing(source, huc, location_ids, windows)
+        if gaps:
+            self.write(source, huc, location_ids, fetcher(gaps), gaps, settle=settle)
+        return self.read(source, huc, windows, location_ids)
+
+
+def default_store(root: Optional[str] = None) -> StreamflowStore:
+    """Shared store instance for root (FIMSERVE_STREAMFLOW_STORE or <output_dir>/streamflow_store)."""
+    if root is None:
+        root = os.getenv("FIMSERVE_STREAMFLOW_STORE")
+    if root is None:
+        _, _, output_dir = setup_directories()
+        root = os.path.join(output_dir, "streamflow_store")
+    root = os.path.abspath(root)
+    with _STORES_LOCK:
+        if root not in _STORES:
+            _STORES[root] = StreamflowStore(root)
+        return _STORES[root]
+
+
+def stored_series(source, huc, location_ids, start_date, end_date):
+    """
+    Stored rows of the whole start_date-end_date days, or None unless the store
+    covers that window for all location_ids (None: any fetched location set).
+    """
+    if huc is None:
+        return None
+    start = pd.Timestamp(start_date).floor("D")
+    store = default_store()
+    # Fetches record [start, end] with end at the requested end date itself
+    if not store.covers(source, huc, location_ids, (start, pd.Timestamp(end_date))):
+        return None
+    window = (
+        start,
+        pd.Timestamp(end_date).floor("D") + pd.Timedelta(days=1, microseconds=-1),
+    )
+    df = store.read(source, huc, window, location_ids)
+    return df if not df.empty else None
@@ -33,9 +33,17 @@ def test_applySM():
     # Enhance the LOW-Fidelity FIM
     fimserve.enhanceFIM(
         huc_id=huc_id,
+        # streaming=False,  # Whole-HUC in-memory inference instead of row-band streaming
+        # cpu_mode="bf16",  # Without a GPU: "fp32" (default) / "bf16" traced inference, None for eager
     )
     print("Surrogate Model based FIM enhancement completed.")
 
+    # For batch jobs, keep the model warm in a local service and send requests to it:
+    #   python -m fimserve.enhancement_withSM.SM_server --port 8765   (or --stdin)
+    # from fimserve.enhancement_withSM.SM_server import request_enhancement
+    # request_enhancement(huc_id, forcing_dir=f"./HUC{huc_id}_forcings")
+    # Pin the checkpoint version with FIMSERVE_SM_MODEL_ETAG=<S3 ETag>
+
 
 def test_get_exposure():
     fimserve.getpopulation_exposure(
@@ -0,0 +1,46 @@
+"""
+Benchmark of the CPU inference modes of the surrogate model (AttentionUNet): patches/sec
+and IoU drift of the binarized output against fp32 eager inference, per mode.
+
+Uses random weights and patches by default; set FIMSERVE_BENCH_CKPT to a trained
+checkpoint for real weights. FIMSERVE_BENCH_BATCH / FIMSERVE_BENCH_PATCH set the batch
+and patch size, FIMSERVE_SM_THREADS the intra-op threads.
+"""
+
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("pytorch_lightning")
+
+from fimserve.enhancement_withSM.surrogate_model import AttentionUNet
+from fimserve.enhancement_withSM.SM_cpu import (
+    CPU_PRECISIONS,
+    benchmark_cpu_modes,
+)
+
+
+def test_cpu_inference_modes():
+    torch.manual_seed(0)
+    model = AttentionUNet(channel=8)
+    ckpt = os.getenv("FIMSERVE_BENCH_CKPT")
+    if ckpt:
+        model.load_state_dict(torch.load(ckpt, map_location="cpu")["state_dict"])
+    model.eval()
+
+    size = int(os.getenv("FIMSERVE_BENCH_PATCH", 128))
+    batch = torch.randn(int(os.getenv("FIMSERVE_BENCH_BATCH", 4)), 8, size, size)
+    modes = [(p, "trace", True) for p in CPU_PRECISIONS] + [("fp32", None, True)]
+
+    rows = benchmark_cpu_modes(model, batch, modes=modes, repeats=2)
+    for row in rows:
+        print(
+            f"{row['mode']:>18}: {row['patches_per_sec']:8.2f} patches/s | "
+            f"IoU vs fp32 {row['iou']:.4f} | max |diff| {row['max_abs_diff']:.3g}"
+        )
+
+    # fp32 modes only reorder the arithmetic; bf16 drift is reported, not asserted
+    for row in rows:
+        if row["mode"].startswith("fp32"):
+            assert row["iou"] >= 0.99
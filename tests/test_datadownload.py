@@ -26,3 +26,7 @@ huc_dir.to_csv("../HUCs_updated.csv", index=False)
 
 # stream_order = [6, 5]
 # fm.DownloadHUC8(huc, stream_order)
+
+# To download only the branches that carry the requested stream orders or feature IDs
+# fm.DownloadHUC8(huc, stream_order=">=5", selective=True)
+# fm.DownloadHUC8(huc, feature_ids=["11239079", "11239241"], selective=True)
@@ -35,3 +35,13 @@ def test_bm_fimlookup():
 #         print_graphs=True,  # If True, generates and saves contingency maps and evaluation metric plots.
 #         Evalwith_BF=True,  # If True, run evaluation with building footprint
 #     )
+
+
+# # Evaluate every case folder (HUC*_<site>, All_HUC_MOSAICED_<site>) in parallel; unchanged cases are skipped
+# def test_run_parallel_fimeval():
+#     summary = fm.run_parallel_evaluation(
+#         Main_dir="../test_FIMeval",
+#         workers=4,  # Number of cases evaluated at the same time
+#         force=False,  # If True, re-evaluates cases even if their inputs did not change
+#     )
+#     print(summary)
@@ -15,5 +15,12 @@ fm.getGEOGLOWSstreamflow(
     hydrotable=hydrotable_dir,
 )
 
+# Several events for the same HUC are fetched in one read
+# fm.getGEOGLOWSstreamflow(
+#     huc,
+#     event_time=["2016-10-15", "2017-02-20"],
+#     hydrotable=hydrotable_dir,
+# )
+
 # run the FIM model
 fm.runOWPHANDFIM(huc)
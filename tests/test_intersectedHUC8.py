@@ -4,3 +4,7 @@ user_boundary = "./path/to/your/boundary file"
 
 summary = fm.getIntersectedHUC8ID(user_boundary, area=True)
 print(summary)
+
+# The first call builds the local HUC8 index (GeoParquet + STRtree) from the S3 GeoPackage;
+# later calls run offline. Set FIMSERVE_HUC8_INDEX to use a prebuilt index file.
+# summary = fm.getIntersectedHUC8ID(user_boundary)
@@ -0,0 +1,59 @@
+"""
+Offline check of the windowed mosaic against rasterio.merge.merge (overlap, window
+boundaries, rasters with and without nodata).
+"""
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.merge import merge
+from rasterio.transform import from_origin
+
+from fimserve.fimevaluation.mosaic import mosaic_rasters
+
+
+def _tile(path, left, top, data, nodata=None):
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[0],
+        width=data.shape[1],
+        count=1,
+        dtype=data.dtype,
+        crs="EPSG:5070",
+        transform=from_origin(left, top, 10, 10),
+        nodata=nodata,
+    ) as dst:
+        dst.write(data, 1)
+    return path
+
+
+@pytest.mark.parametrize("nodata", [None, 255])
+def test_mosaic_matches_merge(tmp_path, nodata):
+    rng = np.random.default_rng(0)
+    # Dry (0) and wet (1) cells; the tiles overlap by 20 x 30 cells
+    a = rng.integers(0, 2, (70, 90)).astype(np.uint8)
+    b = rng.integers(0, 2, (60, 80)).astype(np.uint8)
+    if nodata is not None:
+        a[:5, :5] = nodata
+        b[-5:, -5:] = nodata
+    paths = [
+        _tile(tmp_path / "a.tif", 0, 700, a, nodata),
+        _tile(tmp_path / "b.tif", 600, 200, b, nodata),
+    ]
+
+    # Small windows so that the overlap crosses window boundaries
+    out = mosaic_rasters(paths, tmp_path / "mosaic.tif", window_size=32, block_size=16)
+
+    srcs = [rasterio.open(p) for p in paths]
+    try:
+        expected, transform = merge(srcs)
+    finally:
+        for s in srcs:
+            s.close()
+
+    with rasterio.open(out) as dst:
+        assert dst.nodata == nodata
+        assert dst.transform == transform
+        np.testing.assert_array_equal(dst.read(), expected)
@@ -7,6 +7,9 @@ end_date = "2020-01-03"
 
 # fm.getNWMretrospectivedata(huc, start_date, end_date)
 
+# Several statistics (and quantiles) over the range in one pass
+# fm.getNWMretrospectivedata(huc, start_date, end_date, discharge_sortby=["maximum", "mean", "q90"])
+
 # to work with only huc or for getting a retrospective streamflow for the evaluation or something
 value_times = ["2020-01-01 00:00:00"]
 # fm.getNWMretrospectivedata(huc, start_date, end_date, value_times)
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark of the per-HUC static forcing preprocessing of the surrogate model:
+the previous per-pixel LULC reclassification / scipy Box-Cox path against the current
+lookup-table and in-place normalization in InferenceDataPreprocessor.tif_to_tensor.
+
+Runs on synthetic rasters by default; set FIMSERVE_BENCH_FORCINGS (and FIMSERVE_BENCH_HUC)
+to time a real HUC forcing folder instead. FIMSERVE_BENCH_SIZE sets the synthetic size.
+"""
+
+import os
+import time
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+rasterio = pytest.importorskip("rasterio")
+scipy_stats = pytest.importorskip("scipy.stats")
+
+from fimserve.enhancement_withSM.SM_preprocess import (
+    GLOBAL_STATS,
+    InferenceDataPreprocessor,
+)
+
+
+# Previous implementation, kept here only as the benchmark baseline
+def _previous_tif_to_tensor(path, feature_name, stats=GLOBAL_STATS):
+    with rasterio.open(path) as src:
+        array = src.read(1).astype(np.float32)
+        if src.nodata is not None:
+            array[array == src.nodata] = np.nan
+        array = np.nan_to_num(array, nan=0.0)
+    tensor = torch.tensor(array, dtype=torch.float32).unsqueeze(0)
+
+    def boxcox(t):
+        t = t + 1e-6
+        out = scipy_stats.boxcox(t.flatten().numpy(), lmbda=0.5)
+        return torch.tensor(out).reshape(t.shape)
+
+    if feature_name == "elevation":
+        tensor = (tensor - stats[feature_name]["mean"]) / (
+            stats[feature_name]["std"] + 1e-7
+        )
+    elif feature_name in ("slope", "flow_acc"):
+        tensor = boxcox(tensor)
+        tensor = (tensor - stats[feature_name]["mean"]) / (
+            stats[feature_name]["std"] + 1e-7
+        )
+    elif feature_name == "lulc":
+        reclass_map = {1: 1, 2: 2, 4: 3, 3: 4, 8: 5, 6: 6, 7: 7, 5: 8, 9: 9}
+        reclass = np.vectorize(lambda x: reclass_map.get(x, 0))(array.astype(np.int32))
+        tensor = torch.tensor(reclass.astype(np.float32)).unsqueeze(0)
+    elif feature_name in stats:
+        lo, hi = stats[feature_name]["min"], stats[feature_name]["max"]
+        tensor = (tensor - lo) / (hi - lo + 1e-7)
+    return tensor
+
+
+def _synthetic_forcings(folder, huc_id, size):
+    rng = np.random.default_rng(0)
+    profile = dict(
+        driver="GTiff",
+        height=size,
+        width=size,
+        count=1,
+        dtype="float32",
+        crs="EPSG:5070",
+        transform=rasterio.transform.from_origin(0, size * 30, 30, 30),
+        nodata=-9999,
+    )
+    for key in InferenceDataPreprocessor.FEATURE_FILENAME_MAP.values():
+        scale = 12 if key == "LULC" else 500
+        data = (rng.random((size, size)) * scale).astype(np.float32)
+        data[:10, :10] = -9999
+        with rasterio.open(folder / f"{key}_{huc_id}.tif", "w", **profile) as dst:
+            dst.write(data, 1)
+
+
+def test_static_preprocessing_time(tmp_path):
+    folder = os.getenv("FIMSERVE_BENCH_FORCINGS")
+    huc_id = os.getenv("FIMSERVE_BENCH_HUC", "00000000")
+    if folder is None:
+        folder = tmp_path
+        _synthetic_forcings(folder, huc_id, int(os.getenv("FIMSERVE_BENCH_SIZE", 2000)))
+
+    pre = InferenceDataPreprocessor(data_dir=folder)
+    sources = pre._static_sources(huc_id)
+    assert sources is not None
+
+    before = after = 0.0
+    for feature, tif in sources:
+        t0 = time.perf_counter()
+        old = _previous_tif_to_tensor(tif, feature)
+        t1 = time.perf_counter()
+        new = pre.tif_to_tensor(tif, feature_name=feature)
+        t2 = time.perf_counter()
+        before += t1 - t0
+        after += t2 - t1
+        print(f"{feature:>14}: {t1 - t0:7.3f} s -> {t2 - t1:7.3f} s")
+        assert torch.allclose(old.float(), new, rtol=1e-5, atol=1e-5)
+
+    print(f"{'static stack':>14}: {before:7.3f} s -> {after:7.3f} s")
@@ -0,0 +1,23 @@
+import fimserve as fm
+import pandas as pd
+
+huc_dir = pd.read_csv("../HUC.csv", dtype={"HUC8": str})
+
+# Same event for every HUC8; downloads overlap with FIM generation across HUCs
+value_time = ["2020-01-02 00:00:00"]
+
+summary = fm.run_batch(
+    huc_dir["HUC8"].tolist(),
+    events=value_time,
+    network_workers=4,  # HUCs downloading raster/streamflow at the same time
+    # cpu_workers=8,  # HAND inundation worker processes, defaults to CPU count
+    summary_csv="../HUCs_BatchTime.csv",
+)
+print(summary)
+
+# For the multiple watersheds with multiple events at the same time
+# huc_event_dict = {
+#     "03020202": ["2016-10-08 15:00:00", "2016-10-08"],
+#     "12060202": ["2016-10-09 15:00:00", "2016-10-09 16:00:00"],
+# }
+# fm.run_batch(huc_event_dict)
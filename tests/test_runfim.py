@@ -5,3 +5,6 @@ huc = "03020202"
 
 # run the FIM model
 fm.runOWPHANDFIM(huc)
+
+# For many discharge files (ensemble/forecast members), map them across cores
+# fm.runOWPHANDFIM(huc, workers=4)
@@ -0,0 +1,93 @@
+"""
+Offline check of the shared S3 asset cache (ETag keyed, LRU eviction, offline mode).
+"""
+
+import os
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from fimserve import s3cache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="sdmlab")
+        client.put_object(Bucket="sdmlab", Key="PWB/pwb.shp", Body=b"s" * 100)
+        client.put_object(Bucket="sdmlab", Key="PWB/pwb.dbf", Body=b"d" * 100)
+        client.put_object(
+            Bucket="sdmlab", Key="catalog/catalog_core.json", Body=b"{}" * 300
+        )
+        monkeypatch.setattr(s3cache, "_CLIENT", client)
+        monkeypatch.setattr(
+            s3cache,
+            "_CONFIG",
+            {"cache_dir": str(tmp_path), "max_gb": None, "offline": None},
+        )
+        yield client
+
+
+def test_reuse_and_revalidate(cache):
+    first = s3cache.s3_cached_file("sdmlab", "catalog/catalog_core.json")
+    assert s3cache.s3_cached_file("sdmlab", "catalog/catalog_core.json") == first
+
+    # A new upload changes the ETag -> new entry
+    cache.put_object(Bucket="sdmlab", Key="catalog/catalog_core.json", Body=b"[]")
+    assert s3cache.s3_cached_file("sdmlab", "catalog/catalog_core.json") != first
+
+
+def test_lru_eviction_and_offline(cache):
+    s3cache.configure_cache(max_gb=500 / 1024**3)
+    shp = [
+        p
+        for p in s3cache.s3_cached_bundle("sdmlab", "PWB/", (".shp", ".dbf"))
+        if p.endswith(".shp")
+    ]
+    assert shp
+    catalog = s3cache.s3_cached_file("sdmlab", "catalog/catalog_core.json")
+
+    # 200 + 600 bytes exceed the 500 byte cap, so the older shapefile bundle is evicted
+    s3cache.configure_cache(offline=True)
+    assert s3cache.s3_cached_file("sdmlab", "catalog/catalog_core.json") == catalog
+    with pytest.raises(FileNotFoundError):
+        s3cache.s3_cached_bundle("sdmlab", "PWB/", (".shp", ".dbf"))
+
+
+def test_pinned_version(cache):
+    key = "catalog/catalog_core.json"
+    etag = cache.head_object(Bucket="sdmlab", Key=key)["ETag"]
+    pinned = s3cache.s3_pinned_file("sdmlab", key, etag)
+
+    # The pinned copy is still served after a new upload; a stale pin cannot be fetched
+    cache.put_object(Bucket="sdmlab", Key=key, Body=b"[]")
+    assert s3cache.s3_pinned_file("sdmlab", key, etag) == pinned
+    with pytest.raises(ValueError):
+        s3cache.s3_pinned_file("sdmlab", key, '"0123"')
+
+
+def test_failed_bundle_leaves_nothing(cache, monkeypatch):
+    download = cache.download_file
+
+    def flaky(bucket, key, dest, **kwargs):
+        if key.endswith(".dbf"):
+            open(dest, "wb").close()
+            raise OSError("connection reset")
+        return download(bucket, key, dest, **kwargs)
+
+    monkeypatch.setattr(cache, "download_file", flaky)
+    with pytest.raises(OSError):
+        s3cache.s3_cached_bundle("sdmlab", "PWB/", (".shp", ".dbf"))
+
+    # Neither the .tmp nor the half-filled entry without meta.json is kept
+    root = s3cache.cache_dir()
+    assert not [f for _, _, files in os.walk(root) for f in files]
+
+
+def test_cached_copy_without_network(cache):
+    assert s3cache.cached_file_by_suffix("sdmlab", "catalog/", ".json") is None
+    path = s3cache.s3_cached_file_by_suffix("sdmlab", "catalog/", ".json")
+    assert s3cache.cached_file_by_suffix("sdmlab", "catalog/", ".json") == path
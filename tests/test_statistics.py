@@ -19,3 +19,7 @@ usgs_sites = ["02091814", "02089500"]
 
 fm.CalculateStatistics(huc, feature_id[0], usgs_sites[0], start_date, end_date)
 fm.CalculateStatistics(huc, feature_id[1], usgs_sites[1], start_date, end_date)
+
+# All gauges of the HUC at once (tidy table, plots off by default)
+# stats = fm.CalculateHUCStatistics(huc, start_date, end_date)
+# print(stats)
@@ -0,0 +1,112 @@
+"""
+Offline check of the local streamflow store (gap detection, partitioned writes, reads).
+"""
+
+import pandas as pd
+
+from fimserve.streamflowstore import StreamflowStore
+
+
+def _series(start, end, ids=("nwm30-1", "nwm30-2")):
+    times = pd.date_range(start, end, freq="h")
+    return pd.DataFrame(
+        [(i, t, float(n)) for i in ids for n, t in enumerate(times)],
+        columns=["location_id", "value_time", "value"],
+    )
+
+
+def test_only_gaps_are_fetched(tmp_path):
+    store = StreamflowStore(str(tmp_path))
+    ids = ["nwm30-1", "nwm30-2"]
+    fetched = []
+
+    def fetcher(gaps):
+        fetched.extend(gaps)
+        return pd.concat([_series(s, e, ids) for s, e in gaps])
+
+    store.fetch("nwm30_retrospective", "H", ids, ("2019-12-30", "2020-01-02"), fetcher)
+    df = store.fetch(
+        "nwm30_retrospective", "H", ids, ("2020-01-01", "2020-01-04"), fetcher
+    )
+
+    assert fetched[-1] == (pd.Timestamp("2020-01-02"), pd.Timestamp("2020-01-04"))
+    assert df["value_time"].min() == pd.Timestamp("2020-01-01")
+    assert not df.duplicated(["location_id", "value_time"]).any()
+    assert {
+        p.name for p in (tmp_path / "source=nwm30_retrospective" / "huc=H").iterdir()
+    } == {
+        "year=2019",
+        "year=2020",
+    }
+
+    # Covered now: no further fetch
+    n = len(fetched)
+    store.fetch("nwm30_retrospective", "H", ids, ("2020-01-02", "2020-01-03"), fetcher)
+    assert len(fetched) == n
+
+    # A different location set is tracked separately
+    assert store.missing(
+        "nwm30_retrospective", "H", ["nwm30-3"], ("2020-01-01", "2020-01-02")
+    )
+
+
+def test_partial_coverage_is_not_served(tmp_path, monkeypatch):
+    from fimserve.streamflowstore import stored_series
+
+    monkeypatch.setenv("FIMSERVE_STREAMFLOW_STORE", str(tmp_path))
+    store = StreamflowStore(str(tmp_path))
+    ids = ["nwm30-1", "nwm30-2"]
+    store.write(
+        "nwm30_retrospective",
+        "H",
+        ids,
+        _series("2020-01-01", "2020-01-03", ids),
+        ("2020-01-01", "2020-01-03"),
+    )
+
+    # A subset of a fetched location set is covered
+    assert store.covers(
+        "nwm30_retrospective", "H", ["nwm30-2"], ("2020-01-01", "2020-01-02")
+    )
+    assert (
+        stored_series(
+            "nwm30_retrospective", "H", ["nwm30-1"], "2020-01-01", "2020-01-03"
+        )
+        is not None
+    )
+    assert (
+        stored_series("nwm30_retrospective", "H", None, "2020-01-02", "2020-01-02")
+        is not None
+    )
+
+    # Windows reaching past the stored range, or unknown locations, are not
+    assert (
+        stored_series(
+            "nwm30_retrospective", "H", ["nwm30-1"], "2019-12-31", "2020-01-03"
+        )
+        is None
+    )
+    assert (
+        stored_series(
+            "nwm30_retrospective",
+            "H",
+            ["nwm30-1", "nwm30-3"],
+            "2020-01-01",
+            "2020-01-02",
+        )
+        is None
+    )
+
+
+def test_failed_fetch_is_not_covered(tmp_path):
+    store = StreamflowStore(str(tmp_path))
+    ids = ["usgs-1"]
+    window = ("2020-01-01", "2020-01-03")
+
+    # None marks a failed download: nothing is covered and the next call retries
+    store.fetch("usgs", "H", ids, window, lambda gaps: None)
+    assert store.missing("usgs", "H", ids, window)
+
+    # An empty frame is a successful download without observations
+    store.fetch("usgs", "H", ids, window, lambda gaps: _series(*window, ids).head(0))
+    assert not store.missing("usgs", "H", ids, window)
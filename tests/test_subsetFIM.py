@@ -10,3 +10,7 @@ fm.subsetFIM(location, huc, method="xy")
 # # If user want to subset FIM from boundary
 # location = "/Users/supath/Downloads/MSResearch/CNN/fimPackage/docs/subsetBoundary/boundary.gpkg"
 # fm.subsetFIM(location, huc, method="boundary")
+
+# # Many points (or boundary files) at once, rasters clipped in parallel
+# locations = [[-77.505826, 35.323955], [-77.40, 35.25]]
+# fm.subsetFIM(locations, huc, method="xy", workers=4)